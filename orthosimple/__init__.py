@@ -1,3 +1,11 @@
-import orthosimple
+import sys
+
+import startup_profile
+
+if ("--profile-startup" in sys.argv[1:]):
+    startup_profile.enable()
+
+with startup_profile.phase("imports"):
+    import orthosimple
 
 orthosimple.OrthoSimple()
\ No newline at end of file
@@ -0,0 +1,72 @@
+'''
+The binary bundle the CSV files of src_data are compiled to, so that the application starts
+without parsing them with pandas nor summarizing the key bindings again (see
+reader.compiled_tables). The bundle is a header followed by the tables, in marshal format:
+
+    magic b"OSAB", FORMAT_VERSION (u16), marshal.version (u16), sha256 of the CSV files (32 bytes)
+
+A bundle is only used while its hash matches the CSV files, so editing them is enough for the
+next start to compile them again.
+
+Build it, from the orthosimple folder, with:
+    python3 association_bundle.py
+'''
+
+import hashlib
+import marshal
+import mmap
+import os
+import struct
+
+MAGIC = b"OSAB"
+FORMAT_VERSION = 1
+HEADER = struct.Struct(">4sHH32s")
+
+def source_hash(paths):
+    """
+    Produces the sha256 of the names and contents of the files at paths, in order.
+    """
+
+    digest = hashlib.sha256()
+    for path in paths:
+        contents = path.read_bytes()
+        digest.update(struct.pack(">Q", len(path.name)) + path.name.encode())
+        digest.update(struct.pack(">Q", len(contents)) + contents)
+    return digest.digest()
+
+def write(path, digest, tables):
+    """
+    Writes tables, made of the types marshal supports, to the bundle at path, replacing it
+    at once so that a start reading it meanwhile never sees half of it.
+    """
+
+    temporary = path.with_name("%s.%d.tmp" % (path.name, os.getpid()))
+    try:
+        with open(temporary, "wb") as bundle_file:
+            bundle_file.write(HEADER.pack(MAGIC, FORMAT_VERSION, marshal.version, digest))
+            marshal.dump(tables, bundle_file)
+        os.replace(temporary, path)
+    finally:
+        if (temporary.exists()):
+            temporary.unlink()
+
+def load(path, digest):
+    """
+    Produces the tables of the bundle at path, or None if there is none or it was not compiled
+    from sources of this digest, in this format.
+    """
+
+    try:
+        with open(path, "rb") as bundle_file:
+            with mmap.mmap(bundle_file.fileno(), 0, access = mmap.ACCESS_READ) as mapped:
+                if ((len(mapped) < HEADER.size) or
+                        (HEADER.unpack_from(mapped) != (MAGIC, FORMAT_VERSION, marshal.version, digest))):
+                    return None
+                with memoryview(mapped)[HEADER.size:] as view:
+                    return marshal.loads(view)
+    except (OSError, ValueError, EOFError, TypeError):
+        return None
+
+if (__name__ == "__main__"):
+    import reader
+    print("compiled", reader.build_bundle())
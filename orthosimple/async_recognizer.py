@@ -0,0 +1,179 @@
+'''
+Runs the recognizer off the Tk event loop. Work is queued to a single worker thread, so the
+requests sent on the recognizer's connection keep their order, and results come back to Tk
+through after() callbacks: the worker never touches a widget.
+
+Usage:
+    request = async_recognizer.submit(lambda: recognizer.recognize(strokes), on_result, on_error)
+    ...
+    request.cancel() # on_result and on_error will not be called
+'''
+
+import queue
+import sys
+import threading
+import time
+
+PENDING = "pending"
+DONE = "done"
+CANCELLED = "cancelled"
+
+class RecognitionRequest:
+    '''
+    A job submitted to an AsyncRecognizer. Only the Tk thread changes its state; the worker only
+    reads it, to skip the jobs that are no longer wanted.
+    '''
+
+    def __init__(self, work, on_result, on_error, deadline):
+        self.work = work
+        self.on_result = on_result
+        self.on_error = on_error
+        self.deadline = deadline
+        self.state = PENDING
+
+    def cancel(self):
+        if (self.state == PENDING):
+            self.state = CANCELLED
+
+class AsyncRecognizer:
+    '''
+    Calls the jobs it is given on a worker thread and delivers their results to the Tk thread of
+    widget. At most max_pending jobs wait for the worker: when the queue is full, submit fails
+    right away with queue.Full instead of piling up work the user no longer waits for, and post
+    drops its job. Jobs given to post_cleanup, which close what earlier jobs opened, are queued
+    even then, so that a stream whose points were dropped can still be cancelled. A request
+    fails with TimeoutError when its result has not arrived timeout seconds after it was
+    submitted; a late result is dropped. The worker skips the requests whose deadline passed
+    before it got to them, so the requests that timed out while a slow one ran do not hold it
+    in turn. A request already running holds it until its work returns: the recognizer's own
+    timeout, which OrthoSimple sets to the same RECOGNITION_TIMEOUT, bounds that.
+    '''
+
+    POLL_INTERVAL = 10 # ms, only while requests are outstanding
+
+    def __init__(self, widget, max_pending = 8, timeout = 2.0):
+        self.widget = widget
+        self.timeout = timeout
+        self.max_pending = max_pending
+        # not bounded itself: __enqueue keeps the jobs other than cleanups within max_pending
+        self.jobs = queue.Queue()
+        self.completed = queue.SimpleQueue()
+        self.outstanding = []
+        self.polling = False
+        self.worker = None
+
+    def submit(self, work, on_result, on_error, timeout = None):
+        """
+        Queues work, a function of no arguments. Its result is given to on_result, or the
+        exception it raised to on_error, on the Tk thread. Produces the RecognitionRequest, which
+        can be cancelled.
+        """
+
+        deadline = time.monotonic() + (self.timeout if (timeout is None) else timeout)
+        request = RecognitionRequest(work, on_result, on_error, deadline)
+        try:
+            self.__enqueue(request)
+        except queue.Full as error:
+            self.widget.after(0, self.__fail, request, error)
+            return request
+
+        self.outstanding.append(request)
+        if (not self.polling):
+            self.polling = True
+            self.widget.after(self.POLL_INTERVAL, self.__poll)
+        return request
+
+    def post(self, work):
+        """
+        Queues work, whose result is not needed. Produces False when the queue is full and work
+        was dropped.
+        """
+
+        try:
+            self.__enqueue(RecognitionRequest(work, None, None, None))
+        except queue.Full:
+            return False
+        return True
+
+    def post_cleanup(self, work):
+        """
+        Queues work, whose result is not needed, even when the queue is full. It is meant for
+        the calls that close what earlier jobs opened, such as cancelling a stream, which run
+        after these jobs, and of which there is at most one per job opening something.
+        """
+
+        self.__enqueue(RecognitionRequest(work, None, None, None), cleanup = True)
+
+    def cancel_all(self):
+        for request in self.outstanding:
+            request.cancel()
+
+    def __enqueue(self, request, cleanup = False):
+        """
+        Queues request, or raises queue.Full if max_pending jobs are already waiting and it is
+        not a cleanup. Only the Tk thread queues jobs, so the queue cannot fill up in between.
+        """
+
+        if ((not cleanup) and (self.jobs.qsize() >= self.max_pending)):
+            raise queue.Full
+        if (self.worker is None):
+            self.worker = threading.Thread(target = self.__work, name = "recognizer", daemon = True)
+            self.worker.start()
+        self.jobs.put_nowait(request)
+
+    def __work(self):
+        while (True):
+            request = self.jobs.get()
+            if ((request.state != PENDING) or
+                ((request.deadline is not None) and (time.monotonic() >= request.deadline))):
+                continue
+            try:
+                result = (request.work(), None)
+            except Exception as error:
+                result = (None, error)
+            if (request.on_result is not None):
+                self.completed.put((request, result))
+
+    def __fail(self, request, error):
+        if (request.state == PENDING):
+            self.__deliver(request, request.on_error, error)
+
+    def __deliver(self, request, callback, value):
+        """
+        Calls callback with value, once request is done. A callback that fails does not keep the
+        other requests from being delivered nor timing out.
+        """
+
+        request.state = DONE
+        try:
+            callback(value)
+        except Exception as error:
+            print("recognition callback failed:", repr(error), file = sys.stderr)
+
+    def __poll(self):
+        """
+        Hands the results that arrived to their callbacks and fails the requests that timed out,
+        then polls again while some requests are outstanding.
+        """
+
+        try:
+            while (True):
+                try:
+                    (request, (value, error)) = self.completed.get_nowait()
+                except queue.Empty:
+                    break
+                if (error is not None):
+                    self.__fail(request, error)
+                elif (request.state == PENDING):
+                    self.__deliver(request, request.on_result, value)
+
+            now = time.monotonic()
+            for request in self.outstanding:
+                if ((request.state == PENDING) and (now >= request.deadline)):
+                    self.__fail(request, TimeoutError("the recognizer did not answer in time"))
+        finally:
+            self.outstanding = [request for request in self.outstanding if (request.state == PENDING)]
+            if (self.outstanding):
+                self.widget.after(self.POLL_INTERVAL, self.__poll)
+            else:
+                self.polling = False
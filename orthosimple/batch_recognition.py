@@ -0,0 +1,118 @@
+'''
+Recognizes a whole gesture dataset (see gesture_dataset) offline, spread over a pool of
+processes that each have their own NumpyRecognizer. The input lines are handed to the workers
+in chunks, parsed and recognized there, and the results are written in the order of the input
+as soon as they are ready, one JSON line per sample:
+
+    {"letter": "e", "accent": "acute", "letter_score": 12.5, "accent_score": 20.1}
+
+with the expected letter and accent added when the sample has them, or {"error": "..."} for a
+line that could not be recognized. The throughput, and the accuracy for labelled samples, are
+printed when the batch is done.
+
+Run from the orthosimple folder:
+    python3 batch_recognition.py INPUT OUTPUT [--processes N] [--chunk-size N] [--sample-points N]
+'''
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import namedtuple
+
+import gesture_recognizer
+
+CHUNK_SIZE = 64
+
+BatchReport = namedtuple("BatchReport", ["samples", "errors", "labelled", "correct", "seconds",
+                                         "processes"])
+
+worker_recognizer = None
+
+def start_worker(num_sample_points):
+    global worker_recognizer
+    worker_recognizer = gesture_recognizer.NumpyRecognizer(num_sample_points)
+
+def recognize_line(line):
+    """
+    Produces the output line for the sample on line, and whether the sample has an expected
+    letter and accent, and whether both were recognized.
+    """
+
+    try:
+        sample = json.loads(line)
+        (letter, accent, letter_score, accent_score) = worker_recognizer.recognize_with_scores(sample["strokes"])
+    except (ValueError, KeyError, IndexError, TypeError) as error:
+        return (json.dumps({"error": "%s: %s" % (type(error).__name__, error)}) + "\n", False, False)
+
+    result = {"letter": letter, "accent": accent, "letter_score": letter_score,
+              "accent_score": accent_score}
+    labelled = ("letter" in sample) and ("accent" in sample)
+    if (labelled):
+        result["expected_letter"] = sample["letter"]
+        result["expected_accent"] = sample["accent"]
+    correct = labelled and (letter == sample["letter"]) and (accent == sample["accent"])
+    return (json.dumps(result, separators = (",", ":")) + "\n", labelled, correct)
+
+def recognize_file(input_path, output_path, processes = None, chunk_size = CHUNK_SIZE,
+                   num_sample_points = gesture_recognizer.NUM_SAMPLE_POINTS):
+    """
+    Recognizes every sample of the dataset at input_path with processes workers (one per core
+    by default, and the calling process alone for 1), writes the results to output_path, and
+    produces a BatchReport.
+    """
+
+    if (processes is None):
+        processes = os.cpu_count() or 1
+    counts = {"samples": 0, "errors": 0, "labelled": 0, "correct": 0}
+    start = time.perf_counter()
+    with open(input_path) as input_file, open(output_path, "w") as output_file:
+        lines = (line for line in input_file if line.strip())
+        if (processes == 1):
+            start_worker(num_sample_points)
+            results = map(recognize_line, lines)
+            pool = None
+        else:
+            pool = multiprocessing.Pool(processes, start_worker, (num_sample_points,))
+            results = pool.imap(recognize_line, lines, chunk_size)
+        try:
+            for (output_line, labelled, correct) in results:
+                output_file.write(output_line)
+                counts["samples"] += 1
+                counts["errors"] += output_line.startswith('{"error"')
+                counts["labelled"] += labelled
+                counts["correct"] += correct
+        finally:
+            if (pool is not None):
+                pool.terminate()
+                pool.join()
+    return BatchReport(seconds = time.perf_counter() - start, processes = processes, **counts)
+
+def describe(report):
+    description = ("%d samples in %.2f s with %d processes: %.0f samples/s" %
+                   (report.samples, report.seconds, report.processes,
+                    report.samples / max(report.seconds, 1e-9)))
+    if (report.errors):
+        description += ", %d errors" % report.errors
+    if (report.labelled):
+        description += ", top-1 accuracy %.4f" % (report.correct / report.labelled)
+    return description
+
+def main():
+    parser = argparse.ArgumentParser(description = "Offline recognition of a gesture dataset")
+    parser.add_argument("input", help = "a gesture_dataset file")
+    parser.add_argument("output", help = "the file the results are written to")
+    parser.add_argument("--processes", type = int, help = "number of workers (default: one per core)")
+    parser.add_argument("--chunk-size", type = int, default = CHUNK_SIZE,
+                        help = "number of samples handed to a worker at a time")
+    parser.add_argument("--sample-points", type = int, default = gesture_recognizer.NUM_SAMPLE_POINTS)
+    arguments = parser.parse_args()
+
+    report = recognize_file(arguments.input, arguments.output, arguments.processes,
+                            arguments.chunk_size, arguments.sample_points)
+    print(describe(report), file = sys.stderr)
+
+if (__name__ == "__main__"):
+    main()
@@ -0,0 +1,101 @@
+"""
+Compares the lookups of reader.AssociationIndex with the boolean-mask pandas queries that
+AssociationReader used to run on every lookup, on a synthetic associations table.
+
+Run from the orthosimple folder:
+    python3 -m benchmarks.bench_association_index [num_rows]
+"""
+
+import random
+import string
+import sys
+import timeit
+
+import pandas as pd
+
+from reader import AssociationIndex
+
+NUM_ROWS = 100000
+NUM_LOOKUPS = 200
+GROUPS = ["acute", "grave", "trema", "sub_curl", "special", "other", "oe", "ae", "circumflex"]
+LANGUAGES = ["L%02d" % i for i in range(40)]
+
+
+def synthetic_tables(num_rows, seed = 0):
+    """
+    Produces an associations table with num_rows rows and the keybindings table for GROUPS.
+    """
+
+    rng = random.Random(seed)
+    alphabet = string.ascii_lowercase + "àáâäåçèéêëìíîïñòóôöùúûü"
+    rows = []
+    for i in range(num_rows):
+        rows.append((i + 1, rng.choice(alphabet), rng.choice(alphabet),
+                     rng.choice(LANGUAGES), rng.choice(GROUPS)))
+    df_associations = pd.DataFrame(rows, columns = ["id_char", "input_char", "new_char",
+                                                    "language_abbrev", "special_group"])
+    keys_from_groups = pd.DataFrame({"special_group": GROUPS,
+                                     "first_char": ["/", "\\", "\"", ",", ";", ".", "o", "a", "^"]})
+    return (df_associations, keys_from_groups)
+
+
+def pandas_new_char(df_associations, input_char, accent_type):
+    new_char_table = df_associations.loc[(df_associations["special_group"] == accent_type) &
+                                         (df_associations["input_char"] == input_char)]
+    return new_char_table["new_char"].iloc[0]
+
+
+def pandas_char_association(df_associations, group, client_language):
+    cols = ["input_char", "new_char"]
+    association_query = df_associations.loc[(df_associations["special_group"] == group) &
+                                            (df_associations["language_abbrev"] == client_language)][cols]
+    uppercase_query = association_query.apply(lambda series: series.apply(lambda char: char.upper()))
+    return pd.concat([association_query, uppercase_query]).drop_duplicates(subset = ["input_char"])
+
+
+def pandas_binding(keys_from_groups, special_group):
+    return keys_from_groups.loc[keys_from_groups["special_group"] == special_group, "first_char"].iloc[0]
+
+
+def report(name, pandas_time, index_time, num_lookups):
+    print("%-20s pandas %10.2f us/lookup   index %8.3f us/lookup   speedup %8.0fx" %
+          (name, pandas_time / num_lookups * 1e6, index_time / num_lookups * 1e6, pandas_time / index_time))
+
+
+def main():
+    num_rows = int(sys.argv[1]) if (len(sys.argv) > 1) else NUM_ROWS
+    (df_associations, keys_from_groups) = synthetic_tables(num_rows)
+
+    start = timeit.default_timer()
+    index = AssociationIndex(df_associations, keys_from_groups)
+    print("%d rows, index built in %.1f ms" % (num_rows, (timeit.default_timer() - start) * 1e3))
+
+    rng = random.Random(1)
+    new_char_keys = rng.sample(sorted(index.new_chars), NUM_LOOKUPS)
+    group_keys = [rng.choice(sorted(index.char_associations)) for _ in range(NUM_LOOKUPS)]
+    for ((group, plain), (group_lang, language)) in zip(new_char_keys[:20], group_keys[:20]):
+        assert pandas_new_char(df_associations, plain, group) == index.new_char(plain, group)
+        expected = pandas_char_association(df_associations, group_lang, language)
+        assert (tuple(expected["input_char"]), tuple(expected["new_char"])) == \
+            index.char_association(group_lang, language)
+
+    pandas_time = timeit.timeit(lambda: [pandas_new_char(df_associations, plain, group)
+                                         for (group, plain) in new_char_keys], number = 1)
+    index_time = timeit.timeit(lambda: [index.new_char(plain, group)
+                                        for (group, plain) in new_char_keys], number = 1)
+    report("select_new_char", pandas_time, index_time, NUM_LOOKUPS)
+
+    pandas_time = timeit.timeit(lambda: [pandas_char_association(df_associations, group, language)
+                                         for (group, language) in group_keys], number = 1)
+    index_time = timeit.timeit(lambda: [index.char_association(group, language)
+                                        for (group, language) in group_keys], number = 1)
+    report("char_association", pandas_time, index_time, NUM_LOOKUPS)
+
+    groups = [group for (group, _) in group_keys]
+    pandas_time = timeit.timeit(lambda: [pandas_binding(keys_from_groups, group) for group in groups], number = 1)
+    index_time = timeit.timeit(lambda: [index.binding(group) for group in groups], number = 1)
+    report("get_binding", pandas_time, index_time, NUM_LOOKUPS)
+
+
+if (__name__ == "__main__"):
+    main()
@@ -0,0 +1,52 @@
+"""
+Recognizes a synthetic corpus with batch_recognition for 1, 2, 4, ... processes up to the
+number of cores, and prints the throughput and the speedup over a single process, which should
+stay close to the number of processes. Also checks that every run wrote the same results.
+
+Run from the orthosimple folder:
+    python3 -m benchmarks.bench_batch_recognition [num_samples]
+"""
+
+import os
+import sys
+import tempfile
+
+import batch_recognition
+import gesture_dataset
+
+NUM_SAMPLES = 20000
+
+
+def process_counts():
+    counts = [1]
+    while (counts[-1] * 2 <= (os.cpu_count() or 1)):
+        counts.append(counts[-1] * 2)
+    if (counts[-1] != (os.cpu_count() or 1)):
+        counts.append(os.cpu_count())
+    return counts
+
+
+def main():
+    num_samples = int(sys.argv[1]) if (len(sys.argv) > 1) else NUM_SAMPLES
+    with tempfile.TemporaryDirectory() as directory:
+        corpus = os.path.join(directory, "corpus.jsonl")
+        gesture_dataset.dump(corpus, gesture_dataset.synthetic_samples(num_samples))
+
+        outputs = []
+        single_process_seconds = None
+        for processes in process_counts():
+            output = os.path.join(directory, "results%d.jsonl" % processes)
+            report = batch_recognition.recognize_file(corpus, output, processes)
+            single_process_seconds = single_process_seconds or report.seconds
+            print("%s, speedup %.2f" % (batch_recognition.describe(report),
+                                        single_process_seconds / report.seconds))
+            with open(output) as output_file:
+                outputs.append(output_file.read())
+
+    if (any(output != outputs[0] for output in outputs)):
+        print("FAIL: the results depend on the number of processes")
+        sys.exit(1)
+
+
+if (__name__ == "__main__"):
+    main()
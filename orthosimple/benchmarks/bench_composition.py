@@ -0,0 +1,88 @@
+"""
+Checks that composition.CompositionEngine gives the new character of every row of
+associations.csv, and of their uppercase variants, then times its lookups of random ASCII
+letters and accent groups, uncached and memoized, next to the dictionary lookups of
+reader.AssociationIndex. Also prints how many letter and group pairs it composes, and checks
+that its cache stays within its size.
+
+Run from the orthosimple folder:
+    python3 -m benchmarks.bench_composition [num_lookups]
+"""
+
+import random
+import string
+import sys
+import time
+
+import pandas as pd
+
+import composition
+import reader
+
+NUM_LOOKUPS = 200000
+
+
+def lookups_per_s(new_char, pairs):
+    start = time.perf_counter()
+    for (input_char, group) in pairs:
+        try:
+            new_char(input_char, group)
+        except KeyError:
+            pass
+    return len(pairs) / (time.perf_counter() - start)
+
+
+def main():
+    num_lookups = int(sys.argv[1]) if (len(sys.argv) > 1) else NUM_LOOKUPS
+    failures = []
+
+    composer = composition.CompositionEngine()
+    df_associations = pd.read_csv(reader.data_folder / "associations.csv")
+    for (plain, new, language, group) in zip(df_associations["input_char"], df_associations["new_char"],
+                                             df_associations["language_abbrev"],
+                                             df_associations["special_group"]):
+        try:
+            composed = composer.new_char(plain, group)
+        except KeyError:
+            composed = None
+        if (composed != new):
+            failures.append("%s %s + %s gives %r instead of %s" % (language, plain, group, composed, new))
+
+    association_reader = reader.AssociationReader(df_associations, None, None)
+    for ((group, language), (plain_chars, new_chars)) in association_reader.index.char_associations.items():
+        for (plain, new) in zip(plain_chars, new_chars):
+            if ((plain != plain.lower()) and (composer.new_char(plain, group) != new)):
+                failures.append("%s %s + %s differs from the uppercase variant %s" % (language, plain, group, new))
+    print("%d rows of associations.csv checked" % len(df_associations))
+
+    groups = sorted(set(composition.COMBINING_MARKS) | set(group for (group, _) in composition.OVERRIDES))
+    pairs = [(letter, group) for letter in string.ascii_letters for group in groups]
+    composed = 0
+    for (letter, group) in pairs:
+        try:
+            composer.new_char(letter, group)
+            composed += 1
+        except KeyError:
+            pass
+    print("%d of %d ASCII letter and group pairs composed" % (composed, len(pairs)))
+
+    rng = random.Random(0)
+    lookups = [rng.choice(pairs) for _ in range(num_lookups)]
+    index = association_reader.index
+    print("uncached composition: %10.0f lookups/s" %
+          lookups_per_s(composition.CompositionEngine(cache_size = 0).new_char, lookups))
+    print("memoized composition: %10.0f lookups/s" % lookups_per_s(composer.new_char, lookups))
+    print("AssociationIndex:     %10.0f lookups/s" % lookups_per_s(index.new_char, lookups))
+
+    bounded = composition.CompositionEngine(cache_size = 64)
+    lookups_per_s(bounded.new_char, lookups)
+    if (bounded.cache_info().currsize > 64):
+        failures.append("the cache grew past its size")
+
+    for failure in failures:
+        print("FAIL:", failure)
+    sys.exit(1 if failures else 0)
+
+
+if (__name__ == "__main__"):
+    main()
@@ -0,0 +1,115 @@
+"""
+Replays random key streams through the per-group Mappings and through the KeystrokeAutomaton
+compiled from the same rules, checks that both produce the same replacements, and compares the
+time they take per key.
+
+Needs no display: with pynput's dummy backend (PYNPUT_BACKEND=dummy), where every member of
+keyboard.Key is the same one, the special keys are replayed as SpecialKeys instead.
+
+Run from the orthosimple folder:
+    python3 -m benchmarks.bench_keystroke_automaton [keys_per_language]
+"""
+
+import random
+import sys
+import timeit
+from collections import namedtuple
+
+from pynput import keyboard
+
+import language_inputs
+import output_sinks
+import reader
+
+NUM_KEYS = 20000
+
+
+class SpecialKey(namedtuple("SpecialKey", ["name"])):
+    '''
+    A special key seen, like the members of keyboard.Key, through its str: "Key." and its name.
+    '''
+
+    def __str__(self):
+        return "Key." + self.name
+
+
+def special_key(name):
+    key = keyboard.Key[name]
+    return key if (str(key) == "Key." + name) else SpecialKey(name)
+
+
+SPECIAL_KEYS = [special_key(name) for name in ("shift", "caps_lock", "backspace", "space")]
+
+
+def key_stream(rules, num_keys, seed):
+    """
+    Produces num_keys keys made mostly of the characters and bindings that appear in rules, so
+    that the mappings fire often, with some special keys and other letters in between.
+    """
+
+    rng = random.Random(seed)
+    chars = set("abcdefghijklmnopqrstuvwxyz")
+    for rule in rules:
+        chars.update(rule.plain)
+        if (rule.binding is not None):
+            chars.add(rule.binding)
+    chars = sorted(chars)
+
+    keys = []
+    for _ in range(num_keys):
+        if (rng.random() < 0.1):
+            keys.append(rng.choice(SPECIAL_KEYS))
+        else:
+            keys.append(keyboard.KeyCode(char = rng.choice(chars)))
+    return keys
+
+
+def recorded_writes(language, association_reader, keys, reference):
+    """
+    Feeds keys to the reference Mappings of language if reference is True, to its automaton
+    otherwise, and produces the writes they requested, in order.
+    """
+
+    sink = output_sinks.RecordingSink()
+    language_input = language_inputs.LanguageInput(language, association_reader, sink)
+    if (reference):
+        update = update_all(language_input.reference_mappings())
+    else:
+        update = language_input.automaton.update
+    for key in keys:
+        update(key)
+    return sink.writes
+
+
+def update_all(reference):
+    def update(key):
+        for mapping in reference:
+            mapping.writeNewChar(key)
+    return update
+
+
+def main():
+    num_keys = int(sys.argv[1]) if (len(sys.argv) > 1) else NUM_KEYS
+    association_reader = reader.AssociationReader()
+    language_reader = reader.LanguageReader()
+
+    for (seed, language) in enumerate(association_reader.language_groups):
+        language_input = language_inputs.LanguageInput(language, association_reader)
+        keys = key_stream(language_input.rules, num_keys, seed)
+
+        expected = recorded_writes(language, association_reader, keys, True)
+        actual = recorded_writes(language, association_reader, keys, False)
+        assert actual == expected, "automaton diverges from the Mappings for " + language
+
+        mapping_time = timeit.timeit(lambda: recorded_writes(language, association_reader, keys, True),
+                                     number = 1)
+        automaton_time = timeit.timeit(lambda: recorded_writes(language, association_reader, keys, False),
+                                       number = 1)
+
+        print("%-8s %2d groups  %5d replacements  mappings %6.2f us/key  automaton %6.2f us/key" %
+              (language_reader.full_name(language), len(language_input.rules), len(expected),
+               mapping_time / num_keys * 1e6, automaton_time / num_keys * 1e6))
+
+
+if (__name__ == "__main__"):
+    main()
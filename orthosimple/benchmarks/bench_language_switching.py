@@ -0,0 +1,103 @@
+"""
+Compares switching language by building a new LanguageInput, as the Settings menu used to, with
+switching to a preloaded one, and prints the time and the memory allocated per switch. Also
+prints the memory each preloaded language takes, and the size of the merged automata of every
+pair of languages and of all of them, after checking that merging a language's Rules alone
+types the same as the language, and that no key fires two Rules of a merged automaton.
+
+Run from the orthosimple folder:
+    python3 -m benchmarks.bench_language_switching [num_switches]
+"""
+
+import sys
+import time
+import tracemalloc
+from itertools import combinations
+
+import key_event_hub
+import keystroke_automaton
+import language_inputs
+import output_sinks
+import reader
+from benchmarks.bench_keystroke_automaton import key_stream
+
+NUM_SWITCHES = 2000
+
+
+def switch_cost(listener, next_input, num_switches):
+    """
+    Produces the time per switch, in microseconds, and the memory allocated by the switches and
+    kept, in bytes per switch.
+    """
+
+    start = time.perf_counter()
+    for switch in range(num_switches):
+        listener.update_language(next_input(switch))
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for switch in range(min(num_switches, 50)):
+        listener.update_language(next_input(switch))
+    growth = sum(stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(before, "filename"))
+    tracemalloc.stop()
+    return (elapsed / num_switches * 1e6, growth / min(num_switches, 50))
+
+
+def allocated(build):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    built = build()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return (built, size)
+
+
+def writes(automaton_rules, keys):
+    sink = output_sinks.RecordingSink()
+    automaton = keystroke_automaton.KeystrokeAutomaton(automaton_rules, sink)
+    for key in keys:
+        automaton.update(key)
+    return sink.writes
+
+
+def main():
+    num_switches = int(sys.argv[1]) if (len(sys.argv) > 1) else NUM_SWITCHES
+    association_reader = reader.AssociationReader()
+    sink = output_sinks.RecordingSink()
+    abbrevs = list(association_reader.language_groups)
+
+    preloaded = language_inputs.PreloadedLanguages(association_reader, sink)
+    for abbrev in abbrevs:
+        (_, size) = allocated(lambda: language_inputs.LanguageInput(abbrev, association_reader, sink))
+        print("%s: %5.1f KiB loaded, %d rules" % (abbrev, size / 1024, len(preloaded.inputs[abbrev].rules)))
+
+    failures = []
+    for (seed, abbrev) in enumerate(abbrevs):
+        rules = preloaded.inputs[abbrev].rules
+        keys = key_stream(rules, 5000, seed)
+        if (writes(keystroke_automaton.merge_rules([rules]), keys) != writes(rules, keys)):
+            failures.append("merging %s alone changes what it types" % abbrev)
+
+    for languages in [pair for pair in combinations(abbrevs, 2)] + [tuple(abbrevs)]:
+        (merged, size) = allocated(lambda: preloaded.get(languages))
+        fired = [(rule.binding, plain) for rule in merged.rules for plain in rule.plain]
+        if (len(fired) != len(set(fired))):
+            failures.append("a key fires two rules for " + "+".join(languages))
+        print("%-14s merged: %5.1f KiB, %d rules" % ("+".join(languages), size / 1024, len(merged.rules)))
+
+    listener = language_inputs.KeyboardListener(preloaded.inputs[abbrevs[0]], key_event_hub.KeyEventHub())
+    rebuilt = switch_cost(listener, lambda switch: language_inputs.LanguageInput(
+        abbrevs[switch % len(abbrevs)], association_reader, sink), num_switches)
+    swapped = switch_cost(listener, lambda switch: preloaded.inputs[abbrevs[switch % len(abbrevs)]],
+                          num_switches)
+    print("rebuilt on switch:   %8.2f us per switch, %8.1f bytes allocated" % rebuilt)
+    print("preloaded, swapped:  %8.2f us per switch, %8.1f bytes allocated" % swapped)
+
+    for failure in failures:
+        print("FAIL:", failure)
+    sys.exit(1 if failures else 0)
+
+
+if (__name__ == "__main__"):
+    main()
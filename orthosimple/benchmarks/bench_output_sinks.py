@@ -0,0 +1,47 @@
+"""
+Measures the time each output backend takes to replace a typed pair of characters with an
+accented character, for both the pasted and the manually entered (MANUAL_CHARS) paths.
+
+The pyautogui and batched backends send real key events to the focused window: run this with
+a scratch text editor focused. Backends that cannot start (e.g. without a display) are skipped.
+
+Run from the orthosimple folder:
+    python3 -m benchmarks.bench_output_sinks [backend ...]
+"""
+
+import sys
+import time
+
+import output_sinks
+
+NUM_CHARS = 20
+SAMPLES = [("e", "é"), ("E", "Ê")] # a pasted and a manually entered character on linux
+FOCUS_DELAY = 3
+
+
+def time_backend(sink, letter_typed, new_char, num_chars):
+    start = time.perf_counter()
+    for _ in range(num_chars):
+        sink.replace(letter_typed, new_char)
+    return (time.perf_counter() - start) / num_chars
+
+
+def main():
+    backends = sys.argv[1:] if (len(sys.argv) > 1) else list(output_sinks.BACKENDS)
+    if (any(backend != "recording" for backend in backends)):
+        print("focus a text editor, sending keys in %d seconds" % FOCUS_DELAY)
+        time.sleep(FOCUS_DELAY)
+
+    for backend in backends:
+        sink = output_sinks.create(backend)
+        for (letter_typed, new_char) in SAMPLES:
+            try:
+                per_char = time_backend(sink, letter_typed, new_char, NUM_CHARS)
+            except Exception as error:
+                print("%-10s unavailable: %s" % (backend, error))
+                break
+            print("%-10s %s -> %s  %10.3f ms/char" % (backend, letter_typed, new_char, per_char * 1000))
+
+
+if (__name__ == "__main__"):
+    main()
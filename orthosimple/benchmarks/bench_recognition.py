@@ -0,0 +1,186 @@
+"""
+Replays a gesture dataset (see gesture_dataset) through a recognizer backend for several numbers
+of sample points, and reports for each one the latency percentiles, the recognitions per second
+and the top-1 accuracy, as JSON. With --baseline, the results are compared with an earlier
+report and the exit status is 1 if throughput or accuracy regressed.
+
+The racket backend is a recognizer server spawned locally on a free port, so the suite needs no
+network and no running OrthoSimple. Without a dataset file, a synthetic one is generated from
+the templates.
+
+Run from the orthosimple folder:
+    python3 -m benchmarks.bench_recognition [--dataset FILE] [--backend racket|numpy]
+        [--sample-points 5,10,20] [--output FILE] [--baseline FILE]
+"""
+
+import argparse
+import json
+import socket
+import subprocess
+import sys
+import time
+
+import gesture_dataset
+import gesture_recognizer
+
+SAMPLE_POINTS = [5, 10, 20, 40]
+NUM_SYNTHETIC_SAMPLES = 500
+SERVER_START_TIMEOUT = 30 # seconds
+MAX_THROUGHPUT_REGRESSION = 0.10
+MAX_ACCURACY_REGRESSION = 0.0
+
+
+def percentile(sorted_values, percent):
+    index = min(len(sorted_values) - 1, max(0, round(len(sorted_values) * percent / 100) - 1))
+    return sorted_values[index]
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+class RacketServer:
+    '''
+    A recognizer server started for the duration of a with block, and a SocketRecognizer
+    connected to it.
+    '''
+
+    def __init__(self, num_sample_points):
+        self.num_sample_points = num_sample_points
+
+    def __enter__(self):
+        port = free_port()
+        self.process = subprocess.Popen(["racket", "recognizer/init_recognize.rkt", str(port)])
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        while (True):
+            try:
+                self.socket = socket.create_connection(("127.0.0.1", port))
+                break
+            except ConnectionRefusedError:
+                if ((time.monotonic() > deadline) or (self.process.poll() is not None)):
+                    self.process.kill()
+                    raise RuntimeError("the recognizer server did not start")
+                time.sleep(0.1)
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return gesture_recognizer.SocketRecognizer(self.socket, self.num_sample_points)
+
+    def __exit__(self, *exc_info):
+        self.socket.close()
+        try:
+            self.process.wait(timeout = 5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+class InProcess:
+    def __init__(self, num_sample_points):
+        self.num_sample_points = num_sample_points
+
+    def __enter__(self):
+        return gesture_recognizer.NumpyRecognizer(self.num_sample_points)
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+BACKENDS = {"racket": RacketServer, "numpy": InProcess}
+
+
+def replay(recognizer, samples):
+    """
+    Recognizes every sample once, and produces the latency of each recognition in nanoseconds
+    and the number of samples whose letter, accent, and both, were recognized.
+    """
+
+    recognizer.recognize(samples[0].strokes) # warms up the templates for this number of points
+    latencies = []
+    correct = {"letter": 0, "accent": 0, "top1": 0}
+    for sample in samples:
+        start = time.perf_counter_ns()
+        (letter, accent) = recognizer.recognize(sample.strokes)
+        latencies.append(time.perf_counter_ns() - start)
+        correct["letter"] += (letter == sample.letter)
+        correct["accent"] += (accent == sample.accent)
+        correct["top1"] += ((letter == sample.letter) and (accent == sample.accent))
+    return (latencies, correct)
+
+
+def measure(backend, samples, num_sample_points):
+    with BACKENDS[backend](num_sample_points) as recognizer:
+        start = time.perf_counter()
+        (latencies, correct) = replay(recognizer, samples)
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    result = {"num_sample_points": num_sample_points,
+              "recognitions_per_s": len(samples) / elapsed,
+              "mean_us": sum(latencies) / len(latencies) / 1000}
+    for percent in (50, 90, 99):
+        result["p%d_us" % percent] = percentile(latencies, percent) / 1000
+    result["max_us"] = latencies[-1] / 1000
+    for (name, count) in correct.items():
+        result[name + "_accuracy"] = count / len(samples)
+    return result
+
+
+def regressions(report, baseline):
+    """
+    Produces a description of each result of report that is worse than the one of baseline
+    with the same number of sample points.
+    """
+
+    found = []
+    baseline_results = dict((result["num_sample_points"], result) for result in baseline["results"])
+    for result in report["results"]:
+        previous = baseline_results.get(result["num_sample_points"])
+        if (previous is None):
+            continue
+        if (result["recognitions_per_s"] < previous["recognitions_per_s"] * (1 - MAX_THROUGHPUT_REGRESSION)):
+            found.append("%d points: %.0f recognitions/s, was %.0f" %
+                         (result["num_sample_points"], result["recognitions_per_s"],
+                          previous["recognitions_per_s"]))
+        if (result["top1_accuracy"] < previous["top1_accuracy"] - MAX_ACCURACY_REGRESSION):
+            found.append("%d points: top-1 accuracy %.4f, was %.4f" %
+                         (result["num_sample_points"], result["top1_accuracy"], previous["top1_accuracy"]))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Recognition throughput and accuracy benchmark")
+    parser.add_argument("--dataset", help = "a gesture_dataset file (default: synthetic samples)")
+    parser.add_argument("--backend", choices = sorted(BACKENDS), default = "racket")
+    parser.add_argument("--sample-points", default = ",".join(map(str, SAMPLE_POINTS)),
+                        help = "comma separated numbers of sample points")
+    parser.add_argument("--output", help = "write the JSON report to this file instead of stdout")
+    parser.add_argument("--baseline", help = "a previous JSON report to compare with")
+    arguments = parser.parse_args()
+
+    if (arguments.dataset is None):
+        samples = gesture_dataset.synthetic_samples(NUM_SYNTHETIC_SAMPLES)
+    else:
+        samples = gesture_dataset.load(arguments.dataset)
+
+    report = {"backend": arguments.backend, "dataset": arguments.dataset or "synthetic",
+              "num_samples": len(samples), "time": time.time(),
+              "results": [measure(arguments.backend, samples, int(num_sample_points))
+                          for num_sample_points in arguments.sample_points.split(",")]}
+
+    if (arguments.output is None):
+        json.dump(report, sys.stdout, indent = 2)
+        print()
+    else:
+        with open(arguments.output, "w") as output_file:
+            json.dump(report, output_file, indent = 2)
+
+    if (arguments.baseline is not None):
+        with open(arguments.baseline) as baseline_file:
+            found = regressions(report, json.load(baseline_file))
+        for regression in found:
+            print("regression:", regression, file = sys.stderr)
+        sys.exit(1 if found else 0)
+
+
+if (__name__ == "__main__"):
+    main()
@@ -0,0 +1,148 @@
+"""
+Replays a user drawing a handful of gestures over and over through a CachedRecognizer, for
+several quanta and amounts of jitter, and prints the hit rate, the median latency of hits,
+misses and the recognizer alone, and how often the cached answer is the one the recognizer
+gives for the gesture itself. The cache does not guarantee that agreement: run with the racket
+backend to measure it against the recognizer the application uses. Each repetition is one of
+NUM_DISTINCT synthetic gestures, picked with Zipf frequencies, moved as a whole and with each
+point moved by up to jitter pixels.
+
+Also checks that exact repetitions always get the recognizer's answer, that the cache keeps at
+most its capacity, that streams get the same answers as recognize, and that changing the
+template library file empties the cache.
+
+Run from the orthosimple folder:
+    python3 -m benchmarks.bench_recognition_cache [num_gestures] [numpy|racket]
+"""
+
+import random
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import gesture_dataset
+import gesture_recognizer
+import recognition_cache
+from benchmarks.bench_recognition import BACKENDS, percentile
+
+NUM_GESTURES = 2000
+NUM_DISTINCT = 12
+QUANTA = [5, 10, 20]
+JITTERS = [0, 1, 3, 6]
+STREAM_CHUNK_POINTS = 16
+
+
+def workload(num_gestures, jitter, seed):
+    rng = random.Random(seed)
+    bases = gesture_dataset.synthetic_samples(NUM_DISTINCT, seed)
+    weights = [1 / (rank + 1) for rank in range(NUM_DISTINCT)]
+    samples = []
+    for _ in range(num_gestures):
+        base = rng.choices(bases, weights)[0]
+        (dx, dy) = (rng.randint(-50, 50), rng.randint(-50, 50))
+        samples.append([[(x + dx + rng.randint(-jitter, jitter), y + dy + rng.randint(-jitter, jitter))
+                         for (x, y) in stroke] for stroke in base.strokes])
+    return samples
+
+
+def timed(recognize, samples):
+    results = []
+    latencies = []
+    for strokes in samples:
+        start = time.perf_counter_ns()
+        results.append(recognize(strokes))
+        latencies.append(time.perf_counter_ns() - start)
+    return (results, latencies)
+
+
+def median_us(latencies):
+    return ("%7.1f us" % (percentile(sorted(latencies), 50) / 1000)) if latencies else "      - us"
+
+
+def streamed(recognizer, strokes, finish_latencies):
+    """
+    Produces the result of strokes sent to a stream of recognizer by chunks, as the
+    DrawingTransformer does, and appends the time finishing the stream took to finish_latencies.
+    """
+
+    stream = recognizer.open_stream()
+    for (index, stroke) in enumerate(strokes):
+        for start in range(0, len(stroke), STREAM_CHUNK_POINTS):
+            stream.add_points(index, stroke[start:start + STREAM_CHUNK_POINTS])
+    start = time.perf_counter_ns()
+    result = stream.finish()
+    finish_latencies.append(time.perf_counter_ns() - start)
+    return result
+
+
+def check_invalidation(recognizer, samples, failures):
+    with tempfile.TemporaryDirectory() as folder:
+        templates_file = Path(folder) / "gesture_associations.rkt"
+        shutil.copyfile(gesture_recognizer.TEMPLATES_FILE, templates_file)
+        cached = recognition_cache.CachedRecognizer(recognizer, templates_file = templates_file,
+                                                    check_interval = 0)
+        cached.recognize(samples[0])
+        with open(templates_file, "a") as templates:
+            templates.write("\n; changed\n")
+        cached.recognize(samples[0])
+        if ((cached.stats()["invalidations"] != 1) or (cached.stats()["hits"] != 0)):
+            failures.append("changing the templates did not empty the cache")
+        cached.recognize(samples[0])
+        if (cached.stats()["hits"] != 1):
+            failures.append("the cache is not filled again once emptied")
+
+
+def main():
+    num_gestures = int(sys.argv[1]) if (len(sys.argv) > 1) else NUM_GESTURES
+    backend = sys.argv[2] if (len(sys.argv) > 2) else "numpy"
+    failures = []
+
+    with BACKENDS[backend](gesture_recognizer.NUM_SAMPLE_POINTS) as recognizer:
+        for jitter in JITTERS:
+            samples = workload(num_gestures, jitter, jitter)
+            (expected, uncached_latencies) = timed(recognizer.recognize, samples)
+            for quantum in QUANTA:
+                cached = recognition_cache.CachedRecognizer(recognizer, quantum = quantum)
+                results = []
+                hits = []
+                misses = []
+                for strokes in samples:
+                    previous_hits = cached.hits
+                    start = time.perf_counter_ns()
+                    results.append(cached.recognize(strokes))
+                    elapsed = time.perf_counter_ns() - start
+                    (hits if (cached.hits > previous_hits) else misses).append(elapsed)
+                stats = cached.stats()
+                if (stats["size"] > stats["capacity"]):
+                    failures.append("the cache holds %d results for %d" % (stats["size"], stats["capacity"]))
+
+                agreement = sum(result == answer for (result, answer) in zip(results, expected)) / len(samples)
+                if ((jitter == 0) and (agreement != 1)):
+                    failures.append("exact repetitions got other answers with quantum %d" % quantum)
+                print("jitter %d px, quantum %2d: hit rate %5.1f%%, hit %s, miss %s, "
+                      "recognizer %s, agreement %5.1f%%" %
+                      (jitter, quantum, stats["hit_rate"] * 100, median_us(hits), median_us(misses),
+                       median_us(uncached_latencies), agreement * 100))
+
+        samples = workload(200, 0, 0)
+        cached = recognition_cache.CachedRecognizer(recognizer)
+        expected = [cached.recognize(strokes) for strokes in samples]
+        finish_latencies = dict({"recognizer": [], "cold cache": [], "warm cache": []})
+        for (name, streamed_recognizer) in (("recognizer", recognizer),
+                                            ("cold cache", recognition_cache.CachedRecognizer(recognizer)),
+                                            ("warm cache", cached)):
+            if ([streamed(streamed_recognizer, strokes, finish_latencies[name]) for strokes in samples] != expected):
+                failures.append("streams answer differently from recognize with the " + name)
+        print("stream finish: " + ", ".join("%s %s" % (name, median_us(latencies))
+                                             for (name, latencies) in finish_latencies.items()))
+        check_invalidation(recognizer, samples, failures)
+
+    for failure in sorted(set(failures)):
+        print("FAIL:", failure)
+    sys.exit(1 if failures else 0)
+
+
+if (__name__ == "__main__"):
+    main()
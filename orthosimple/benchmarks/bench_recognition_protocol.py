@@ -0,0 +1,110 @@
+"""
+Measures the throughput of the text and binary recognizer protocols over a loopback connection.
+A server thread parses every request the way the racket server does (a python literal, or a
+recognize frame) and answers with fixed symbols, so the numbers are the cost of the protocol
+alone. Binary requests are sent one at a time, then pipelined PIPELINE_DEPTH at a time.
+
+Run from the orthosimple folder:
+    python3 -m benchmarks.bench_recognition_protocol [num_requests]
+"""
+
+import ast
+import socket
+import sys
+import threading
+import time
+
+import gesture_recognizer
+import recognition_protocol
+
+NUM_REQUESTS = 5000
+PIPELINE_DEPTH = 16
+
+
+def serve_text(connection):
+    """
+    Reads python literals until each one is complete, then answers with two padded symbols.
+    """
+
+    buffer = b""
+    while (True):
+        received = connection.recv(65536)
+        if (not received):
+            return
+        buffer += received
+        while ((buffer.count(b"[") > 0) and (buffer.count(b"[") == buffer.count(b"]"))):
+            ast.literal_eval(buffer.decode("utf-8"))
+            buffer = b""
+            connection.sendall(('"%-14s"' % "a acute").encode("utf-8"))
+
+
+def serve_frames(connection):
+    frame_reader = recognition_protocol.FrameReader(connection)
+    answer = recognition_protocol.encode_result([("a", 12.5), ("acute", 30.25)])
+    while (True):
+        frame = frame_reader.read_frame()
+        if (frame is None):
+            return
+        recognition_protocol.decode_recognize(frame[2])
+        connection.sendall(recognition_protocol.encode_frame(recognition_protocol.RESULT, frame[1],
+                                                             answer))
+
+
+def connect(serve):
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(1)
+    client = socket.create_connection(listener.getsockname())
+    client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    (connection, address) = listener.accept()
+    connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    listener.close()
+    threading.Thread(target = serve, args = (connection,), daemon = True).start()
+    return client
+
+
+def sample_strokes():
+    letters = gesture_recognizer.load_templates()["letters"]
+    accents = gesture_recognizer.load_templates()["accents"]
+    return [[list(letter), list(accent)] for (_, letter) in letters for (_, accent) in accents]
+
+
+def report(name, num_requests, elapsed, request_bytes):
+    print("%-18s %8.0f requests/s  %7.1f us/request  %6.0f bytes/request" %
+          (name, num_requests / elapsed, elapsed / num_requests * 1e6, request_bytes))
+
+
+def main():
+    num_requests = int(sys.argv[1]) if (len(sys.argv) > 1) else NUM_REQUESTS
+    samples = sample_strokes()
+    requests = [samples[index % len(samples)] for index in range(num_requests)]
+
+    client = connect(serve_text)
+    recognizer = gesture_recognizer.TextSocketRecognizer(client)
+    start = time.perf_counter()
+    for strokes in requests:
+        recognizer.recognize(strokes)
+    report("text", num_requests, time.perf_counter() - start,
+           sum(len(repr(strokes)) for strokes in requests) / num_requests)
+    client.close()
+
+    frame_bytes = sum(recognition_protocol.HEADER.size +
+                      len(recognition_protocol.encode_recognize(10, strokes))
+                      for strokes in requests) / num_requests
+
+    client = connect(serve_frames)
+    recognizer = gesture_recognizer.SocketRecognizer(client)
+    start = time.perf_counter()
+    for strokes in requests:
+        recognizer.recognize(strokes)
+    report("binary", num_requests, time.perf_counter() - start, frame_bytes)
+
+    start = time.perf_counter()
+    for index in range(0, num_requests, PIPELINE_DEPTH):
+        recognizer.recognize_many(requests[index:index + PIPELINE_DEPTH])
+    report("binary pipelined", num_requests, time.perf_counter() - start, frame_bytes)
+    client.close()
+
+
+if (__name__ == "__main__"):
+    main()
@@ -0,0 +1,87 @@
+"""
+Times loading the association tables at startup, each time in a new interpreter: cold, with no
+bundle, so the CSV files are parsed with pandas, the summary generated and the bundle written,
+and warm, from the bundle of the current CSV files. Checks that the bundle holds the same tables
+as compiling the CSV files again, that a warm start does not import pandas, and that a bundle
+of other sources, or a damaged one, is not used.
+
+Uses a bundle and a summary file in a temporary folder, so src_data is left as it is.
+
+Run from the orthosimple folder:
+    python3 -m benchmarks.bench_startup_bundle [num_starts]
+"""
+
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import association_bundle
+import reader
+
+NUM_STARTS = 10
+STARTUP = """
+import sys
+import time
+start = time.perf_counter()
+import reader
+reader.compiled_tables(reader.Path(sys.argv[1]))
+reader.AssociationReader(summary_file = sys.argv[2])
+reader.LanguageReader()
+print(time.perf_counter() - start, "pandas" in sys.modules)
+"""
+
+
+def start(bundle_file, summary_file):
+    """
+    Produces the time a new interpreter took to load the tables, in seconds, and whether it
+    imported pandas.
+    """
+
+    output = subprocess.run([sys.executable, "-c", STARTUP, str(bundle_file), str(summary_file)],
+                            capture_output = True, text = True, check = True).stdout.split()
+    return (float(output[0]), output[1] == "True")
+
+
+def main():
+    num_starts = int(sys.argv[1]) if (len(sys.argv) > 1) else NUM_STARTS
+    failures = []
+    with tempfile.TemporaryDirectory() as folder:
+        bundle_file = Path(folder) / "associations.bundle"
+        summary_file = Path(folder) / "text_association.txt"
+
+        timings = dict({"cold": [], "warm": []})
+        for _ in range(num_starts):
+            bundle_file.unlink(missing_ok = True)
+            summary_file.unlink(missing_ok = True)
+            (elapsed, _) = start(bundle_file, summary_file)
+            timings["cold"].append(elapsed)
+            (elapsed, imported_pandas) = start(bundle_file, summary_file)
+            timings["warm"].append(elapsed)
+            if (imported_pandas):
+                failures.append("a warm start imported pandas")
+        for (name, elapsed) in timings.items():
+            elapsed.sort()
+            print("%s start: median %7.1f ms, min %7.1f ms" %
+                  (name, elapsed[len(elapsed) // 2] * 1000, elapsed[0] * 1000))
+        if (timings["warm"][len(timings["warm"]) // 2] >= timings["cold"][len(timings["cold"]) // 2]):
+            failures.append("warm starts are not faster than cold ones")
+
+        digest = association_bundle.source_hash([reader.data_folder / name for name in reader.SOURCE_FILES])
+        if (association_bundle.load(bundle_file, digest) != reader.compile_tables()):
+            failures.append("the bundle differs from the compiled CSV files")
+        if (summary_file.read_text() != reader.SUMMARY_FILE.read_text()):
+            failures.append("the summary written differs from " + str(reader.SUMMARY_FILE))
+        if (association_bundle.load(bundle_file, bytes(len(digest))) is not None):
+            failures.append("a bundle of other sources was used")
+        bundle_file.write_bytes(bundle_file.read_bytes()[:association_bundle.HEADER.size + 10])
+        if (association_bundle.load(bundle_file, digest) is not None):
+            failures.append("a truncated bundle was used")
+
+    for failure in failures:
+        print("FAIL:", failure)
+    sys.exit(1 if failures else 0)
+
+
+if (__name__ == "__main__"):
+    main()
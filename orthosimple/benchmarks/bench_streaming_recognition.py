@@ -0,0 +1,82 @@
+"""
+Measures the time left between the release of the second stroke and the recognized gesture,
+when the whole gesture is recognized on release and when its points were streamed while it was
+drawn (the last chunk and finish). The template gestures are stretched to longer strokes by
+linear interpolation. Uses the in-process NumpyRecognizer, whose streams keep the same state as
+the racket server's.
+
+Run from the orthosimple folder:
+    python3 -m benchmarks.bench_streaming_recognition
+"""
+
+import time
+
+import gesture_recognizer
+
+STROKE_POINTS = [50, 200, 1000, 5000]
+CHUNK_POINTS = 16
+REPEATS = 20
+
+
+def stretch(gesture, num_points):
+    """
+    Produces num_points points along gesture, spread evenly between its points.
+    """
+
+    segments = len(gesture) - 1
+    stretched = []
+    for index in range(num_points):
+        position = index * segments / (num_points - 1)
+        segment = min(int(position), segments - 1)
+        fraction = position - segment
+        ((x1, y1), (x2, y2)) = (gesture[segment], gesture[segment + 1])
+        stretched.append((round(x1 + (x2 - x1) * fraction), round(y1 + (y2 - y1) * fraction)))
+    return stretched
+
+
+def time_on_release(recognizer, strokes):
+    start = time.perf_counter()
+    result = recognizer.recognize(strokes)
+    return (time.perf_counter() - start, result)
+
+
+def time_streamed(recognizer, strokes):
+    stream = recognizer.open_stream()
+    last_chunk = None
+    for (stroke_index, stroke) in enumerate(strokes):
+        for start in range(0, len(stroke), CHUNK_POINTS):
+            if (last_chunk is not None):
+                stream.add_points(*last_chunk)
+            last_chunk = (stroke_index, stroke[start:start + CHUNK_POINTS])
+
+    start = time.perf_counter()
+    stream.add_points(*last_chunk)
+    result = stream.finish()
+    return (time.perf_counter() - start, result)
+
+
+def main():
+    recognizer = gesture_recognizer.NumpyRecognizer()
+    templates = gesture_recognizer.load_templates()
+    pairs = [(letter, accent) for (_, letter) in templates["letters"] for (_, accent) in templates["accents"]]
+
+    for num_points in STROKE_POINTS:
+        gestures = [[stretch(letter, num_points), stretch(accent, num_points // 4)]
+                    for (letter, accent) in pairs]
+        on_release = 0
+        streamed = 0
+        for _ in range(REPEATS):
+            for strokes in gestures:
+                (release_time, expected) = time_on_release(recognizer, strokes)
+                (stream_time, actual) = time_streamed(recognizer, strokes)
+                assert actual == expected, "streamed recognition diverges"
+                on_release += release_time
+                streamed += stream_time
+
+        num_gestures = REPEATS * len(gestures)
+        print("%5d point strokes  on release %7.1f us  streamed %7.1f us" %
+              (num_points, on_release / num_gestures * 1e6, streamed / num_gestures * 1e6))
+
+
+if (__name__ == "__main__"):
+    main()
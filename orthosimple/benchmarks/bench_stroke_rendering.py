@@ -0,0 +1,125 @@
+"""
+Feeds synthetic motion events to a DrawingTransformer and prints the time spent in the motion
+handler per event, the time spent redrawing per event, the number of canvas items and the time
+to reset the canvas. The current drawing, which extends one line item per stroke at most once
+per REDRAW_INTERVAL, is compared with the previous one, which created a line item per event.
+
+The events arrive REDRAW_INTERVAL / EVENTS_PER_REDRAW apart, as from a fast mouse, and each
+stroke is a spiral of num_points points.
+
+Needs a display. Uses the numpy recognizer, so the racket server is not needed.
+
+Run from the orthosimple folder:
+    python3 -m benchmarks.bench_stroke_rendering [num_points]
+"""
+
+import math
+import sys
+import time
+import tkinter as tk
+from collections import namedtuple
+
+import async_recognizer
+import gesture_recognizer
+from drawing_transformer import DrawingTransformer
+
+NUM_POINTS = 2000
+EVENTS_PER_REDRAW = 8
+REPEATS = 5
+
+Event = namedtuple("Event", ["x", "y"])
+
+
+class SegmentDrawingTransformer(DrawingTransformer):
+    '''
+    The previous drawing: a line item for every motion event, drawn at once.
+    '''
+
+    def onPress(self, event):
+        self.strokes.append(list())
+        self.strokes[self.strokesCount].append((event.x, event.y))
+        self.sentStrokes.append(list())
+        self.prevX = event.x
+        self.prevY = event.y
+
+        if (DrawingTransformer.STREAMING and (self.strokesCount == 0)):
+            self.stream = self.recognizer.open_stream()
+        self.streamedCount = 0
+
+    def onMove(self, event):
+        self.canvas.create_line(event.x, event.y, self.prevX, self.prevY, width = 2)
+        self.strokes[self.strokesCount].append((event.x, event.y))
+        self.prevX = event.x
+        self.prevY = event.y
+
+        if (len(self.strokes[self.strokesCount]) - self.streamedCount >= DrawingTransformer.STREAM_CHUNK_POINTS):
+            self.streamPoints()
+
+    def redrawStroke(self):
+        pass
+
+
+def spiral(num_points):
+    side = DrawingTransformer.CANVAS_SIDE
+    return [Event(round(side / 2 + (side / 2 - 10) * k / num_points * math.cos(k / 20)),
+                  round(side / 2 + (side / 2 - 10) * k / num_points * math.sin(k / 20)))
+            for k in range(num_points)]
+
+
+def draw(drawing, events):
+    """
+    Draws a stroke through events, running the pending Tk work (the redraws) after every
+    EVENTS_PER_REDRAW events as the event loop would, and produces the time spent in the motion
+    handler and in Tk, and the number of canvas items.
+    """
+
+    handler_seconds = 0
+    tk_seconds = 0
+    drawing.onPress(events[0])
+    for (k, event) in enumerate(events[1:]):
+        start = time.perf_counter()
+        drawing.onMove(event)
+        handler_seconds += time.perf_counter() - start
+        if (k % EVENTS_PER_REDRAW == EVENTS_PER_REDRAW - 1):
+            start = time.perf_counter()
+            if (drawing.redrawJob is not None):
+                drawing.cancelRedraw()
+                drawing.redrawStroke()
+            drawing.update()
+            tk_seconds += time.perf_counter() - start
+    start = time.perf_counter()
+    drawing.onRelease(events[-1])
+    drawing.update()
+    tk_seconds += time.perf_counter() - start
+    return (handler_seconds, tk_seconds, len(drawing.canvas.find_all()))
+
+
+def main():
+    num_points = int(sys.argv[1]) if (len(sys.argv) > 1) else NUM_POINTS
+    root = tk.Tk()
+    recognizer = gesture_recognizer.NumpyRecognizer()
+    events = spiral(num_points)
+
+    for (name, drawing_class) in (("one item per event", SegmentDrawingTransformer),
+                                  ("one item per stroke", DrawingTransformer)):
+        drawing = drawing_class(root, None, None, recognizer,
+                                async_recognizer.AsyncRecognizer(root))
+        drawing.pack()
+        drawing.update()
+        results = []
+        for _ in range(REPEATS):
+            (handler_seconds, tk_seconds, items) = draw(drawing, events)
+            start = time.perf_counter()
+            drawing.reset(None)
+            drawing.update()
+            results.append((handler_seconds, tk_seconds, items, time.perf_counter() - start))
+        (handler_seconds, tk_seconds, items, reset_seconds) = min(results)
+        print("%s: %.2f us handler + %.2f us tk per event, %d canvas items, %.2f ms reset" %
+              (name, handler_seconds / num_points * 1e6, tk_seconds / num_points * 1e6, items,
+               reset_seconds * 1000))
+        drawing.destroy()
+    root.destroy()
+
+
+if (__name__ == "__main__"):
+    main()
@@ -0,0 +1,96 @@
+"""
+Simplifies the strokes of a gesture dataset with StrokeSimplifiers of several minimum distances
+and epsilons, and prints how often the recognizer finds the same letter and accent as with the
+whole strokes, how often simplify_strokes kept the whole strokes, the points and bytes sent per
+gesture, and the median time from release to result: the simplification, encoding of the
+recognize frame and recognition with the numpy recognizer. Fails if a result differs from the
+whole strokes'. The time is only reported: the numpy recognizer samples the whole strokes about
+as fast as the simplification goes through them, and the bytes saved count on the racket
+server's socket.
+
+Without a dataset file, the synthetic samples of gesture_dataset are resampled to one point
+every 0.7 to 2.5 pixels with some repeated points, as the motion events of a mouse are.
+
+Run from the orthosimple folder:
+    python3 -m benchmarks.bench_stroke_simplification [dataset]
+"""
+
+import math
+import random
+import statistics
+import sys
+import time
+
+import gesture_dataset
+import gesture_recognizer
+import recognition_protocol
+from stroke_simplification import StrokeSimplifier
+
+NUM_SYNTHETIC_SAMPLES = 500
+REPEATS = 5
+SETTINGS = [("whole strokes", None),
+            ("2 px, 1 px", StrokeSimplifier(min_distance = 2, epsilon = 1)),
+            ("4 px, 4 px", StrokeSimplifier()),
+            ("8 px, 8 px", StrokeSimplifier(min_distance = 8, epsilon = 8))]
+
+
+def mouse_like(stroke, rng):
+    dense = [stroke[0]]
+    for ((x1, y1), (x2, y2)) in zip(stroke, stroke[1:]):
+        steps = max(1, int(math.dist((x1, y1), (x2, y2)) / rng.uniform(0.7, 2.5)))
+        for step in range(1, steps + 1):
+            dense.append((round(x1 + (x2 - x1) * step / steps), round(y1 + (y2 - y1) * step / steps)))
+            if (rng.random() < 0.2):
+                dense.append(dense[-1])
+    return dense
+
+
+def release_to_result(recognizer, simplifier, strokes):
+    if (simplifier is not None):
+        strokes = simplifier.simplify_strokes(strokes)
+    frame = recognition_protocol.encode_frame(recognition_protocol.RECOGNIZE, 0,
+                                              recognition_protocol.encode_recognize(
+                                                  gesture_recognizer.NUM_SAMPLE_POINTS, strokes))
+    return (strokes, len(frame), recognizer.recognize(strokes))
+
+
+def main():
+    if (len(sys.argv) > 1):
+        gestures = [sample.strokes for sample in gesture_dataset.load(sys.argv[1])]
+    else:
+        rng = random.Random(0)
+        gestures = [[mouse_like(stroke, rng) for stroke in sample.strokes]
+                    for sample in gesture_dataset.synthetic_samples(NUM_SYNTHETIC_SAMPLES)]
+
+    recognizer = gesture_recognizer.NumpyRecognizer()
+    whole_results = [recognizer.recognize(strokes) for strokes in gestures]
+    failures = []
+    medians = dict({})
+    for (name, simplifier) in SETTINGS:
+        (agreeing, kept_whole, points, frame_bytes) = (0, 0, 0, 0)
+        latencies = []
+        for (strokes, whole_result) in zip(gestures, whole_results):
+            (sent, size, result) = release_to_result(recognizer, simplifier, strokes)
+            agreeing += (result == whole_result)
+            kept_whole += ((simplifier is not None) and (sent is strokes))
+            points += sum(len(stroke) for stroke in sent)
+            frame_bytes += size
+            for _ in range(REPEATS):
+                start = time.perf_counter_ns()
+                release_to_result(recognizer, simplifier, strokes)
+                latencies.append(time.perf_counter_ns() - start)
+        medians[name] = statistics.median(latencies) / 1000
+        if (agreeing != len(gestures)):
+            failures.append("%s: %d results differ from the whole strokes'" % (name, len(gestures) - agreeing))
+        print("%-15s agreement %.4f, whole strokes kept %4d, %6.1f points %7.1f bytes, "
+              "%7.1f us release to result (%.2fx)" %
+              (name, agreeing / len(gestures), kept_whole, points / len(gestures),
+               frame_bytes / len(gestures), medians[name], medians["whole strokes"] / medians[name]))
+
+    for failure in failures:
+        print("FAIL:", failure)
+    sys.exit(1 if failures else 0)
+
+
+if (__name__ == "__main__"):
+    main()
@@ -0,0 +1,238 @@
+"""
+Times AssociationReader.summary_text on the bundled associations and on synthetic association
+tables from 1k to 1M rows, against the implementation it replaced (up to PREVIOUS_MAX_ROWS,
+past which it takes minutes) and against grouped pandas operations. Checks that all of them
+produce the same text, and the bundled one text_association.txt, and fails if summary_text is
+slower than either. The times are the best of REPEATS calls.
+
+The synthetic tables have the languages of languages.csv, each with a random subset of the
+groups of keybindings.csv and the circumflex, and characters drawn from ASCII and Latin
+Extended-A.
+
+Run from the orthosimple folder:
+    python3 -m benchmarks.bench_summary_bindings [max_rows]
+"""
+
+import io
+import random
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import reader
+
+SIZES = [1000, 10000, 100000, 1000000]
+PREVIOUS_MAX_ROWS = 100000
+REPEATS = 3
+CHARS = [chr(code) for code in list(range(ord("a"), ord("z") + 1)) + list(range(0x100, 0x180))]
+
+
+def synthetic_table(num_rows, groups, seed):
+    rng = random.Random(seed)
+    languages = list(reader.LanguageReader().language_map)
+    rows = []
+    for (index, language) in enumerate(languages):
+        language_groups = rng.sample(groups, rng.randint(2, len(groups)))
+        for _ in range(num_rows * (index + 1) // len(languages) - len(rows)):
+            rows.append((rng.choice(CHARS), rng.choice(CHARS), language, rng.choice(language_groups)))
+    table = pd.DataFrame(rows, columns = ["input_char", "new_char", "language_abbrev", "special_group"])
+    table.insert(0, "id_char", range(1, len(table) + 1))
+    return table
+
+
+def previous_text(association_reader):
+    """
+    Produces the summary text the way summary_bindings built it before it was rewritten: the
+    table walked row by row with .loc, the characters ranked by a merge sort, and the new
+    character of each line found by masking the whole table.
+    """
+
+    table = association_reader.df_associations
+    RETAIN_ALL = set({"sub_curl", "special", "other"})
+    keys_file = io.StringIO()
+    curr_index = 0
+    while (curr_index != len(table)):
+        curr_language = table.loc[curr_index, "language_abbrev"]
+        simple_groups = set(association_reader.keys_from_groups["special_group"])
+
+        chars_to_groups = dict({})
+        while ((curr_index != len(table)) and (table.loc[curr_index, "language_abbrev"] == curr_language)):
+            old_char = table.loc[curr_index, "input_char"]
+            group = table.loc[curr_index, "special_group"]
+            if old_char not in chars_to_groups:
+                chars_to_groups[old_char] = [group]
+            else:
+                chars_to_groups[old_char].append(group)
+            curr_index += 1
+
+        chars_sorted = [(c, len(chars_to_groups[c])) for c in chars_to_groups]
+        merge_sort(chars_sorted, 0, len(chars_sorted) - 1)
+        summary = max_occurences(association_reader, chars_sorted, chars_to_groups, curr_language,
+                                 RETAIN_ALL)
+
+        keys_file.write(association_reader.language_reader.full_name(curr_language) + "\n")
+        keys_file.write("(common)\n")
+        for group in summary:
+            if (group == "other"):
+                keys_file.write("(also)\n")
+            if (group in RETAIN_ALL):
+                (plain_chars, new_chars) = association_reader.select_char_association(group, curr_language)
+                written = set()
+                for (plain, new) in zip(plain_chars, new_chars):
+                    if (plain.lower() not in written):
+                        written.add(plain.lower())
+                        keys_file.write("%s  +%3s  ⇒%3s\n" % (association_reader.get_binding(group),
+                                                              plain.lower(), new))
+            else:
+                by_language = table.language_abbrev == curr_language
+                by_input = table.input_char == summary[group]
+                by_group = table.special_group == group
+                pos_match = np.logical_and.reduce((by_language, by_input, by_group)).argmax()
+                if (group != "circumflex"):
+                    keys_file.write("%s  +%3s  ⇒%3s\n" % (association_reader.get_binding(group), summary[group],
+                                                          table.iloc[pos_match]["new_char"]))
+        keys_file.write("\n")
+    return keys_file.getvalue()
+
+
+def merge_sort(chars_with_freqs, start, end):
+    if (start < end):
+        middle = (start + end) // 2
+        merge_sort(chars_with_freqs, start, middle)
+        merge_sort(chars_with_freqs, middle + 1, end)
+
+        left = chars_with_freqs[start:middle + 1]
+        right = chars_with_freqs[middle + 1:end + 1]
+        (curr_ind, ind_left, ind_right) = (start, 0, 0)
+        while ((ind_left < len(left)) and (ind_right < len(right))):
+            if (left[ind_left][1] >= right[ind_right][1]):
+                chars_with_freqs[curr_ind] = left[ind_left]
+                ind_left += 1
+            else:
+                chars_with_freqs[curr_ind] = right[ind_right]
+                ind_right += 1
+            curr_ind += 1
+        chars_with_freqs[curr_ind:end + 1] = left[ind_left:] + right[ind_right:]
+
+
+def max_occurences(association_reader, chars_sorted, chars_to_groups, language, exception_groups):
+    short_summary = dict({})
+    dest = len(association_reader.language_groups[language])
+    for group in association_reader.language_groups[language]:
+        short_summary[group] = None
+        if (group in exception_groups):
+            dest -= 1
+
+    num_occurences = 0
+    for item in chars_sorted:
+        for group in chars_to_groups[item[0]]:
+            if ((group in short_summary) and (short_summary[group] is None) and
+                (group not in exception_groups)):
+                short_summary[group] = item[0]
+                num_occurences += 1
+                if (num_occurences == dest):
+                    return short_summary
+    return short_summary
+
+
+def grouped_text(association_reader):
+    """
+    Produces the summary text with grouped pandas operations, as summary_text first did after the
+    rewrite: one groupby ranks the characters of every run, and a sort with drop_duplicates
+    picks the character of each group.
+    """
+
+    table = association_reader.df_associations
+    languages = table["language_abbrev"]
+    runs = (languages != languages.shift()).cumsum().to_numpy()
+    rows = pd.DataFrame({"run": runs, "char": table["input_char"].to_numpy(),
+                         "group": table["special_group"].to_numpy(), "position": np.arange(len(table))})
+    by_char = rows.groupby(["run", "char"], sort = False)["position"].agg(["size", "min"]).reset_index()
+    by_char = by_char.sort_values(["run", "size", "min"], ascending = [True, False, True], kind = "stable")
+    by_char["rank"] = np.arange(len(by_char))
+    ranked = rows.merge(by_char[["run", "char", "rank"]], on = ["run", "char"], sort = False)
+    summarized = ranked[~ranked["group"].isin(association_reader.RETAIN_ALL)]
+    best = summarized.sort_values("rank", kind = "stable").drop_duplicates(["run", "group"])
+    summary_chars = dict(zip(zip(best["run"], best["group"]), best["char"]))
+
+    first_rows = table.drop_duplicates(["language_abbrev", "special_group", "input_char"])
+    new_chars = dict(zip(zip(first_rows["language_abbrev"], first_rows["special_group"],
+                             first_rows["input_char"]), first_rows["new_char"]))
+
+    run_starts = np.flatnonzero(np.diff(runs, prepend = 0))
+    lines = []
+    for (run, language) in zip(runs[run_starts], languages.to_numpy()[run_starts]):
+        lines += [association_reader.language_reader.full_name(language), "(common)"]
+        for group in association_reader.language_groups[language]:
+            if (group == "other"):
+                lines.append("(also)")
+            if (group in association_reader.RETAIN_ALL):
+                written = set()
+                for (plain, new) in zip(*association_reader.select_char_association(group, language)):
+                    if (plain.lower() not in written):
+                        written.add(plain.lower())
+                        lines.append("%s  +%3s  ⇒%3s" % (association_reader.get_binding(group),
+                                                         plain.lower(), new))
+            elif (group != "circumflex"):
+                char = summary_chars[(run, group)]
+                lines.append("%s  +%3s  ⇒%3s" % (association_reader.get_binding(group), char,
+                                                 new_chars[(language, group, char)]))
+        lines.append("")
+    return "".join(line + "\n" for line in lines)
+
+
+def timed(function, association_reader):
+    """
+    Produces what function produces for association_reader and the least time it took over
+    REPEATS calls, in ms.
+    """
+
+    best = None
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        text = function(association_reader)
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if (best is None) else min(best, elapsed)
+    return (text, best)
+
+
+def main():
+    max_rows = int(sys.argv[1]) if (len(sys.argv) > 1) else SIZES[-1]
+    failures = []
+
+    bundled = reader.AssociationReader(summary_file = None)
+    with open(reader.SUMMARY_FILE) as summary_file:
+        if (bundled.summary_text() != summary_file.read()):
+            failures.append("the bundled summary differs from " + str(reader.SUMMARY_FILE))
+
+    groups = list(bundled.keys_from_groups["special_group"]) + ["circumflex"]
+    tables = [(num_rows, synthetic_table(num_rows, groups, seed))
+              for (seed, num_rows) in enumerate(size for size in SIZES if (size <= max_rows))]
+    tables.insert(0, (len(bundled.df_associations), bundled.df_associations))
+    for (num_rows, table) in tables:
+        association_reader = reader.AssociationReader(table, bundled.keys_from_groups, None)
+        (text, elapsed) = timed(lambda association_reader: association_reader.summary_text(),
+                                association_reader)
+        line = "%8d rows: summary_text %8.1f ms" % (num_rows, elapsed)
+
+        implementations = [("grouped", grouped_text)]
+        if (num_rows <= PREVIOUS_MAX_ROWS):
+            implementations.insert(0, ("previous", previous_text))
+        for (name, implementation) in implementations:
+            (other_text, other_elapsed) = timed(implementation, association_reader)
+            if (other_text != text):
+                failures.append("the summary of %d rows differs from the %s one" % (num_rows, name))
+            line += ", %s %8.1f ms" % (name, other_elapsed)
+            if (other_elapsed < elapsed):
+                failures.append("summary_text is slower than the %s one on %d rows" % (name, num_rows))
+        print(line)
+
+    for failure in failures:
+        print("FAIL:", failure)
+    sys.exit(1 if failures else 0)
+
+
+if (__name__ == "__main__"):
+    main()
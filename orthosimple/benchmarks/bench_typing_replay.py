@@ -0,0 +1,286 @@
+"""
+Replays key streams through the keyboard pipeline with a fake output sink, so the cost per key
+can be measured without a display nor keyboard access, and reports as JSON, for each language
+and pipeline, the keys per second, the latency percentiles per key and the memory allocated per
+key according to tracemalloc. With --baseline, the results are compared with an earlier report
+and the exit status is 1 if the keys per second regressed.
+
+The pipelines are the reference Mappings (Mapping.writeNewChar), the KeystrokeAutomaton
+(LanguageInput.update) and the KeyEventHub delivering to a KeyboardListener, as the listener
+thread does. By default the streams are the keys typing TEXTS, a paragraph of each language,
+repeated; each replay is also checked to type exactly the paragraph, and the pipelines to
+request the same writes. --save writes the streams, and --streams replays streams read from a
+file, one JSON object per line: {"language": "FR", "keys": ["a", "Key.space", ...]}.
+
+Needs no display: with pynput's dummy backend (PYNPUT_BACKEND=dummy), where every member of
+keyboard.Key is the same one, the special keys are replayed as
+bench_keystroke_automaton.SpecialKeys instead.
+
+Run from the orthosimple folder:
+    python3 -m benchmarks.bench_typing_replay [--repeats N] [--streams FILE] [--save FILE]
+        [--output FILE] [--baseline FILE]
+"""
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+
+from pynput import keyboard
+
+import key_event_hub
+import language_inputs
+import output_sinks
+import reader
+from benchmarks.bench_keystroke_automaton import special_key, update_all
+from benchmarks.bench_recognition import percentile
+
+REPEATS = 40
+MAX_THROUGHPUT_REGRESSION = 0.10
+
+# Typed with every accent of each language, avoiding the key sequences that would be replaced
+# by accident, such as "oe" or a doubled vowel in French.
+TEXTS = dict({
+    "FR": "Noël, le garçon naïf a déjà vu la forêt près du château. À côté, l'élève écrit « voilà » "
+          "à sa sœur; ça coûte 5 €. Où est le maïs? Il a été très ému par la Fête.",
+    "SP": "¿Dónde está el niño? ¡Qué pingüino tan pequeño! Mañana, a las ocho, iré al país de mi "
+          "abuelo; él dice « sí » y paga 10 €.",
+    "PO": "Zażółć gęślą jaźń. Łódź leży nad rzeką, a ósmy koń śpi w stajni.",
+    "TU": "Güneşli bir günde çocuklar ağaçların altında oyun oynadı; kız öğretmen sıcak çay içti.",
+    "SW": "Flickan åt ett äpple på ängen; hon är glad och mår bra. Café, idé och öl.",
+})
+
+
+CAPS_LOCK = special_key("caps_lock")
+SHIFT = special_key("shift")
+SPACE = special_key("space")
+
+
+class EditorSink(output_sinks.OutputSink):
+    '''
+    The text of the window the keys are typed in: typed adds what a key writes, before the
+    pipeline sees it, and the writes of the pipeline edit the text as they would on screen.
+    '''
+
+    def __init__(self):
+        self.chars = []
+        self.caps_lock_on = False
+
+    def typed(self, key):
+        if (isinstance(key, keyboard.KeyCode)):
+            self.chars.append(key.char.upper() if self.caps_lock_on else key.char)
+        elif (str(key) == "Key.caps_lock"):
+            self.caps_lock_on = not self.caps_lock_on
+        elif (str(key) == "Key.space"):
+            self.chars.append(" ")
+
+    def replace(self, letter_typed, new_char):
+        del self.chars[-2:]
+        self.chars.append(new_char)
+
+    def insert(self, text):
+        self.chars.extend(text)
+
+    def text(self):
+        return "".join(self.chars)
+
+
+def text_keys(text, rules):
+    """
+    Produces the keys typing text with rules: the binding and the letter for the characters
+    the rules produce, the letter twice for the circumflex, caps lock around uppercase ones,
+    and shift before the other uppercase letters.
+    """
+
+    typed_as = dict({})
+    for rule in rules:
+        for (plain, new) in zip(rule.plain, rule.new):
+            prefix = plain if (rule.binding is None) else rule.binding
+            typed_as.setdefault(new, (prefix, plain))
+
+    keys = []
+    for char in text:
+        if (char in typed_as):
+            (prefix, plain) = typed_as[char]
+            letters = [keyboard.KeyCode(char = prefix), keyboard.KeyCode(char = plain)]
+            if (char != char.lower()):
+                letters = [CAPS_LOCK] + letters + [CAPS_LOCK]
+            keys += letters
+        elif (char == " "):
+            keys.append(SPACE)
+        else:
+            if (char != char.lower()):
+                keys.append(SHIFT)
+            keys.append(keyboard.KeyCode(char = char))
+    return keys
+
+
+def key_name(key):
+    return key.char if (isinstance(key, keyboard.KeyCode)) else str(key)
+
+
+def parse_key(name):
+    if (name.startswith("Key.") and (len(name) > 4)):
+        return special_key(name[4:])
+    return keyboard.KeyCode(char = name)
+
+
+def load_streams(path):
+    with open(path, encoding = "utf-8") as streams_file:
+        return [(stream["language"], [parse_key(name) for name in stream["keys"]])
+                for stream in map(json.loads, streams_file) if stream]
+
+
+def save_streams(path, streams):
+    with open(path, "w", encoding = "utf-8") as streams_file:
+        for (language, keys) in streams:
+            streams_file.write(json.dumps({"language": language, "keys": [key_name(key) for key in keys]},
+                                          ensure_ascii = False) + "\n")
+
+
+def pipeline(name, language, association_reader, sink):
+    """
+    Produces the function a key is handed to in the pipeline called name.
+    """
+
+    language_input = language_inputs.LanguageInput(language, association_reader, sink)
+    if (name == "mappings"):
+        return update_all(language_input.reference_mappings())
+    if (name == "hub"):
+        hub = key_event_hub.KeyEventHub()
+        language_inputs.KeyboardListener(language_input, hub)
+        return hub.dispatch
+    return language_input.update
+
+
+PIPELINES = ["mappings", "automaton", "hub"]
+
+
+def measure(name, language, association_reader, keys):
+    """
+    Replays keys three times through new pipelines: without timers for the keys per second,
+    timing each key, and under tracemalloc, where the peak allocated while handling a key and
+    what is still allocated after it are counted.
+    """
+
+    sink = output_sinks.RecordingSink()
+    update = pipeline(name, language, association_reader, sink)
+    start = time.perf_counter()
+    for key in keys:
+        update(key)
+    elapsed = time.perf_counter() - start
+
+    update = pipeline(name, language, association_reader, output_sinks.RecordingSink())
+    latencies = []
+    for key in keys:
+        key_start = time.perf_counter_ns()
+        update(key)
+        latencies.append(time.perf_counter_ns() - key_start)
+    latencies.sort()
+
+    update = pipeline(name, language, association_reader, output_sinks.RecordingSink())
+    allocated = 0
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for key in keys:
+        tracemalloc.reset_peak()
+        key_before = tracemalloc.get_traced_memory()[0]
+        update(key)
+        allocated += tracemalloc.get_traced_memory()[1] - key_before
+    retained = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    result = {"language": language, "pipeline": name, "num_keys": len(keys),
+              "num_writes": len(sink.writes), "keys_per_s": len(keys) / elapsed,
+              "mean_us": sum(latencies) / len(latencies) / 1000}
+    for percent in (50, 90, 99):
+        result["p%d_us" % percent] = percentile(latencies, percent) / 1000
+    result["max_us"] = latencies[-1] / 1000
+    result["allocated_bytes_per_key"] = allocated / len(keys)
+    result["retained_bytes_per_key"] = retained / len(keys)
+    return (result, sink.writes)
+
+
+def typed_text(language, association_reader, keys):
+    editor = EditorSink()
+    language_input = language_inputs.LanguageInput(language, association_reader, editor)
+    for key in keys:
+        editor.typed(key)
+        language_input.update(key)
+    return editor.text()
+
+
+def regressions(report, baseline):
+    """
+    Produces a description of each result of report with fewer keys per second than the one of
+    baseline with the same language and pipeline.
+    """
+
+    found = []
+    baseline_results = dict(((result["language"], result["pipeline"]), result) for result in baseline["results"])
+    for result in report["results"]:
+        previous = baseline_results.get((result["language"], result["pipeline"]))
+        if ((previous is not None) and
+                (result["keys_per_s"] < previous["keys_per_s"] * (1 - MAX_THROUGHPUT_REGRESSION))):
+            found.append("%s %s: %.0f keys/s, was %.0f" % (result["language"], result["pipeline"],
+                                                           result["keys_per_s"], previous["keys_per_s"]))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description = "Keyboard pipeline replay benchmark")
+    parser.add_argument("--repeats", type = int, default = REPEATS,
+                        help = "times each paragraph of TEXTS is typed")
+    parser.add_argument("--streams", help = "a file of key streams (default: the keys typing TEXTS)")
+    parser.add_argument("--save", help = "write the key streams replayed to this file")
+    parser.add_argument("--output", help = "write the JSON report to this file instead of stdout")
+    parser.add_argument("--baseline", help = "a previous JSON report to compare with")
+    arguments = parser.parse_args()
+
+    association_reader = reader.AssociationReader(summary_file = None)
+    failures = []
+    if (arguments.streams is None):
+        streams = []
+        for (language, text) in TEXTS.items():
+            rules = language_inputs.LanguageInput(language, association_reader).rules
+            keys = text_keys(" ".join([text] * arguments.repeats), rules)
+            if (typed_text(language, association_reader, keys) != " ".join([text] * arguments.repeats)):
+                failures.append("the keys of the %s text type %r" %
+                                (language, typed_text(language, association_reader, text_keys(text, rules))))
+            streams.append((language, keys))
+    else:
+        streams = load_streams(arguments.streams)
+    if (arguments.save is not None):
+        save_streams(arguments.save, streams)
+
+    report = {"streams": arguments.streams or "texts", "repeats": arguments.repeats, "time": time.time(),
+              "results": []}
+    for (language, keys) in streams:
+        writes = dict({})
+        for name in PIPELINES:
+            (result, writes[name]) = measure(name, language, association_reader, keys)
+            report["results"].append(result)
+        if (any(pipeline_writes != writes["automaton"] for pipeline_writes in writes.values())):
+            failures.append("the pipelines request different writes for " + language)
+
+    if (arguments.output is None):
+        json.dump(report, sys.stdout, indent = 2)
+        print()
+    else:
+        with open(arguments.output, "w") as output_file:
+            json.dump(report, output_file, indent = 2)
+
+    found = []
+    if (arguments.baseline is not None):
+        with open(arguments.baseline) as baseline_file:
+            found = regressions(report, json.load(baseline_file))
+        for regression in found:
+            print("regression:", regression, file = sys.stderr)
+    for failure in failures:
+        print("FAIL:", failure, file = sys.stderr)
+    sys.exit(1 if (failures or found) else 0)
+
+
+if (__name__ == "__main__"):
+    main()
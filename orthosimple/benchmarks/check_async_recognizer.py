@@ -0,0 +1,155 @@
+"""
+Submits recognitions to an AsyncRecognizer whose widget is a fake Tk event loop, and checks that
+a result or error callback that raises does not stop the requests after it from being
+delivered or timing out, that a request which timed out behind a blocked one is skipped by the
+worker even before the Tk thread fails it, and that polling stops once nothing is outstanding. Then streams
+points with DrawingTransformer.streamPoints while the worker is blocked, until the queue is
+full, and checks that the stream is still cancelled, after the points queued before, as it is
+when the drawing is reset while the queue is full.
+
+Needs no display.
+
+Run from the orthosimple folder:
+    python3 -m benchmarks.check_async_recognizer
+"""
+
+import heapq
+import itertools
+import sys
+import threading
+import time
+from types import SimpleNamespace
+
+import async_recognizer
+from drawing_transformer import DrawingTransformer
+
+
+class FakeWidget:
+    '''
+    Runs the after() callbacks in the order they are due, on the thread calling run.
+    '''
+
+    def __init__(self):
+        self.jobs = []
+        self.order = itertools.count()
+
+    def after(self, ms, callback, *arguments):
+        heapq.heappush(self.jobs, (time.monotonic() + ms / 1000, next(self.order), callback, arguments))
+
+    def run(self, until, timeout = 5.0):
+        deadline = time.monotonic() + timeout
+        while ((not until()) and (time.monotonic() < deadline)):
+            if (self.jobs and (self.jobs[0][0] <= time.monotonic())):
+                (_, _, callback, arguments) = heapq.heappop(self.jobs)
+                callback(*arguments)
+            else:
+                time.sleep(0.001)
+        return until()
+
+
+def failing(value):
+    raise KeyError(value)
+
+
+class FakeStream:
+    '''
+    Records the calls a stream gets from the worker.
+    '''
+
+    def __init__(self):
+        self.calls = []
+        self.cancelled = threading.Event()
+
+    def add_points(self, stroke_index, points):
+        self.calls.append("add_points")
+
+    def cancel(self):
+        self.calls.append("cancel")
+        self.cancelled.set()
+
+
+def blocking(recognizer):
+    """
+    Posts a job that holds the worker until the event produced is set, once the worker runs it.
+    """
+
+    (started, blocked) = (threading.Event(), threading.Event())
+    recognizer.post(lambda: (started.set(), blocked.wait()))
+    started.wait()
+    return blocked
+
+
+def check_full_queue(failures):
+    recognizer = async_recognizer.AsyncRecognizer(FakeWidget(), max_pending = 4)
+    stream = FakeStream()
+    transformer = SimpleNamespace(asyncRecognizer = recognizer, stream = stream, request = None,
+                                  strokes = [[]], strokesCount = 0, streamedCount = 0)
+    blocked = blocking(recognizer)
+    while (transformer.stream is not None):
+        transformer.strokes[0].extend([(0, 0)] * DrawingTransformer.STREAM_CHUNK_POINTS)
+        DrawingTransformer.streamPoints(transformer)
+    blocked.set()
+    if (not stream.cancelled.wait(1.0)):
+        failures.append("a stream whose points did not fit in the queue was not cancelled")
+    elif (stream.calls != ["add_points"] * 4 + ["cancel"]):
+        failures.append("the stream got %r once the queue was full" % (stream.calls,))
+
+    stream = FakeStream()
+    transformer.stream = stream
+    blocked = blocking(recognizer)
+    while (recognizer.post(lambda: None)):
+        pass
+    DrawingTransformer.cancelRecognition(transformer)
+    blocked.set()
+    if (not stream.cancelled.wait(1.0)):
+        failures.append("a stream reset while the queue was full was not cancelled")
+
+
+def main():
+    failures = []
+    widget = FakeWidget()
+    recognizer = async_recognizer.AsyncRecognizer(widget, timeout = 0.5)
+    delivered = []
+
+    recognizer.submit(lambda: ("other", "a"), failing, failing)
+    recognizer.submit(lambda: ("e", "acute"), delivered.append, delivered.append)
+    if (not widget.run(lambda: len(delivered) == 1)):
+        failures.append("a result after a failing callback was not delivered")
+
+    recognizer.submit(lambda: 1 / 0, delivered.append, failing)
+    recognizer.submit(lambda: ("a", "grave"), delivered.append, delivered.append)
+    if (not widget.run(lambda: len(delivered) == 2)):
+        failures.append("a result after a failing error callback was not delivered")
+
+    blocked = threading.Event()
+    recognizer.submit(blocked.wait, failing, failing)
+    recognizer.submit(lambda: None, delivered.append, delivered.append)
+    if (not widget.run(lambda: len(delivered) == 3)):
+        failures.append("a request after a failing timeout was not timed out")
+    elif (not isinstance(delivered[-1], TimeoutError)):
+        failures.append("a request waiting behind a blocked one got %r" % (delivered[-1],))
+    # the Tk thread is busy past the deadline, so the request is not failed before the worker
+    # gets to it
+    ran = []
+    recognizer.submit(lambda: ran.append(True), delivered.append, delivered.append)
+    time.sleep(0.6)
+    blocked.set()
+    time.sleep(0.1)
+    if (ran):
+        failures.append("the worker ran a request that had timed out")
+    if (not widget.run(lambda: len(delivered) == 4)):
+        failures.append("a request skipped by the worker was not timed out")
+
+    if (not widget.run(lambda: not recognizer.polling)):
+        failures.append("polling did not stop once nothing was outstanding")
+    if (delivered[0:2] != [("e", "acute"), ("a", "grave")]):
+        failures.append("the results delivered are %r" % (delivered[0:2],))
+    check_full_queue(failures)
+
+    for failure in failures:
+        print("FAIL:", failure)
+    sys.exit(1 if failures else 0)
+
+
+if (__name__ == "__main__"):
+    main()
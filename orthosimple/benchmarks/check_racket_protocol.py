@@ -0,0 +1,84 @@
+"""
+Checks the frames of recognition_protocol against the racket recognizer server: a server is
+spawned on a free port as in bench_recognition, and a SocketRecognizer sends it synthetic
+gestures as recognize frames, one at a time and pipelined with recognize_many, as streams of
+STREAM_CHUNK_POINTS points and as streams cancelled halfway through. Every answer must be the
+letter and accent the in-process NumpyRecognizer gives, and a cancelled stream must leave the
+connection usable for the next request. Prints the number of gestures whose scores differ by
+more than SCORE_TOLERANCE between the two, from the server's exact rational arithmetic.
+
+Needs racket on the PATH (see the makefile's test-recognizer target for the racket side).
+
+Run from the orthosimple folder:
+    python3 -m benchmarks.check_racket_protocol [num_samples]
+"""
+
+import sys
+
+import gesture_dataset
+import gesture_recognizer
+from benchmarks.bench_recognition import RacketServer
+
+NUM_SAMPLES = 200
+STREAM_CHUNK_POINTS = 16
+SCORE_TOLERANCE = 1e-6
+
+
+def scored(score):
+    """
+    Produces True if score is the score of a matched symbol: a trema is scored None by numpy
+    and +nan.0 by the server.
+    """
+
+    return (score is not None) and (score == score)
+
+
+def streamed(recognizer, strokes, cancel):
+    """
+    Sends strokes as a stream of chunks, and produces the letter, accent and scores the server
+    answers, or None once the stream is cancelled after its first stroke.
+    """
+
+    stream = recognizer.open_stream()
+    for (stroke_index, stroke) in enumerate(strokes):
+        for start in range(0, len(stroke), STREAM_CHUNK_POINTS):
+            stream.add_points(stroke_index, stroke[start:start + STREAM_CHUNK_POINTS])
+        if (cancel):
+            stream.cancel()
+            return None
+    return stream.finish_with_scores()
+
+
+def main():
+    num_samples = int(sys.argv[1]) if (len(sys.argv) > 1) else NUM_SAMPLES
+    samples = gesture_dataset.synthetic_samples(num_samples)
+    expected = gesture_recognizer.NumpyRecognizer()
+    failures = []
+    score_differences = 0
+
+    with RacketServer(gesture_recognizer.NUM_SAMPLE_POINTS) as recognizer:
+        pipelined = recognizer.recognize_many([sample.strokes for sample in samples])
+        for (index, sample) in enumerate(samples):
+            wanted = expected.recognize_with_scores(sample.strokes)
+            results = {"recognize": recognizer.recognize_with_scores(sample.strokes),
+                       "recognize_many": pipelined[index]}
+            if (index % 2 == 1):
+                streamed(recognizer, sample.strokes, True)
+            results["stream"] = streamed(recognizer, sample.strokes, False)
+            for (name, result) in results.items():
+                if (tuple(result[0:2]) != tuple(wanted[0:2])):
+                    failures.append("sample %d by %s: %s instead of %s" %
+                                    (index, name, result[0:2], wanted[0:2]))
+            score_differences += any(abs(score - wanted_score) > SCORE_TOLERANCE
+                                     for (score, wanted_score) in zip(results["recognize"][2:], wanted[2:])
+                                     if scored(score) and scored(wanted_score))
+
+    print("%d samples, %d with scores differing from numpy's by more than %g" %
+          (num_samples, score_differences, SCORE_TOLERANCE))
+    for failure in failures:
+        print("FAIL:", failure)
+    sys.exit(1 if failures else 0)
+
+
+if (__name__ == "__main__"):
+    main()
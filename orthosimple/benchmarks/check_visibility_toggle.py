@@ -0,0 +1,81 @@
+"""
+Presses Esc many times from a thread, as the keyboard listener does, and prints the time from
+the key press to the window being shown or hidden. Fails if the window did not follow the
+presses, or if a child process was started (seen through an audit hook on process creation).
+
+Needs a display. Uses the numpy recognizer and starts no keyboard listener, so neither the
+racket server nor keyboard access is needed.
+
+Run from the orthosimple folder:
+    python3 -m benchmarks.check_visibility_toggle [num_presses]
+"""
+
+import sys
+import threading
+import time
+
+import orthosimple
+
+NUM_PRESSES = 200
+PROCESS_EVENTS = ("subprocess.Popen", "os.fork", "os.forkpty", "os.posix_spawn", "os.spawn",
+                  "os.system", "os.exec")
+
+
+class ToggledOrthoSimple(orthosimple.OrthoSimple):
+    RECOGNIZER_BACKEND = "numpy"
+
+    def __init__(self, num_presses):
+        self.num_presses = num_presses
+        self.latencies = []
+        self.failures = []
+        self.pressed = None
+        self.toggled = threading.Event()
+        orthosimple.OrthoSimple.__init__(self)
+
+    def start_listeners(self):
+        threading.Thread(target = self.press, daemon = True).start()
+
+    def press(self):
+        for press in range(self.num_presses):
+            self.toggled.clear()
+            self.pressed = time.perf_counter()
+            self.toggle_visibility(orthosimple.keyboard.Key.esc)
+            if (not self.toggled.wait(5)):
+                self.failures.append("press %d was not handled" % press)
+                break
+        self.after(0, self.destroy)
+
+    def toggle_window(self, event):
+        visible = (self.state() != "withdrawn")
+        orthosimple.OrthoSimple.toggle_window(self, event)
+        self.update_idletasks()
+        self.latencies.append(time.perf_counter() - self.pressed)
+        if ((self.state() != "withdrawn") == visible):
+            self.failures.append("the window was not toggled")
+        self.toggled.set()
+
+
+def main():
+    num_presses = int(sys.argv[1]) if (len(sys.argv) > 1) else NUM_PRESSES
+    processes = []
+
+    def audit(event, arguments):
+        if (event in PROCESS_EVENTS):
+            processes.append(event)
+
+    sys.addaudithook(audit)
+    app = ToggledOrthoSimple(num_presses)
+
+    latencies = sorted(app.latencies)
+    if (latencies):
+        print("%d toggles: median %.3f ms, max %.3f ms" %
+              (len(latencies), latencies[len(latencies) // 2] * 1000, latencies[-1] * 1000))
+    if (processes):
+        app.failures.append("%d processes were started (%s)" % (len(processes), processes[0]))
+    for failure in sorted(set(app.failures)):
+        print("FAIL:", failure)
+    sys.exit(1 if app.failures else 0)
+
+
+if (__name__ == "__main__"):
+    main()
@@ -0,0 +1,93 @@
+"""
+Switches between the main and the options frames many times, with a recognition completing on
+every main frame and the key bindings shown on every options frame, and checks that the number
+of threads and the resident memory stay flat. Also prints the time a switch takes.
+
+Needs a display. Uses the numpy recognizer and starts no keyboard listener, so neither the
+racket server nor keyboard access is needed. Linux only (the memory is read from /proc).
+
+Run from the orthosimple folder:
+    python3 -m benchmarks.soak_frames [num_switches]
+"""
+
+import os
+import sys
+import threading
+import time
+
+import orthosimple
+
+NUM_SWITCHES = 4000
+SWITCHES_PER_TICK = 20
+WARM_UP_SWITCHES = 200
+MAX_RSS_GROWTH = 4 * 1024 * 1024 # bytes
+
+
+def resident_memory():
+    with open("/proc/self/statm") as statm:
+        return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+class SoakedOrthoSimple(orthosimple.OrthoSimple):
+    RECOGNIZER_BACKEND = "numpy"
+
+    def __init__(self, num_switches):
+        self.num_switches = num_switches
+        self.switches = 0
+        self.baseline = None
+        self.failures = []
+        self.switch_times = []
+        orthosimple.OrthoSimple.__init__(self)
+
+    def start_listeners(self):
+        self.after(0, self.soak)
+
+    def soak(self):
+        for _ in range(SWITCHES_PER_TICK):
+            if (type(self.frame) is orthosimple.MainFrame):
+                self.frame.draw_frame.result_char = "é"
+                self.frame.draw_frame.event_generate(orthosimple.DrawingTransformer.RECOGNITION_COMPLETE)
+                if (self.frame.message.get() != "é copied!"):
+                    self.failures.append("the message was not updated")
+            else:
+                self.frame.to_information()
+            start = time.perf_counter()
+            self.change_frame()
+            self.update_idletasks()
+            self.switch_times.append(time.perf_counter() - start)
+            self.switches += 1
+
+        if ((self.baseline is None) and (self.switches >= WARM_UP_SWITCHES)):
+            self.baseline = (threading.active_count(), resident_memory())
+            print("after %5d switches: %d threads, %.1f MiB" %
+                  (self.switches, self.baseline[0], self.baseline[1] / 2 ** 20))
+        if (self.switches < self.num_switches):
+            self.after_idle(self.soak)
+        else:
+            self.finish()
+
+    def finish(self):
+        (threads, rss) = (threading.active_count(), resident_memory())
+        print("after %5d switches: %d threads, %.1f MiB" % (self.switches, threads, rss / 2 ** 20))
+        switch_times = sorted(self.switch_times[WARM_UP_SWITCHES:])
+        print("switch: median %.3f ms, p99 %.3f ms, max %.3f ms" %
+              (switch_times[len(switch_times) // 2] * 1000,
+               switch_times[len(switch_times) * 99 // 100] * 1000, switch_times[-1] * 1000))
+        if (threads > self.baseline[0]):
+            self.failures.append("%d threads were started" % (threads - self.baseline[0]))
+        if (rss - self.baseline[1] > MAX_RSS_GROWTH):
+            self.failures.append("the resident memory grew by %.1f MiB" %
+                                 ((rss - self.baseline[1]) / 2 ** 20))
+        self.destroy()
+
+
+def main():
+    num_switches = int(sys.argv[1]) if (len(sys.argv) > 1) else NUM_SWITCHES
+    app = SoakedOrthoSimple(num_switches)
+    for failure in sorted(set(app.failures)):
+        print("FAIL:", failure)
+    sys.exit(1 if app.failures else 0)
+
+
+if (__name__ == "__main__"):
+    main()
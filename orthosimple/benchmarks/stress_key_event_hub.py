@@ -0,0 +1,199 @@
+"""
+Types keys into a model of the focused window while a listener thread delivers them through a
+KeyEventHub to the French KeyboardListener and to a subscriber that records the keys it
+receives. As on screen, a key lands in the window as soon as it is typed, and only then reaches
+the listener. The French mappings write through a QueuedSink, whose worker sends each
+replacement as key events spread over INJECTION_TIME: they edit the window key by key, and come
+back to the listener like the keys typed, either unmarked as on Xorg, where the hub matches them
+against the sink's injected_keys, or marked as injected as on Windows and macOS.
+
+For both, the first run types the French paragraph of bench_typing_replay at
+TYPING_KEYS_PER_S, faster than a fast typist's bursts, and checks that the window ends up with
+exactly the paragraph: the worker sends a replacement within INJECTION_TIME of the key that
+triggered it, long before the next key is typed. A key typed sooner lands ahead of the write,
+since the keys typed cannot be held back without grabbing the keyboard. The second replays
+thousands of random keys per second, and checks that the recording subscriber got every key
+typed, in order, and none of the keys sent by the sink, and that the sink got the same writes,
+in the same order, as when the automaton is fed directly. Unmarked, the random keys are replayed
+without their backspaces: a backspace typed while a replacement is being sent has the name of
+the backspaces sent, so it is taken for one of them, and at thousands of keys per second that
+happens every few hundred keys. Each run prints the keys per second delivered and the time the
+hub takes to deliver a key, the queueing of its writes included.
+
+Needs no display nor keyboard access: the hub's listener is not started. With pynput's dummy
+backend (PYNPUT_BACKEND=dummy), the special keys are replayed as
+bench_keystroke_automaton.SpecialKeys.
+
+Run from the orthosimple folder:
+    python3 -m benchmarks.stress_key_event_hub [num_keys] [keys_per_s]
+"""
+
+import queue
+import sys
+import threading
+import time
+
+from pynput import keyboard
+
+import key_event_hub
+import language_inputs
+import output_sinks
+import reader
+from benchmarks.bench_keystroke_automaton import key_stream, recorded_writes, special_key
+from benchmarks.bench_typing_replay import TEXTS, EditorSink, text_keys
+
+LANGUAGE = "FR"
+TEXT_REPEATS = 2
+TYPING_KEYS_PER_S = 30
+NUM_KEYS = 20000
+KEYS_PER_S = 5000
+INJECTION_TIME = 0.003 # seconds, about what BatchedSink takes for a replacement
+
+BACKSPACE = special_key("backspace")
+
+
+class Window(EditorSink):
+    '''
+    The text of the focused window, edited by the keys typed and by the key events the sink
+    sends, in the order they arrive.
+    '''
+
+    def __init__(self):
+        EditorSink.__init__(self)
+        self.lock = threading.Lock()
+
+    def typed(self, key):
+        if (str(key) == "Key.backspace"):
+            del self.chars[-1:]
+        else:
+            EditorSink.typed(self, key)
+
+    def sent(self, key):
+        if (isinstance(key, keyboard.KeyCode)):
+            self.chars.append(key.char)
+        else:
+            self.typed(key)
+
+
+class WindowSink(output_sinks.RecordingSink):
+    '''
+    Records the writes, and sends them to window as key events, as BatchedSink does: the key
+    events are spread over INJECTION_TIME and each one is also put on the listener's events,
+    marked as injected if marked is True, or else expected by injected_keys.
+    '''
+
+    def __init__(self, window, events, marked):
+        output_sinks.RecordingSink.__init__(self)
+        self.window = window
+        self.events = events
+        self.marked = marked
+        self.injected_keys = None if marked else output_sinks.InjectedKeys()
+
+    def replace(self, letter_typed, new_char):
+        output_sinks.RecordingSink.replace(self, letter_typed, new_char)
+        self.__send(2, new_char)
+
+    def insert(self, text):
+        output_sinks.RecordingSink.insert(self, text)
+        self.__send(0, text)
+
+    def __send(self, num_erased, text):
+        keys = [BACKSPACE] * num_erased + [keyboard.KeyCode(char = char) for char in text]
+        if (not self.marked):
+            self.injected_keys.expect([output_sinks.key_name(key) for key in keys])
+        for key in keys:
+            time.sleep(INJECTION_TIME / len(keys))
+            with self.window.lock:
+                self.window.sent(key)
+                self.events.put((key, self.marked))
+
+
+def run(name, association_reader, keys, keys_per_s, marked):
+    """
+    Types keys, keys_per_s of them per second, and produces the text of the window, the keys
+    the recording subscriber received and the writes of the sink.
+    """
+
+    window = Window()
+    events = queue.Queue()
+    sink = WindowSink(window, events, marked)
+    queued_sink = output_sinks.QueuedSink(sink)
+    hub = key_event_hub.KeyEventHub(queued_sink.injected_keys)
+    language_inputs.KeyboardListener(language_inputs.LanguageInput(LANGUAGE, association_reader,
+                                                                   queued_sink),
+                                     hub)
+    received = []
+    hub.subscribe(received.append)
+    dispatch_times = []
+
+    def listen():
+        while (True):
+            event = events.get()
+            if (event is None):
+                return
+            dispatch_start = time.perf_counter()
+            hub.dispatch(*event)
+            dispatch_times.append(time.perf_counter() - dispatch_start)
+            events.task_done()
+
+    listener = threading.Thread(target = listen, name = "listener")
+    listener.start()
+    start = time.perf_counter()
+    for (index, key) in enumerate(keys):
+        delay = start + index / keys_per_s - time.perf_counter()
+        if (delay > 0):
+            time.sleep(delay)
+        with window.lock:
+            window.typed(key)
+            events.put((key, False))
+    # the keys typed are delivered, then the writes they triggered are sent and come back
+    events.join()
+    queued_sink.join()
+    events.join()
+    events.put(None)
+    listener.join()
+    elapsed = time.perf_counter() - start
+
+    dispatch_times.sort()
+    print("%-22s %6.0f keys/s, delivery p50 %7.1f us p99 %7.1f us max %7.1f ms, %d writes" %
+          (name + ":", len(keys) / elapsed, dispatch_times[len(dispatch_times) // 2] * 1e6,
+           dispatch_times[len(dispatch_times) * 99 // 100] * 1e6, dispatch_times[-1] * 1e3,
+           len(sink.writes)))
+    return (window.text(), received, sink.writes)
+
+
+def main():
+    num_keys = int(sys.argv[1]) if (len(sys.argv) > 1) else NUM_KEYS
+    keys_per_s = int(sys.argv[2]) if (len(sys.argv) > 2) else KEYS_PER_S
+    association_reader = reader.AssociationReader()
+    rules = language_inputs.LanguageInput(LANGUAGE, association_reader).rules
+    failures = []
+
+    text = TEXTS[LANGUAGE] * TEXT_REPEATS
+    typing_keys = text_keys(text, rules)
+    random_keys = key_stream(rules, num_keys, 0)
+    for (marking, marked) in (("unmarked", False), ("marked", True)):
+        (typed, received, writes) = run("typing, " + marking, association_reader, typing_keys,
+                                        TYPING_KEYS_PER_S, marked)
+        if (typed != text):
+            failures.append("%s: the window shows %r instead of %r" % (marking, typed, text))
+        if (received != typing_keys):
+            failures.append("%s: the keys typed were lost or reordered, or keys sent were received" %
+                            marking)
+
+        replayed_keys = random_keys if marked else [key for key in random_keys if (key != BACKSPACE)]
+        (_, received, writes) = run("random keys, " + marking, association_reader, replayed_keys,
+                                    keys_per_s, marked)
+        if (received != replayed_keys):
+            failures.append("%s: the keys replayed were lost or reordered, or keys sent were received" %
+                            marking)
+        if (writes != recorded_writes(LANGUAGE, association_reader, replayed_keys, False)):
+            failures.append("%s: the writes differ from the automaton's" % marking)
+
+    for failure in failures:
+        print("FAIL:", failure)
+    sys.exit(1 if failures else 0)
+
+
+if (__name__ == "__main__"):
+    main()
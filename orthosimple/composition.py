@@ -0,0 +1,84 @@
+'''
+Composes the character of a letter and an accent group with Unicode NFC, instead of looking the
+pair up in associations.csv, so any Latin letter, in either case, gets the accents of every
+group. Each group has the combining marks it stands for, tried in order until one composes to a
+single character: sub_curl is an ogonek (ą, ę) or else a cedilla (ç, ş), and special a ring
+(å), a tilde (ñ), a breve (ğ) or a dot above (ż). The characters no mark composes to, such as
+œ, ł, ı, € or «, are in OVERRIDES.
+
+Usage:
+    composer = CompositionEngine()
+    composer.new_char("e", "acute") # é
+'''
+
+import functools
+import unicodedata
+
+CACHE_SIZE = 4096
+
+COMBINING_MARKS = dict({
+    "acute": ("\u0301",),
+    "grave": ("\u0300",),
+    "circumflex": ("\u0302",),
+    "trema": ("\u0308",),
+    "sub_curl": ("\u0328", "\u0327"), # ogonek, cedilla
+    "special": ("\u030a", "\u0303", "\u0306", "\u0307"), # ring, tilde, breve, dot above
+})
+
+OVERRIDES = dict({
+    ("oe", "e"): "œ",
+    ("special", "l"): "ł",
+    ("special", "i"): "ı",
+    ("other", "<"): "«",
+    ("other", ">"): "»",
+    ("other", "c"): "€",
+    ("other", "?"): "¿",
+    ("other", "!"): "¡",
+})
+
+class CompositionEngine:
+    '''
+    Produces the character of an input character and an accent group from OVERRIDES, or else
+    by composing it with the marks of the group. Uppercase input characters get the uppercase
+    of what their lowercase gets, as in the uppercase variants of AssociationIndex. The results
+    are kept in a least recently used cache of cache_size entries.
+    '''
+
+    def __init__(self, marks = COMBINING_MARKS, overrides = OVERRIDES, cache_size = CACHE_SIZE):
+        self.marks = marks
+        self.overrides = overrides
+        self.composed = functools.lru_cache(maxsize = cache_size)(self.__compose)
+
+    def new_char(self, input_char, special_group):
+        """
+        Raises KeyError if no override nor mark of special_group applies to input_char.
+
+        >>> composer = CompositionEngine()
+        >>> [composer.new_char(letter, "special") for letter in "anzgLI"]
+        ['å', 'ñ', 'ż', 'ğ', 'Ł', 'I']
+        >>> composer.new_char("s", "sub_curl"), composer.new_char("E", "sub_curl")
+        ('ş', 'Ę')
+        """
+
+        new_char = self.composed(input_char, special_group)
+        if (new_char is None):
+            raise KeyError((special_group, input_char))
+        return new_char
+
+    def cache_info(self):
+        return self.composed.cache_info()
+
+    def __compose(self, input_char, special_group):
+        """
+        Produces the character of input_char and special_group, or None if there is none.
+        """
+
+        lower = input_char.lower()
+        if ((special_group, lower) in self.overrides):
+            new_char = self.overrides[(special_group, lower)]
+            return new_char if (lower == input_char) else new_char.upper()
+        for mark in self.marks.get(special_group, ()):
+            composed = unicodedata.normalize("NFC", input_char + mark)
+            if (len(composed) == 1):
+                return composed
+        return None
@@ -1,5 +1,14 @@
 import tkinter as tk
-import pyperclip
+
+import functools
+import sys
+
+import async_recognizer
+import gesture_recognizer
+import latency_trace
+import lazy_import
+
+pyperclip = lazy_import.LazyModule("pyperclip")
 
 class DrawingTransformer(tk.Frame):
     LOCAL_IP = "localhost"
@@ -7,19 +16,41 @@ class DrawingTransformer(tk.Frame):
     CANVAS_SIDE = 300
     RECT_SIDE = 2
     
-    def __init__(self, master, socket, sqlReader):
+    # each stroke is a single line item, extended with the points drawn since the last redraw
+    # at most once every REDRAW_INTERVAL milliseconds (about the refresh rate of the display)
+    REDRAW_INTERVAL = 16
+    
+    # the points of a stroke are sent to the recognizer by chunks of STREAM_CHUNK_POINTS while
+    # it is drawn, so only the last chunk is left to send on release; a transformer with a
+    # simplifier sends the simplified strokes on release instead
+    STREAMING = True
+    STREAM_CHUNK_POINTS = 16
+    
+    # generated on the DrawingTransformer, on the Tk thread, once get_result has a new character
+    RECOGNITION_COMPLETE = "<<RecognitionComplete>>"
+    
+    def __init__(self, master, socket, sqlReader, recognizer = None, asyncRecognizer = None,
+                 recorder = None, simplifier = None):
         tk.Frame.__init__(self, master)
         
         self.configure(background = "white")
         self.addCanvas()
         self.canvas.configure(background = "white")
         
-        #
-        self.f = open("charGestures.txt", "w+")
-        #self.f.write("hello")
-        #self.master.protocol("WM_DELETE_WINDOW", lambda : self.f.close())
+        # a gesture_dataset.GestureRecorder, to keep the gestures drawn with their recognition
+        self.recorder = recorder
+        # a stroke_simplification.StrokeSimplifier applied to the strokes on release, which are
+        # then not streamed
+        self.simplifier = simplifier
         
         self.gui_socket = socket
+        if (recognizer is None):
+            recognizer = gesture_recognizer.SocketRecognizer(socket)
+        self.recognizer = recognizer
+        if (asyncRecognizer is None):
+            asyncRecognizer = async_recognizer.AsyncRecognizer(self.winfo_toplevel())
+        self.asyncRecognizer = asyncRecognizer
+        self.request = None
         
         self.setStrokes()
         
@@ -29,6 +60,11 @@ class DrawingTransformer(tk.Frame):
     def setStrokes(self):  
         self.strokes = []  
         self.strokesCount = 0
+        self.stream = None
+        self.streamedCount = 0
+        self.strokeLine = None
+        self.drawnCount = 0
+        self.redrawJob = None
         
     def addCanvas(self):
         self.canvas = tk.Canvas(self, width = DrawingTransformer.CANVAS_SIDE, 
@@ -43,35 +79,131 @@ class DrawingTransformer(tk.Frame):
     def onPress(self, event):
         self.strokes.append(list())
         self.strokes[self.strokesCount].append((event.x, event.y)) # avoids empty stroke
-        self.prevX = event.x
-        self.prevY = event.y
+        self.strokeLine = self.canvas.create_line(event.x, event.y, event.x, event.y, width = 2,
+                                                  capstyle = tk.ROUND, joinstyle = tk.ROUND)
+        self.drawnCount = 1
+        
+        if (DrawingTransformer.STREAMING and (self.simplifier is None) and (self.strokesCount == 0)):
+            self.stream = self.recognizer.open_stream()
+        self.streamedCount = 0
         
     def onMove(self, event):
-        self.canvas.create_line(event.x, event.y, self.prevX, self.prevY, width = 2)
         self.strokes[self.strokesCount].append((event.x, event.y))
-        self.prevX = event.x
-        self.prevY = event.y
+        if (self.redrawJob is None):
+            self.redrawJob = self.after(DrawingTransformer.REDRAW_INTERVAL, self.redrawStroke)
+        
+        if (len(self.strokes[self.strokesCount]) - self.streamedCount >= DrawingTransformer.STREAM_CHUNK_POINTS):
+            self.streamPoints()
+    
+    def redrawStroke(self):
+        """
+        Adds the points of the current stroke drawn since the last redraw to its line item.
+        """
+        
+        self.redrawJob = None
+        stroke = self.strokes[self.strokesCount]
+        if (self.drawnCount < len(stroke)):
+            self.canvas.insert(self.strokeLine, "end",
+                               [coordinate for point in stroke[self.drawnCount:] for coordinate in point])
+            self.drawnCount = len(stroke)
+    
+    def cancelRedraw(self):
+        if (self.redrawJob is not None):
+            self.after_cancel(self.redrawJob)
+            self.redrawJob = None
+    
+    def streamPoints(self):
+        """
+        Sends the points of the current stroke that the stream has not received yet. If the
+        recognizer is too busy to take them, the stream is cancelled once the points already
+        queued are sent, and the whole strokes are recognized on release instead.
+        """
+        
+        if ((self.stream is not None) and (self.strokesCount < 2)):
+            stroke = self.strokes[self.strokesCount]
+            if (self.asyncRecognizer.post(functools.partial(self.stream.add_points, self.strokesCount,
+                                                            stroke[self.streamedCount:]))):
+                self.streamedCount = len(stroke)
+            else:
+                self.asyncRecognizer.post_cleanup(self.stream.cancel)
+                self.stream = None
             
     def onRelease(self, event):
+        self.cancelRedraw()
+        self.redrawStroke()
+        self.streamPoints()
         self.strokesCount += 1
         
         if (self.strokesCount == 2):
-            self.gui_socket.sendall(repr(self.strokes).encode("utf-8"))
-            strokeIds = self.gui_socket.recv(16).decode("utf-8")
-            parsedIds = strokeIds[1:len(strokeIds) - 1].split(" ")[0:2]
-            self.result_char = self.sqlReader.select_new_char(parsedIds[0], parsedIds[1])
-            
-            #self.f.write(repr(self.strokes[0]))
-            #self.f.write("\n")
-            #self.message = resultChar + " copied"
-            
+            self.releaseStart = latency_trace.now()
+            if (self.simplifier is not None):
+                work = functools.partial(self.recognizeSimplified, list(self.strokes))
+            elif (self.stream is None):
+                work = functools.partial(self.recognizer.recognize, list(self.strokes))
+            else:
+                work = self.stream.finish
+            self.request = self.asyncRecognizer.submit(work, self.onRecognized, self.onRecognitionFailed)
+    
+    def recognizeSimplified(self, strokes):
+        """
+        Recognizes strokes once simplified, on the recognition worker.
+        """
+
+        return self.recognizer.recognize(self.simplifier.simplify_strokes(strokes))
+    
+    def onRecognized(self, letter_accent):
+        """
+        Receives the letter and accent of the gesture from the recognizer, on the Tk thread.
+        """
+        
+        (letter, accent) = letter_accent
+        self.request = None
+        self.stream = None
+        latency_trace.record("gesture.recognize", self.releaseStart)
+        
+        with latency_trace.span("gesture.select_new_char"):
+            try:
+                self.result_char = self.sqlReader.select_new_char(letter, accent)
+            except KeyError:
+                print("gesture not recognized: no character for", letter, accent, file = sys.stderr)
+                return
+        
+        if (self.recorder is not None):
+            self.recorder.record(letter, accent, self.strokes[0:2])
+        
+        with latency_trace.span("gesture.clipboard"):
             pyperclip.copy(self.result_char) 
+        latency_trace.record("gesture.on_release", self.releaseStart)
+        self.event_generate(DrawingTransformer.RECOGNITION_COMPLETE)
+    
+    def onRecognitionFailed(self, error):
+        self.request = None
+        if (self.stream is not None):
+            # a request that timed out may be skipped by the worker, leaving its stream open
+            self.asyncRecognizer.post_cleanup(self.stream.cancel)
+            self.stream = None
+        print("gesture not recognized:", repr(error), file = sys.stderr)
             
     def get_result(self):
         return self.result_char
     
     def reset(self, event):
+        self.cancelRecognition()
+        self.cancelRedraw()
         self.canvas.delete("all")
-        self.setStrokes() 
+        self.setStrokes()
+    
+    def cancelRecognition(self):
+        if (self.request is not None):
+            self.request.cancel()
+            self.request = None
+        if (self.stream is not None):
+            self.asyncRecognizer.post_cleanup(self.stream.cancel)
+            self.stream = None
+    
+    def destroy(self):
+        self.cancelRecognition()
+        self.cancelRedraw()
+        tk.Frame.destroy(self) 
 
         
\ No newline at end of file
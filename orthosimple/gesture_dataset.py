@@ -0,0 +1,104 @@
+'''
+Datasets of two-stroke gestures with their expected (letter, accent), stored as JSON lines:
+
+    {"letter": "e", "accent": "acute", "strokes": [[[x, y], ...], [[x, y], ...]]}
+
+DrawingTransformer records the gestures drawn on it when given a GestureRecorder, labelled with
+what the recognizer answered (fix the labels it got wrong before using the file as a
+benchmark). synthetic_samples produces a dataset from the templates, for the benchmarks.
+'''
+
+import json
+import math
+import random
+from collections import namedtuple
+
+import gesture_recognizer
+
+ACCENT_SCALE = 0.3
+
+GestureSample = namedtuple("GestureSample", ["letter", "accent", "strokes"])
+
+def load(path):
+    samples = []
+    with open(path) as dataset_file:
+        for line in dataset_file:
+            if (line.strip()):
+                record = json.loads(line)
+                samples.append(GestureSample(record["letter"], record["accent"],
+                                             [[tuple(point) for point in stroke]
+                                              for stroke in record["strokes"]]))
+    return samples
+
+def dump(path, samples):
+    with open(path, "w") as dataset_file:
+        for sample in samples:
+            dataset_file.write(to_line(sample))
+
+def to_line(sample):
+    return json.dumps({"letter": sample.letter, "accent": sample.accent,
+                       "strokes": [[list(point) for point in stroke] for stroke in sample.strokes]},
+                      separators = (",", ":")) + "\n"
+
+class GestureRecorder:
+    '''
+    Appends every sample it is given to the dataset at path, one line at a time, so a session
+    that ends abruptly keeps what it recorded.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+
+    def record(self, letter, accent, strokes):
+        with open(self.path, "a") as dataset_file:
+            dataset_file.write(to_line(GestureSample(letter, accent, strokes)))
+
+def distort(gesture, rng, scale = 1):
+    """
+    Produces gesture with a random number of points along it, scaled by scale and by up to 30%
+    along each axis, rotated by up to 12 degrees and with each point moved by up to 4, as in
+    recognizer/bench_cascade.rkt.
+    """
+
+    num_points = len(gesture)
+    num_distorted = 2 + num_points // 2 + rng.randrange(3 * num_points)
+    angle = (rng.random() - 0.5) * math.pi / 7.5
+    x_scale = scale * (0.7 + 0.6 * rng.random())
+    y_scale = scale * (0.7 + 0.6 * rng.random())
+
+    distorted = []
+    for k in range(num_distorted):
+        position = k * (num_points - 1) / (num_distorted - 1)
+        segment = min(int(position), num_points - 2)
+        fraction = position - segment
+        ((x1, y1), (x2, y2)) = (gesture[segment], gesture[segment + 1])
+        x = x_scale * (x1 + fraction * (x2 - x1))
+        y = y_scale * (y1 + fraction * (y2 - y1))
+        distorted.append((round(300 + x * math.cos(angle) - y * math.sin(angle) + 8 * (rng.random() - 0.5)),
+                          round(300 + x * math.sin(angle) + y * math.cos(angle) + 8 * (rng.random() - 0.5))))
+    return distorted
+
+def synthetic_samples(num_samples, seed = 0, trema_fraction = 0.1):
+    """
+    Produces num_samples distorted letter and accent templates, in random order. The accents
+    are drawn at ACCENT_SCALE, so that, as with a person's gestures, the letter is the longest
+    stroke. A trema_fraction of them have a dot instead of an accent.
+    """
+
+    rng = random.Random(seed)
+    templates = gesture_recognizer.load_templates()
+    samples = []
+    for _ in range(num_samples):
+        (letter, letter_gesture) = rng.choice(templates["letters"])
+        letter_stroke = distort(letter_gesture, rng)
+        if (rng.random() < trema_fraction):
+            (x, y) = letter_stroke[0]
+            (accent, accent_stroke) = ("trema", [(x, y - 40), (x + 1, y - 41)])
+        else:
+            (accent, accent_gesture) = rng.choice(templates["accents"])
+            accent_stroke = distort(accent_gesture, rng, ACCENT_SCALE)
+        strokes = [letter_stroke, accent_stroke]
+        if (rng.random() < 0.5):
+            strokes.reverse()
+        samples.append(GestureSample(letter, accent, strokes))
+    return samples
@@ -0,0 +1,432 @@
+'''
+Recognizers turn the two strokes drawn on the DrawingTransformer into a (letter, accent) pair
+of symbols from recognizer/gesture_associations.rkt.
+
+SocketRecognizer asks the racket server (recognizer/init_recognize.rkt) through the binary
+protocol of recognition_protocol. NumpyRecognizer is an in-process port of
+recognizer/recognize.rkt: the templates are sub-sampled and normalized once, and a candidate is
+scored against all of them in a single vectorized operation. The functions below mirror the
+ones with the same name in recognize.rkt, and their examples are the tests of that file
+(python3 -m doctest gesture_recognizer.py).
+
+Both recognizers can also open a stream, to which the points of the strokes are added while
+they are drawn (add_points), so that little work is left once the gesture is complete (finish).
+'''
+
+import re
+from pathlib import Path
+
+import latency_trace
+import lazy_import
+import recognition_protocol
+
+np = lazy_import.LazyModule("numpy")
+
+TEMPLATES_FILE = Path(__file__).resolve().parent / "recognizer" / "gesture_associations.rkt"
+NUM_SAMPLE_POINTS = 10
+
+MIN_LENGTH = 5
+MIN_WIDTH = 20
+MIN_HEIGHT = 20
+NORM_SIZE = 200
+
+def load_templates(path = TEMPLATES_FILE):
+    """
+    Reads the template libraries defined in path and produces a dictionary from their names
+    (letters, accents) to lists of (symbol, gesture) pairs, in the order they are defined.
+    """
+
+    tokens = re.findall(r"[()']|[^\s()']+", Path(path).read_text())
+    position = 0
+
+    def parse():
+        nonlocal position
+        token = tokens[position]
+        position += 1
+        if (token == "("):
+            items = []
+            while (tokens[position] != ")"):
+                items.append(parse())
+            position += 1
+            return items
+        if (token == "'"):
+            return ["quote", parse()]
+        try:
+            return int(token)
+        except ValueError:
+            try:
+                return float(token)
+            except ValueError:
+                return token
+
+    libraries = dict({})
+    while (position < len(tokens)):
+        form = parse()
+        if (isinstance(form, list) and (len(form) == 3) and (form[0] == "define") and
+            isinstance(form[2], list) and (form[2][0] == "quote")):
+            libraries[form[1]] = [(symbol, [tuple(point) for point in gesture])
+                                  for (symbol, gesture) in form[2][1]]
+    return libraries
+
+def gesture_length(gesture):
+    """
+    Produces the sum of the distances between adjacent points of gesture, added up in the same
+    order as recognize.rkt so that comparisons between lengths give the same result.
+
+    >>> gesture_length([])
+    0.0
+    >>> gesture_length([(5, 2)])
+    0.0
+    >>> gesture_length([(1, 1), (2, 1), (2, 2), (1, 2), (1, 1)])
+    4.0
+    >>> gesture_length([(3, 3), (3, 3)])
+    0.0
+    >>> round(gesture_length([(2, -1), (1, -2), (2, -1)]), 2)
+    2.83
+    """
+
+    if (len(gesture) < 2):
+        return 0.0
+    points = np.asarray(gesture, dtype = float)
+    distances = np.sqrt(np.square(points[1:] - points[:-1]).sum(axis = 1))
+    return float(np.add.accumulate(distances[::-1])[-1])
+
+def sub_sample(gesture, num_points):
+    """
+    Produces num_points points of gesture: the points at index floor(k * n / (num_points - 1))
+    for k in 0, ..., num_points - 2, n being the number of points in gesture, then its last point.
+
+    >>> sub_sample([(4, 4), (5, 5), (6, 6)], 3).tolist()
+    [[4, 4], [5, 5], [6, 6]]
+    >>> sub_sample([(1, 1), (3, 3)], 4).tolist()
+    [[1, 1], [1, 1], [3, 3], [3, 3]]
+    >>> sub_sample([(1, 1), (3, 3), (5, 5), (7, 7), (2, 2), (4, 4), (6, 6), (8, 8),
+    ...             (9, 9), (0, 9)], 8).tolist()
+    [[1, 1], [3, 3], [5, 5], [2, 2], [4, 4], [8, 8], [9, 9], [0, 9]]
+    >>> sub_sample([(2, 3)], 3).tolist()
+    [[2, 3], [2, 3], [2, 3]]
+    >>> sub_sample([(1, 1), (2, 2), (3, 3), (4, 4), (5, 5), (6, 6), (7, 7), (8, 8)], 5).tolist()
+    [[1, 1], [3, 3], [5, 5], [7, 7], [8, 8]]
+    >>> sub_sample([(10, 9), (8, 7), (6, 5)], 7).tolist()
+    [[10, 9], [10, 9], [8, 7], [8, 7], [6, 5], [6, 5], [6, 5]]
+    """
+
+    num_gesture_points = len(gesture)
+    indices = (np.arange(num_points) * num_gesture_points) // (num_points - 1)
+    indices[-1] = num_gesture_points - 1
+    return np.asarray([gesture[index] for index in indices])
+
+def normalize_gesture(gesture):
+    """
+    Moves gesture to (0, 0) and scales each axis to NORM_SIZE, unless the gesture is narrower
+    than MIN_WIDTH or shorter than MIN_HEIGHT along it.
+
+    >>> normalize_gesture([(40, 50), (80, 90)]).tolist()
+    [[0.0, 0.0], [200.0, 200.0]]
+    >>> normalize_gesture([(80, 90), (40, 130)]).tolist()
+    [[200.0, 0.0], [0.0, 200.0]]
+    >>> normalize_gesture([(0, 0), (100, 100)]).tolist()
+    [[0.0, 0.0], [200.0, 200.0]]
+    >>> normalize_gesture([(100, 0), (100, 50), (200, 50)]).tolist()
+    [[0.0, 0.0], [0.0, 200.0], [200.0, 200.0]]
+    >>> np.round(normalize_gesture([(20, 10), (80, 5), (25, 10)]), 2).tolist()
+    [[0.0, 5.0], [200.0, 0.0], [16.67, 5.0]]
+    >>> np.round(normalize_gesture([(20, 20), (220, 300), (70, 70)]), 2).tolist()
+    [[0.0, 0.0], [200.0, 200.0], [50.0, 35.71]]
+    >>> normalize_gesture([(30, 225), (130, 25), (130, 425), (230, 225)]).tolist()
+    [[0.0, 100.0], [100.0, 0.0], [100.0, 200.0], [200.0, 100.0]]
+    """
+
+    points = np.asarray(gesture, dtype = float)
+    low = points.min(axis = 0)
+    size = points.max(axis = 0) - low
+    moved = points - low
+    return np.where(size < (MIN_WIDTH, MIN_HEIGHT), moved, moved * NORM_SIZE / np.maximum(size, 1))
+
+def prepare(gesture, num_sample_points):
+    return normalize_gesture(sub_sample(gesture, num_sample_points))
+
+def match_scores(candidate, templates):
+    """
+    Produces the average distance between the points of the prepared candidate and each of the
+    prepared templates, a (templates, points, 2) array.
+    """
+
+    distances = np.sqrt(np.square(templates - candidate).sum(axis = 2))
+    return np.add.accumulate(distances[:, ::-1], axis = 1)[:, -1] / candidate.shape[0]
+
+def geometric_match_spatial(gesture1, gesture2, num_sample_points):
+    """
+    >>> round(geometric_match_spatial([(0, 200), (200, 0)],
+    ...                               [(0, 200), (0, 100), (200, 100), (200, 0)], 3), 2)
+    33.33
+    >>> round(geometric_match_spatial([(100, 0), (100, 200), (0, 100), (200, 100), (100, 0)],
+    ...                               [(100, 0), (100, 200), (0, 100), (200, 100), (100, 200),
+    ...                                (200, 200)], 5), 2)
+    169.44
+    >>> round(geometric_match_spatial([(200, 0), (100, 0), (0, 0), (0, 100), (100, 100), (0, 100),
+    ...                                (0, 200), (100, 200), (200, 200)],
+    ...                               [(200, 0), (100, 0), (50, 50), (0, 100), (100, 100), (0, 100),
+    ...                                (50, 150), (100, 200), (200, 200)], 7), 2)
+    10.1
+    """
+
+    templates = prepare(gesture2, num_sample_points)[np.newaxis]
+    return float(match_scores(prepare(gesture1, num_sample_points), templates)[0])
+
+class TemplateLibrary:
+    '''
+    A template library with every gesture sub-sampled and normalized for num_sample_points.
+    '''
+
+    def __init__(self, library, num_sample_points):
+        self.symbols = [symbol for (symbol, gesture) in library]
+        self.num_sample_points = num_sample_points
+        self.templates = np.stack([prepare(gesture, num_sample_points) for (symbol, gesture) in library])
+
+    def closest(self, candidate):
+        """
+        Produces the symbol of the template closest to candidate and its score. On a tie, the
+        template defined last wins, as in spatial-rec.
+        """
+
+        scores = match_scores(prepare(candidate, self.num_sample_points), self.templates)
+        index = len(scores) - 1 - int(np.argmin(scores[::-1]))
+        return (self.symbols[index], float(scores[index]))
+
+def spatial_rec(candidate, library, num_sample_points):
+    """
+    >>> spatial_rec([(0, 200), (200, 0)],
+    ...             [("corner", [(0, 200), (0, 0), (200, 0)]),
+    ...              ("elbows", [(0, 200), (0, 100), (200, 100), (200, 0)]),
+    ...              ("zigzag", [(0, 200), (100, 100), (100, 200), (200, 0)])], 3)
+    'elbows'
+    >>> spatial_rec([(200, 0), (100, 0), (0, 0), (0, 100), (100, 100), (0, 100), (0, 200),
+    ...              (100, 200), (200, 200)],
+    ...             [("greater-than", [(200, 0), (0, 100), (200, 200)]),
+    ...              ("sigma", [(200, 50), (200, 0), (0, 0), (100, 100), (0, 200), (200, 200),
+    ...                         (200, 150)]),
+    ...              ("lowercase-e", [(200, 0), (100, 0), (50, 50), (0, 100), (100, 100),
+    ...                               (0, 100), (50, 150), (100, 200), (200, 200)])], 6)
+    'lowercase-e'
+    """
+
+    return TemplateLibrary(library, num_sample_points).closest(candidate)[0]
+
+class NumpyRecognizer:
+    '''
+    Recognizes two strokes in process, like two-stroke-rec: the longer stroke is the letter,
+    and the accent is a trema when either stroke is no longer than MIN_LENGTH.
+
+    >>> letters = dict(load_templates()["letters"])
+    >>> accents = dict(load_templates()["accents"])
+    >>> recognizer = NumpyRecognizer()
+    >>> recognizer.recognize([accents["acute"], letters["a"]])
+    ('a', 'acute')
+    >>> recognizer.recognize([letters["e"], [(10, 10), (12, 11)]])
+    ('e', 'trema')
+    >>> recognizer.recognize([[(5, 5), (6, 6)], [(0, 0), (3, 4)]])
+    ('i', 'trema')
+    >>> stream = recognizer.open_stream()
+    >>> for start in range(0, len(letters["o"]), 7):
+    ...     stream.add_points(0, letters["o"][start:start + 7])
+    >>> stream.add_points(1, accents["grave"])
+    >>> stream.finish()
+    ('o', 'grave')
+    '''
+
+    def __init__(self, num_sample_points = NUM_SAMPLE_POINTS, templates_file = TEMPLATES_FILE):
+        libraries = load_templates(templates_file)
+        self.letters = TemplateLibrary(libraries["letters"], num_sample_points)
+        self.accents = TemplateLibrary(libraries["accents"], num_sample_points)
+
+    def recognize(self, strokes):
+        return self.recognize_with_scores(strokes)[0:2]
+
+    def recognize_with_scores(self, strokes):
+        """
+        Produces the letter, the accent, and the scores of their closest templates (None for a
+        trema, which is not matched).
+        """
+
+        return self.recognize_with_lengths(strokes, [gesture_length(stroke) for stroke in strokes])
+
+    def recognize_with_lengths(self, strokes, lengths):
+        """
+        Is recognize_with_scores for strokes whose lengths are already known.
+        """
+
+        (len1, len2) = lengths[0:2]
+        if (len1 >= len2):
+            (letter_stroke, accent_stroke) = (strokes[0], strokes[1])
+        else:
+            (letter_stroke, accent_stroke) = (strokes[1], strokes[0])
+
+        (letter, letter_score) = self.letters.closest(letter_stroke)
+        if ((len1 <= MIN_LENGTH) or (len2 <= MIN_LENGTH)):
+            (accent, accent_score) = ("trema", None)
+        else:
+            (accent, accent_score) = self.accents.closest(accent_stroke)
+        return (letter, accent, letter_score, accent_score)
+
+    def open_stream(self):
+        return NumpyStream(self)
+
+class NumpyStream:
+    '''
+    The strokes of a gesture given to a NumpyRecognizer while they are drawn. The length of each
+    stroke is kept up to date, so finishing the stream only samples and matches the strokes.
+    '''
+
+    def __init__(self, recognizer):
+        self.recognizer = recognizer
+        self.strokes = []
+        self.lengths = []
+
+    def add_points(self, stroke_index, points):
+        while (len(self.strokes) <= stroke_index):
+            self.strokes.append([])
+            self.lengths.append(0.0)
+        stroke = self.strokes[stroke_index]
+        if (points):
+            self.lengths[stroke_index] += gesture_length(stroke[-1:] + list(points))
+            stroke.extend(points)
+
+    def finish(self):
+        return self.finish_with_scores()[0:2]
+
+    def finish_with_scores(self):
+        return self.recognizer.recognize_with_lengths(self.strokes, self.lengths)
+
+    def cancel(self):
+        self.strokes = []
+        self.lengths = []
+
+class SocketRecognizer:
+    '''
+    Sends the strokes to the racket recognizer server through socket in recognize frames of
+    recognition_protocol, and reads the results it answers with. With a timeout, socket.timeout
+    is raised when the server does not answer in time; its late answer is dropped by the next
+    read.
+    '''
+
+    def __init__(self, socket, num_sample_points = NUM_SAMPLE_POINTS, timeout = None):
+        self.socket = socket
+        if (timeout is not None):
+            socket.settimeout(timeout)
+        self.num_sample_points = num_sample_points
+        self.frame_reader = recognition_protocol.FrameReader(socket)
+        self.next_request_id = 0
+
+    def recognize(self, strokes):
+        return self.recognize_with_scores(strokes)[0:2]
+
+    def recognize_with_scores(self, strokes):
+        start = latency_trace.now()
+        result = self.recognize_many([strokes])[0]
+        latency_trace.record("gesture.round_trip", start)
+        return result
+
+    def recognize_many(self, strokes_list):
+        """
+        Produces the (letter, accent, letter score, accent score) of each strokes in
+        strokes_list. All the requests are sent before the first result is read, so the server
+        works on them while the results travel back.
+        """
+
+        request_ids = []
+        frames = []
+        for strokes in strokes_list:
+            request_ids.append(self.new_request_id())
+            frames.append(recognition_protocol.encode_frame(
+                recognition_protocol.RECOGNIZE, request_ids[-1],
+                recognition_protocol.encode_recognize(self.num_sample_points, strokes)))
+        self.socket.sendall(b"".join(frames))
+        return self.read_results(request_ids)
+
+    def open_stream(self):
+        return SocketStream(self, self.new_request_id())
+
+    def new_request_id(self):
+        request_id = self.next_request_id
+        self.next_request_id = (self.next_request_id + 1) % (1 << 32)
+        return request_id
+
+    def send(self, frame_type, request_id, payload):
+        self.socket.sendall(recognition_protocol.encode_frame(frame_type, request_id, payload))
+
+    def read_results(self, request_ids):
+        """
+        Reads frames until the results of all request_ids arrived, and produces them in the
+        same order. Results of other requests, such as cancelled streams, are dropped.
+        """
+
+        results = dict({})
+        while (len(results) < len(request_ids)):
+            frame = self.frame_reader.read_frame()
+            if (frame is None):
+                raise ConnectionError("the recognizer closed the connection")
+            (frame_type, request_id, payload) = frame
+            if (request_id not in request_ids):
+                continue
+            if (frame_type == recognition_protocol.ERROR):
+                raise recognition_protocol.ProtocolError(payload.decode("utf-8"))
+            ((letter, letter_score), (accent, accent_score)) = recognition_protocol.decode_result(payload)
+            results[request_id] = (letter, accent, letter_score, accent_score)
+        return [results[request_id] for request_id in request_ids]
+
+class SocketStream:
+    '''
+    The strokes of a gesture sent to the racket recognizer server while they are drawn, in
+    stroke points frames. The server keeps their points and lengths, so finishing the stream
+    only waits for it to sample and match the strokes.
+    '''
+
+    def __init__(self, recognizer, request_id):
+        self.recognizer = recognizer
+        self.request_id = request_id
+
+    def add_points(self, stroke_index, points):
+        self.recognizer.send(recognition_protocol.STROKE_POINTS, self.request_id,
+                             recognition_protocol.encode_stroke_points(stroke_index, points))
+
+    def finish(self):
+        return self.finish_with_scores()[0:2]
+
+    def finish_with_scores(self):
+        start = latency_trace.now()
+        self.recognizer.send(recognition_protocol.RECOGNIZE_STREAM, self.request_id,
+                             recognition_protocol.encode_recognize_stream(self.recognizer.num_sample_points))
+        result = self.recognizer.read_results([self.request_id])[0]
+        latency_trace.record("gesture.round_trip", start)
+        return result
+
+    def cancel(self):
+        self.recognizer.send(recognition_protocol.CANCEL_STREAM, self.request_id, b"")
+
+class TextSocketRecognizer:
+    '''
+    The original client, which sends the strokes as a python literal and reads the two symbols
+    padded to 16 bytes. The server still answers it, for the benchmarks.
+    '''
+
+    def __init__(self, socket):
+        self.socket = socket
+
+    def recognize(self, strokes):
+        start = latency_trace.now()
+        self.socket.sendall(repr(strokes).encode("utf-8"))
+        strokeIds = self.socket.recv(16).decode("utf-8")
+        latency_trace.record("gesture.round_trip", start)
+
+        parsedIds = strokeIds[1:len(strokeIds) - 1].split(" ")[0:2]
+        return (parsedIds[0], parsedIds[1])
+
+BACKENDS = ("racket", "numpy")
+
+def create(backend, socket, timeout = None):
+    if (backend == "racket"):
+        return SocketRecognizer(socket, timeout = timeout)
+    if (backend == "numpy"):
+        return NumpyRecognizer()
+    raise ValueError(backend + " is not a recognizer backend")
@@ -0,0 +1,70 @@
+'''
+The one keyboard listener of the application. Every key pressed is handed once to each
+subscriber, in the order they subscribed, on the listener thread, so keys reach all of them
+in the order they were typed. Subscribers have to return quickly, since the next key is only
+delivered once they are done: slow work, such as sending key events, belongs in a
+output_sinks.QueuedSink.
+
+The key events an output sink sends come back to the listener. They are ignored when pynput
+marks them as injected, which the backends of MARKING_BACKENDS do; with the others, the keys
+the sink's injected_keys expects are ignored instead.
+
+Usage:
+    hub = KeyEventHub(sink.injected_keys)
+    hub.subscribe(on_press)
+    hub.start()
+'''
+
+import sys
+import threading
+
+import lazy_import
+
+keyboard = lazy_import.LazyModule("pynput.keyboard")
+
+# the pynput backends whose listener marks the key events sent by programs as injected: on Xorg,
+# the events sent through XTest are not marked, and uinput cannot tell
+MARKING_BACKENDS = ("pynput.keyboard._win32", "pynput.keyboard._darwin")
+
+class KeyEventHub:
+    def __init__(self, injected_keys = None):
+        self.injected_keys = injected_keys
+        self.subscribers = ()
+        self.lock = threading.Lock()
+        self.listener = None
+
+    def subscribe(self, on_press):
+        with self.lock:
+            self.subscribers = self.subscribers + (on_press,)
+
+    def unsubscribe(self, on_press):
+        with self.lock:
+            self.subscribers = tuple(subscriber for subscriber in self.subscribers
+                                     if (subscriber != on_press))
+
+    def start(self):
+        if (self.listener is None):
+            self.listener = keyboard.Listener(on_press = self.dispatch, on_release = None)
+            if (type(self.listener).__module__ in MARKING_BACKENDS):
+                self.injected_keys = None
+            self.listener.start()
+
+    def stop(self):
+        if (self.listener is not None):
+            self.listener.stop()
+            self.listener = None
+
+    def dispatch(self, key, injected = False):
+        """
+        Hands key to every subscriber, unless the listener marked it as sent by a program
+        (injected) or it is the next key injected_keys expects. A subscriber that fails does not
+        keep the key from the others, nor stop the listener.
+        """
+
+        if (injected or ((self.injected_keys is not None) and self.injected_keys.is_injected(key))):
+            return
+        for on_press in self.subscribers:
+            try:
+                on_press(key)
+            except Exception as error:
+                print("key subscriber failed:", repr(error), file = sys.stderr)
@@ -0,0 +1,153 @@
+from collections import namedtuple
+
+from pynput import keyboard
+
+import output_sinks
+
+# A Rule describes one special group of a language: the characters in plain are replaced by the
+# characters at the same position in new when they are typed right after binding. A binding of
+# None is the circumflex rule, where the character has to be typed twice in a row.
+Rule = namedtuple("Rule", ["group", "binding", "plain", "new"])
+
+def merge_rules(rule_lists):
+    """
+    Produces the Rules of several languages, given by order of priority, as one Rule per group
+    and binding. When the same character typed after the same binding is replaced in more than
+    one language, the first language's replacement is kept, so a key never fires two Rules.
+    """
+
+    merged = dict({})
+    claimed = set()
+    for rules in rule_lists:
+        for rule in rules:
+            (plain, new) = merged.get((rule.group, rule.binding), ((), ()))
+            for (plain_char, new_char) in zip(rule.plain, rule.new):
+                if ((rule.binding, plain_char) not in claimed):
+                    claimed.add((rule.binding, plain_char))
+                    plain += (plain_char,)
+                    new += (new_char,)
+            merged[(rule.group, rule.binding)] = (plain, new)
+    return [Rule(group, binding, plain, new)
+            for ((group, binding), (plain, new)) in merged.items() if plain]
+
+class KeystrokeAutomaton:
+    '''
+    A single state machine compiled from all the Rules of a language. It behaves like running
+    every Rule's Mapping on each key (see LanguageInput.reference_mappings), but the Mappings
+    all share the same previous key and caps lock state, so it only keeps one copy of that state
+    and handles a key with one lookup in a transition table keyed by
+    (previous letter, letter typed, character typed).
+    '''
+
+    def __init__(self, rules, sink = None):
+        self.rules = tuple(rules)
+        self.sink = output_sinks.default_sink() if (sink is None) else sink
+        self.maps = tuple(dict(zip(rule.plain, rule.new)) for rule in self.rules)
+        self.transitions = dict({})
+        self.__compile()
+
+        self.prevKey = ""
+        self.capsLockOn = False
+        self.prev_transformed = [None] * len(self.rules)
+        self.special_names = dict({})
+
+    def reset(self, caps_lock_on = False):
+        """
+        Forgets the keys typed so far, as if the automaton had just been created, but with the
+        given caps lock state. Nothing is allocated, so an automaton can be reused at no cost.
+        """
+
+        self.prevKey = ""
+        self.capsLockOn = caps_lock_on
+        for index in range(len(self.prev_transformed)):
+            self.prev_transformed[index] = None
+
+    def __compile(self):
+        """
+        Fills the transition table for every combination of previous letter and letter typed that
+        can trigger a Rule, with and without caps lock. Other combinations are added by
+        transition the first time they occur.
+        """
+
+        letters = set()
+        for rule_map in self.maps:
+            for char in rule_map:
+                letters.update((char, char.lower(), char.upper()))
+        prev_letters = letters.union(rule.binding for rule in self.rules if rule.binding is not None)
+
+        for prev in prev_letters:
+            for letter in letters:
+                self.transition(prev, letter, letter)
+                self.transition(prev, letter, letter.upper())
+
+    def transition(self, prev, letter, char):
+        """
+        Produces a tuple of (rule index, new character) for every Rule that fires when letter
+        is typed after prev, char being the character looked up in the Rules' maps.
+        """
+
+        key = (prev, letter, char)
+        fired = self.transitions.get(key)
+        if (fired is None):
+            fired = []
+            for (index, rule) in enumerate(self.rules):
+                if (rule.binding is None):
+                    condition = (letter == prev)
+                else:
+                    condition = (prev == rule.binding)
+                if (condition and (char in self.maps[index])):
+                    fired.append((index, self.maps[index][char]))
+            fired = tuple(fired)
+            self.transitions[key] = fired
+        return fired
+
+    def update(self, key_typed):
+        if (isinstance(key_typed, keyboard.KeyCode)):
+            special_name = None
+        else:
+            special_name = self.special_names.get(key_typed)
+            if (special_name is None):
+                special_name = self.special_names.setdefault(key_typed, str(key_typed))
+
+        if ((special_name == "Key.backspace") and (str(self.prevKey) == "'v'")):
+            for (index, transformed) in enumerate(self.prev_transformed):
+                if (transformed is not None):
+                    self.sink.insert(transformed)
+                    self.prev_transformed[index] = None
+
+        if (special_name == "Key.caps_lock"):
+            self.capsLockOn = not self.capsLockOn
+            return
+
+        if (special_name is None):
+            (letter_typed, char_typed) = self.__classify(key_typed)
+        else:
+            (letter_typed, char_typed) = ("", None)
+        if (self.capsLockOn and (letter_typed != "")):
+            char_typed = letter_typed.upper()
+
+        for (index, new_char) in self.transition(self.prevKey, letter_typed, char_typed):
+            self.sink.replace(letter_typed, new_char)
+            self.prev_transformed[index] = self.prevKey + letter_typed
+
+        # Mapping.SEQUENCES (shift then "<" or ">") are not compiled: Mapping.__updatePrevKey
+        # compares the letter typed, a str, with the KeyCodes and Keys of the sequences, which
+        # are never equal to it, so the Mappings always update the previous key as well
+        self.prevKey = letter_typed
+
+    def __classify(self, key_typed):
+        """
+        Produces the letter typed, as Mapping derives it from str(key_typed), and the character
+        that Mapping would find key_typed equal to in its map (None if there is none).
+        """
+
+        char = getattr(key_typed, "char", None)
+        if ((char is not None) and (not key_typed.is_dead)):
+            if ((len(char) == 1) and char.isprintable()):
+                return (char, char)
+            return ("", char)
+
+        typed_str = str(key_typed)
+        if (len(typed_str) == 3):
+            return (typed_str[1], None)
+        return ("", None)
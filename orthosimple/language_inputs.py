@@ -1,54 +1,127 @@
+import keystroke_automaton
+import latency_trace
 import mappings
-from pynput import keyboard
         
 class KeyboardListener:
-    def __init__(self, language):
+    '''
+    Runs the keys delivered by hub, a key_event_hub.KeyEventHub, through the current language.
+    '''
+    
+    def __init__(self, language, hub):
         self.language = language
-        
-        self.on_press = lambda key: self.language.update(key) 
-        self.key_listener = keyboard.Listener(on_press = self.on_press, 
-                                              on_release = None)
-        self.key_listener.start()
+        self.hub = hub
+        hub.subscribe(self.on_press)
+    
+    def on_press(self, key):
+        start = latency_trace.now()
+        self.language.update(key)
+        latency_trace.record("keyboard.on_press", start)
     
     def update_language(self, language_input):
-        self.language = language_input
+        """
+        Switches to language_input, keeping the caps lock state. The listener thread sees either
+        the previous language or the new one, whose automaton starts as if no key had been typed.
+        """
+        
+        if (language_input is not self.language):
+            language_input.automaton.reset(self.language.automaton.capsLockOn)
+            self.language = language_input
     
     def get_language(self):
         return self.language.language
         
 class LanguageInput:
-    def __init__(self, language_abbrev, association_reader):
-        self.mappings = []
+    def __init__(self, language_abbrev, association_reader, sink = None):
+        self.rules = []
         self.language = language_abbrev
         self.association_reader = association_reader
+        self.sink = sink
         
         self.add_all_mappings()
+        self.automaton = keystroke_automaton.KeystrokeAutomaton(self.rules, sink)
     
     def add_all_mappings(self):
         """
         Appends all of the mappings for the language, based on the default
-        keystrokes for the special groups, to the mappings field via add_mapping
+        keystrokes for the special groups, to the rules field via add_mapping
         """ 
         
         groups = self.association_reader.get_groups(self.language)
         for special_group in groups:
             if (special_group == "circumflex"):
-                map_condition = lambda curr, prev: curr == prev; 
+                binding = None # the character is typed twice instead
             else:
-                map_condition = self.default_mapping(self.association_reader.get_binding(special_group))
-            self.add_mapping(map_condition, special_group, self.language)
+                binding = self.association_reader.get_binding(special_group)
+            self.add_mapping(binding, special_group, self.language)
             
-    def add_mapping(self, map_condition, group, language_abbrev):
+    def add_mapping(self, binding, group, language_abbrev):
         char_association = self.association_reader.select_char_association(group, language_abbrev)
-        self.mappings.append(mappings.Mapping(map_condition, char_association.iloc[:,0],
-                                              char_association.iloc[:,1]))
+        self.rules.append(keystroke_automaton.Rule(group, binding, char_association[0],
+                                                   char_association[1]))
+    
+    def reference_mappings(self):
+        """
+        Produces one Mapping per rule. Running every key through all of them has the same effect
+        as the automaton, which is compiled from the same rules.
+        """
+        
+        reference = []
+        for rule in self.rules:
+            if (rule.binding is None):
+                map_condition = lambda curr, prev: curr == prev; 
+            else:
+                map_condition = self.default_mapping(rule.binding)
+            reference.append(mappings.Mapping(map_condition, rule.plain, rule.new, sink = self.sink))
+        return reference
  
     def default_mapping(self, prev_to_match):
         return lambda curr, prev : prev == prev_to_match
     
     def update(self, keyTyped):
-        for accentMapping in self.mappings:
-            accentMapping.writeNewChar(keyTyped)
+        self.automaton.update(keyTyped)
+
+class MultiLanguageInput(LanguageInput):
+    '''
+    Several languages active at once, through a single automaton compiled from their Rules
+    merged by keystroke_automaton.merge_rules: when two of the languages replace the same keys,
+    the one that comes first in language_inputs wins.
+    '''
+    
+    def __init__(self, language_inputs, sink = None):
+        self.languages = tuple(language_input.language for language_input in language_inputs)
+        self.language = self.languages[0]
+        self.association_reader = language_inputs[0].association_reader
+        self.sink = sink
+        
+        self.rules = keystroke_automaton.merge_rules([language_input.rules for language_input in language_inputs])
+        self.automaton = keystroke_automaton.KeystrokeAutomaton(self.rules, sink)
+
+class PreloadedLanguages:
+    '''
+    The LanguageInput of every language of association_reader, compiled once, so that switching
+    languages only changes which one the KeyboardListener uses. The MultiLanguageInputs are
+    compiled the first time they are asked for, and kept as well.
+    '''
+    
+    def __init__(self, association_reader, sink = None):
+        self.sink = sink
+        self.inputs = dict({})
+        for language_abbrev in association_reader.language_groups:
+            self.inputs[language_abbrev] = LanguageInput(language_abbrev, association_reader, sink)
+        self.merged = dict({})
+    
+    def get(self, language_abbrevs):
+        """
+        Produces the input of the languages in language_abbrevs, a tuple of abbreviations by order
+        of priority.
+        """
+        
+        if (len(language_abbrevs) == 1):
+            return self.inputs[language_abbrevs[0]]
+        if (language_abbrevs not in self.merged):
+            self.merged[language_abbrevs] = MultiLanguageInput(
+                [self.inputs[language_abbrev] for language_abbrev in language_abbrevs], self.sink)
+        return self.merged[language_abbrevs]
 
 '''
 DEPRECATED
@@ -0,0 +1,158 @@
+'''
+Keeps a latency histogram per named span of the keyboard and gesture paths and periodically
+writes them to a JSON file, by default latency.json next to this module. Recording a span is a clock read and a few integer operations, so
+tracing is always on.
+
+Usage:
+    start = latency_trace.now()
+    ...
+    latency_trace.record("gesture.round_trip", start)
+'''
+
+import atexit
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+now = time.perf_counter_ns
+
+DEFAULT_FILE = Path(__file__).resolve().parent / "latency.json"
+
+class LatencyHistogram:
+    '''
+    A log-linear histogram of durations in nanoseconds, in the style of HdrHistogram: each power
+    of two is split into 2 ** SUB_BUCKET_BITS buckets, so a recorded value is known to within
+    about 3%, whatever its magnitude, in a fixed amount of memory.
+    '''
+
+    SUB_BUCKET_BITS = 5
+
+    def __init__(self):
+        self.counts = dict({})
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+        self.lock = threading.Lock()
+
+    def record(self, value):
+        value = max(value, 0)
+        index = self.bucket_index(value)
+        with self.lock:
+            self.counts[index] = self.counts.get(index, 0) + 1
+            self.count += 1
+            self.total += value
+            if ((self.min is None) or (value < self.min)):
+                self.min = value
+            if (value > self.max):
+                self.max = value
+
+    def bucket_index(self, value):
+        magnitude = value.bit_length() - 1 - self.SUB_BUCKET_BITS
+        if (magnitude <= 0):
+            return value
+        return (magnitude << self.SUB_BUCKET_BITS) + (value >> magnitude)
+
+    def bucket_value(self, index):
+        """
+        Produces the smallest value that falls in the bucket at index.
+        """
+
+        if (index < (2 << self.SUB_BUCKET_BITS)):
+            return index
+        magnitude = (index >> self.SUB_BUCKET_BITS) - 1
+        return (index - (magnitude << self.SUB_BUCKET_BITS)) << magnitude
+
+    def percentile(self, percent):
+        with self.lock:
+            counts = sorted(self.counts.items())
+            count = self.count
+        if (count == 0):
+            return 0
+
+        rank = max(1, round(count * percent / 100))
+        seen = 0
+        for (index, bucket_count) in counts:
+            seen += bucket_count
+            if (seen >= rank):
+                return self.bucket_value(index)
+        return self.max
+
+    def to_dict(self):
+        with self.lock:
+            summary = {"count": self.count, "min_ns": self.min or 0, "max_ns": self.max,
+                       "mean_ns": (self.total // self.count) if self.count else 0,
+                       "buckets": [[self.bucket_value(index), bucket_count]
+                                   for (index, bucket_count) in sorted(self.counts.items())]}
+        for percent in (50, 90, 99, 99.9):
+            summary["p%s_ns" % percent] = self.percentile(percent)
+        return summary
+
+_histograms = dict({})
+_histograms_lock = threading.Lock()
+_dump_timer = None
+
+def histogram(name):
+    found = _histograms.get(name)
+    if (found is None):
+        with _histograms_lock:
+            found = _histograms.setdefault(name, LatencyHistogram())
+    return found
+
+def record(name, start):
+    """
+    Records the time elapsed since start, a value produced by now, under the span name.
+    """
+
+    histogram(name).record(now() - start)
+
+class span:
+    '''
+    A context manager that records the time spent in its body under the span name.
+    '''
+
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = now()
+
+    def __exit__(self, *exc_info):
+        record(self.name, self.start)
+
+def dump(path):
+    """
+    Writes every histogram to path as JSON, replacing the previous dump in a single step.
+    """
+
+    with _histograms_lock:
+        names = list(_histograms)
+    histograms = dict((name, _histograms[name].to_dict()) for name in sorted(names))
+    temporary_path = str(path) + ".tmp"
+    with open(temporary_path, "w") as dump_file:
+        json.dump({"time": time.time(), "spans": histograms}, dump_file)
+    os.replace(temporary_path, path)
+
+def start_dumping(path = DEFAULT_FILE, interval = 60):
+    """
+    Dumps the histograms to path every interval seconds, and when the program exits.
+    """
+
+    global _dump_timer
+
+    def dump_periodically():
+        global _dump_timer
+        dump(path)
+        _dump_timer = threading.Timer(interval, dump_periodically)
+        _dump_timer.daemon = True
+        _dump_timer.start()
+
+    if (_dump_timer is None):
+        _dump_timer = threading.Timer(interval, dump_periodically)
+        _dump_timer.daemon = True
+        _dump_timer.start()
+        atexit.register(dump, path)
@@ -0,0 +1,31 @@
+import sys
+
+class LazyModule:
+    '''
+    Stands in for a module that is only imported the first time one of its attributes is used,
+    so that heavy dependencies do not delay the first frame of the gui.
+    '''
+
+    def __init__(self, name, on_load = None):
+        object.__setattr__(self, "_name", name)
+        object.__setattr__(self, "_on_load", on_load)
+        object.__setattr__(self, "_module", None)
+
+    def load(self):
+        """
+        Imports the module if it has not been imported yet and returns it.
+        """
+
+        if (self._module is None):
+            __import__(self._name) # goes through builtins so the startup profile can time it
+            module = sys.modules[self._name]
+            if (self._on_load is not None):
+                self._on_load(module)
+            object.__setattr__(self, "_module", module)
+        return self._module
+
+    def __getattr__(self, attribute):
+        return getattr(self.load(), attribute)
+
+    def __setattr__(self, attribute, value):
+        setattr(self.load(), attribute, value)
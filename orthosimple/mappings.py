@@ -1,22 +1,16 @@
-import pyautogui
-import pyperclip
 from pynput import keyboard
-import sys
+
+import output_sinks
 
 appendUpper = lambda s: s + s.upper()
-pyautogui.PAUSE = 0.05
 
 class Mapping:
     SEQUENCES = [[keyboard.Key.shift, keyboard.KeyCode(char = "<")],
                  [keyboard.Key.shift, keyboard.KeyCode(char = ">")]] # avoids false negative
     
-    if (sys.platform == "linux"):
-        MANUAL_CHARS = "<>AEIOU?!"
-    else:
-        MANUAL_CHARS = ""
-    
-    def __init__(self, mapCondition, plainText, newText, seq = SEQUENCES):
+    def __init__(self, mapCondition, plainText, newText, seq = SEQUENCES, sink = None):
         self.mapCondition = mapCondition
+        self.sink = output_sinks.default_sink() if (sink is None) else sink
         self.map = dict([])
         
         for (charOrig, charNew) in zip(plainText, newText):
@@ -37,8 +31,7 @@ class Mapping:
     def writeNewChar(self, key_typed):
         if ((self.prev_transformed is not None) and (str(key_typed) == "Key.backspace") and 
             (str(self.prevKey) == "'v'")):
-            pyperclip.copy(self.prev_transformed)
-            pyautogui.hotkey("ctrl", "v") # pasting avoids recursive calls
+            self.sink.insert(self.prev_transformed) # inserting avoids recursive calls
             self.prev_transformed = None
         
         if (str(key_typed) == 'Key.caps_lock'): # temporary implementation
@@ -64,22 +57,7 @@ class Mapping:
             self.indicesSeq = newIndices
          
         if ((self.mapCondition(letter_typed, self.prevKey)) and (key_typed in self.map)):
-            pyautogui.press('backspace')
-            pyautogui.press('backspace')
-            
-            if (letter_typed in Mapping.MANUAL_CHARS):
-                pyautogui.PAUSE = 0
-                hexNum = hex(ord(self.map[key_typed]))
-                
-                pyautogui.hotkey('ctrl', 'shift', 'u')
-                for digit in hexNum:
-                    pyautogui.typewrite(digit)
-                pyautogui.typewrite('\n')
-                pyautogui.PAUSE = 0.05
-            else: 
-                pyperclip.copy(self.map[key_typed]) 
-                pyautogui.hotkey("ctrl", "v")
-            
+            self.sink.replace(letter_typed, self.map[key_typed])
             self.prev_transformed = self.prevKey + letter_typed
             
         self.__updatePrevKey(letter_typed)
@@ -106,14 +84,4 @@ class Mapping:
             if (charTyped == self.sequences[seqNum][curIndex]):
                 return # does not update prevKey
         
-        self.prevKey = charTyped 
-
-class KeyUpdater:
-    def __init__(self, languageInput):
-        self.languageInput = languageInput
-        
-        onPress = lambda key: self.languageInput.update(key)
-        onRelease = None
-        keyboard.Listener(on_press = onPress, on_release = onRelease).start()
-    
-        
+        self.prevKey = charTyped
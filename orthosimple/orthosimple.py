@@ -1,18 +1,22 @@
 import tkinter as tk
 
-import sys
-import threading
-import time
 import socket
 
-from pynput import keyboard
-import subprocess
-from tempfile import TemporaryFile
-
+import async_recognizer
+import gesture_dataset
+import gesture_recognizer
+import latency_trace
+import lazy_import
 import reader
-import language_inputs
+import recognition_cache
+import startup_profile
 from drawing_transformer import DrawingTransformer
 
+keyboard = lazy_import.LazyModule("pynput.keyboard")
+key_event_hub = lazy_import.LazyModule("key_event_hub")
+language_inputs = lazy_import.LazyModule("language_inputs")
+output_sinks = lazy_import.LazyModule("output_sinks")
+
 class OrthoSimple(tk.Tk):
     '''
     This class initializes the gui, defaulting to the drawing pad. It also enables keyboard
@@ -27,23 +31,49 @@ class OrthoSimple(tk.Tk):
     Y_BUTTON_PADDING = 10
     
     DEFAULT_LANGUAGE = "FR"
+    EXTRA_LANGUAGES = () # abbreviations of languages active along with the selected one, which wins conflicts
+    LATENCY_FILE = latency_trace.DEFAULT_FILE # whatever the folder OrthoSimple is started from
+    RECOGNIZER_BACKEND = "racket" # or "numpy", which does not need the racket server
+    RECOGNITION_TIMEOUT = 2 # seconds
+    GESTURE_RECORD_FILE = None # a gesture_dataset file to record the drawn gestures in
+    # a stroke_simplification.StrokeSimplifier to simplify the strokes before they are recognized,
+    # in place of streaming them, or None
+    STROKE_SIMPLIFIER = None
+    # number of recognitions kept by a recognition_cache.CachedRecognizer, 0 for no cache; a hit
+    # can answer other symbols than the recognizer would (see benchmarks/bench_recognition_cache)
+    RECOGNITION_CACHE_SIZE = 0
+    
+    # generated on the OrthoSimple window by the keyboard listener thread to show or hide it
+    TOGGLE_VISIBILITY = "<<ToggleVisibility>>"
     
     def __init__(self):
         tk.Tk.__init__(self)
         
         self.gui_socket = socket.socket()
         #self.gui_socket.connect((DrawingTransformer.LOCAL_IP, 43938))
+        self.recognizer = gesture_recognizer.create(self.RECOGNIZER_BACKEND, self.gui_socket,
+                                                    self.RECOGNITION_TIMEOUT)
+        if (self.RECOGNITION_CACHE_SIZE > 0):
+            self.recognizer = recognition_cache.CachedRecognizer(self.recognizer, self.RECOGNITION_CACHE_SIZE)
+        self.async_recognizer = async_recognizer.AsyncRecognizer(self, timeout = self.RECOGNITION_TIMEOUT)
+        self.gesture_recorder = None
+        if (self.GESTURE_RECORD_FILE is not None):
+            self.gesture_recorder = gesture_dataset.GestureRecorder(self.GESTURE_RECORD_FILE)
         self.protocol("WM_DELETE_WINDOW", quit)
+        self.bind(self.TOGGLE_VISIBILITY, self.toggle_window)
+        latency_trace.start_dumping(self.LATENCY_FILE)
 
-        self.dbReader = reader.AssociationReader()
-        self.key_listener = language_inputs.KeyboardListener(
-            language_inputs.LanguageInput(self.DEFAULT_LANGUAGE, self.dbReader))
+        with startup_profile.phase("AssociationReader.__init__"):
+            self.dbReader = reader.AssociationReader()
         self.language_reader = reader.LanguageReader()
+        self.bindings_summary = reader.BindingsSummary()
+        self.key_hub = None
+        self.key_listener = None
+        self.languages = None
+        self.selectable_inputs = None
+        self.output_sink = None
         
-        if (sys.platform == "linux"):
-            window_map_listener = keyboard.Listener(on_press = self.toggle_visibility, on_release = None)
-            window_map_listener.start()
-        
+        startup_profile.begin("first frame")
         self.resizable(False, False)
         self.configure(background = "white")
         self.container = tk.Frame(self)
@@ -51,49 +81,84 @@ class OrthoSimple(tk.Tk):
         self.container.grid_rowconfigure(0, weight = 1)
         self.container.grid_columnconfigure(0, weight = 1)
         
-        self.frame = MainFrame(self.container, self, self.dbReader)
-        self.frame.pack(fill = "both")
+        # the frames are built the first time they are shown, then kept and shown again
+        self.main_frame = MainFrame(self.container, self, self.dbReader)
+        self.options_frame = None
+        self.frame = self.main_frame
+        self.frame.show()
         
         self.grid_columnconfigure(0, weight = 1)
+        startup_profile.end("first frame")
         
+        startup_profile.begin("first mainloop tick")
+        self.after(0, self.first_tick)
         self.mainloop()
     
+    def first_tick(self):
+        """
+        Runs once the first frame is displayed. The keyboard listeners, and the modules they need,
+        are only loaded from here so that they do not delay the first frame.
+        """
+        startup_profile.end("first mainloop tick")
+        self.after_idle(self.start_listeners)
+    
+    def start_listeners(self):
+        with startup_profile.phase("listener start"):
+            self.output_sink = output_sinks.QueuedSink(output_sinks.default_sink())
+            self.key_hub = key_event_hub.KeyEventHub(self.output_sink.injected_keys)
+            self.languages = language_inputs.PreloadedLanguages(self.dbReader, self.output_sink)
+            # the input used when each language is selected, so that selecting one allocates nothing
+            self.selectable_inputs = dict({})
+            for language_abbrev in self.languages.inputs:
+                self.selectable_inputs[language_abbrev] = self.languages.get(self.active_languages(language_abbrev))
+            self.key_listener = language_inputs.KeyboardListener(
+                self.selectable_inputs[self.DEFAULT_LANGUAGE], self.key_hub)
+            self.key_hub.subscribe(self.toggle_visibility)
+            self.key_hub.start()
+        startup_profile.report()
+    
     def toggle_visibility(self, key_typed):
         """
-        This function toggles the visibility of the main program using xdotool
+        Shows or hides the window when Esc is pressed. Called on the key hub's listener thread, so
+        the window is only changed from the Tk thread, by toggle_window.
         """
         if (key_typed == keyboard.Key.esc):
-            with TemporaryFile() as wid_file:
-                wid_process = subprocess.Popen(["xdotool", "search", "--name", "tk"], stdout = wid_file);
-                wid_process.wait()
-                wid_file.flush()
-                wid_file.seek(0)
-                active_window_process = subprocess.Popen(["xdotool", "search", "--onlyvisible", "--name", "tk"],
-                                                         stdout = subprocess.PIPE)
-                if (active_window_process.stdout.read() != b""):
-                    subprocess.call(["xdotool", "windowunmap", wid_file.read()])
-                else:
-                    subprocess.call(["xdotool", "windowmap", wid_file.read()])
+            try:
+                self.event_generate(self.TOGGLE_VISIBILITY, when = "tail")
+            except (RuntimeError, tk.TclError): # the window is being destroyed
+                pass
+    
+    def toggle_window(self, event):
+        if (self.state() == "withdrawn"):
+            self.deiconify()
+        else:
+            self.withdraw()
     
     def quit(self):
         self.gui_socket.close()
         self.destroy()
         
     def change_frame(self):
-        self.frame.pack_forget()
-        if (type(self.frame) is MainFrame):
-            self.frame = OptionsFrame(self.container, self)
+        self.frame.hide()
+        if (self.frame is self.main_frame):
+            if (self.options_frame is None):
+                self.options_frame = OptionsFrame(self.container, self)
+            self.frame = self.options_frame
         else:
-            self.frame = MainFrame(self.container, self, self.dbReader)
-            empty_menu = tk.Menu(self)
-            self.configure(menu = empty_menu)
-        self.frame.pack(fill = "both") 
+            self.frame = self.main_frame
+        self.frame.show()
     
     def update_language(self, new_language):
         new_abbrev = self.language_reader.abbrev(new_language)
-        self.key_listener.update_language(language_inputs.LanguageInput(new_abbrev, self.dbReader))
+        self.key_listener.update_language(self.selectable_inputs[new_abbrev])
+    
+    def active_languages(self, selected_abbrev):
+        return (selected_abbrev,) + tuple(language_abbrev for language_abbrev in self.EXTRA_LANGUAGES
+                                          if (language_abbrev != selected_abbrev))
     
     def name_curr_language(self):
+        if (self.key_listener is None):
+            return self.language_reader.full_name(self.DEFAULT_LANGUAGE)
         return self.language_reader.full_name(self.key_listener.get_language())
         
 class MainFrame(tk.Frame):
@@ -109,10 +174,11 @@ class MainFrame(tk.Frame):
         tk.Frame.__init__(self, parent)
         
         self.controller = controller
-        controller.geometry("%dx%d+0+0" % (OrthoSimple.DIM, OrthoSimple.DIM))
         
         self.configure(background = "white")
-        self.draw_frame = DrawingTransformer(self, controller.gui_socket, sqlReader)
+        self.draw_frame = DrawingTransformer(self, controller.gui_socket, sqlReader, controller.recognizer,
+                                             controller.async_recognizer, controller.gesture_recorder,
+                                             controller.STROKE_SIMPLIFIER)
         self.draw_frame.grid(pady = OrthoSimple.ROW0_Y_PADDING, sticky = "nsew"),
         
         settings_button = tk.Button(self, command = lambda : controller.change_frame(), 
@@ -121,9 +187,7 @@ class MainFrame(tk.Frame):
                              padx = OrthoSimple.X_BUTTON_PADDING)
         
         self.message = tk.StringVar()
-        message_updater = threading.Thread(target = self.update_message)
-        message_updater.daemon = True
-        message_updater.start() 
+        self.draw_frame.bind(DrawingTransformer.RECOGNITION_COMPLETE, self.update_message)
 
         message_label = tk.Label(self, textvariable = self.message)
         message_label.configure(background = "white", font = ("TkDefaultFont", 9))
@@ -134,12 +198,24 @@ class MainFrame(tk.Frame):
         self.grid_rowconfigure(0, weight = 1, minsize = OrthoSimple.HEIGHT_ROW0) 
         self.grid_rowconfigure(1, weight = 0, minsize = OrthoSimple.DIM - OrthoSimple.HEIGHT_ROW0)
          
-    def update_message(self):
-        while (True):
-            transformed_char = self.draw_frame.get_result()
-            if (not (transformed_char == "")):
-                self.message.set(self.draw_frame.get_result() + " copied!")
-            time.sleep(0.05)
+    def show(self):
+        self.controller.geometry("%dx%d+0+0" % (OrthoSimple.DIM, OrthoSimple.DIM))
+        self.controller.configure(menu = "")
+        self.pack(fill = "both")
+    
+    def hide(self):
+        """
+        Hides the frame, leaving it as it is when first shown: the drawing and the message are
+        cleared.
+        """
+        self.pack_forget()
+        self.draw_frame.reset(None)
+        self.message.set("")
+    
+    def update_message(self, event):
+        transformed_char = self.draw_frame.get_result()
+        if (not (transformed_char == "")):
+            self.message.set(transformed_char + " copied!")
          
          
 class OptionsFrame(tk.Frame):
@@ -155,7 +231,6 @@ class OptionsFrame(tk.Frame):
         
         self.configure(background = "white")
         self.controller = controller
-        controller.geometry("%dx%d+0+0" % (OrthoSimple.DIM, OrthoSimple.DIM - self.HEIGHT_MENU))
         
         self.info_container = tk.Frame(self)
         self.info_container.grid(row = 0, column = 0, pady = OrthoSimple.ROW0_Y_PADDING[0] - self.HEIGHT_MENU, 
@@ -163,14 +238,15 @@ class OptionsFrame(tk.Frame):
         self.info_container.columnconfigure(0, weight = 2)
         self.info_container.configure(background = "white")
         
-        self.curr_frame = self.Settings(self.info_container, controller)
+        self.settings = self.Settings(self.info_container, controller)
+        self.information = None # built the first time the key bindings are shown
+        self.curr_frame = self.settings
         self.curr_frame.grid()
         
-        menu = tk.Menu(self.info_container)
+        self.menu = tk.Menu(self.info_container)
         menu_font = ("TkDefaultFont", 9)
-        menu.add_command(label = "Settings", command = self.to_settings, font = menu_font)
-        menu.add_command(label = "Keybindings", command = self.to_information, font = menu_font)
-        controller.configure(menu = menu)
+        self.menu.add_command(label = "Settings", command = self.to_settings, font = menu_font)
+        self.menu.add_command(label = "Keybindings", command = self.to_information, font = menu_font)
         
         settings_button = tk.Button(self, command = lambda : controller.change_frame(), 
                                     text = "→", bg = "#EAEAEA")
@@ -182,25 +258,36 @@ class OptionsFrame(tk.Frame):
         self.grid_rowconfigure(1, weight = 0, minsize = OrthoSimple.DIM - OrthoSimple.HEIGHT_ROW0)
         self.grid_columnconfigure(0, weight = 1)
     
+    def show(self):
+        self.controller.geometry("%dx%d+0+0" % (OrthoSimple.DIM, OrthoSimple.DIM - self.HEIGHT_MENU))
+        self.controller.configure(menu = self.menu)
+        self.to_settings()
+        self.pack(fill = "both")
+    
+    def hide(self):
+        self.pack_forget()
+    
     def to_settings(self):
-        if (type(self.curr_frame) is OptionsFrame.InformationKeys):
-            self.curr_frame.destroy()
-            self.curr_frame = OptionsFrame.Settings(self.info_container, self.controller)
+        if (self.curr_frame is not self.settings):
+            self.curr_frame.grid_remove()
+            self.curr_frame = self.settings
             self.curr_frame.grid()
         
     def to_information(self):
-        if (type(self.curr_frame) is OptionsFrame.Settings):
-            self.curr_frame.destroy()
-            self.curr_frame = OptionsFrame.InformationKeys(self.info_container, self.controller)
+        if (self.information is None):
+            self.information = OptionsFrame.InformationKeys(self.info_container, self.controller)
+        else:
+            self.information.refresh(self.controller)
+        if (self.curr_frame is not self.information):
+            self.curr_frame.grid_remove()
+            self.curr_frame = self.information
             self.curr_frame.grid()
 
     def change_frame(self):
-        self.curr_frame.destroy()
-        if (type(self.curr_frame) is OptionsFrame.Settings):
-            self.curr_frame = OptionsFrame.InformationKeys(self.info_container, self.controller)
+        if (self.curr_frame is self.settings):
+            self.to_information()
         else:
-            self.curr_frame = OptionsFrame.Settings(self.info_container, self.controller)
-        self.curr_frame.grid()
+            self.to_settings()
         
     class Settings(tk.Frame):
         '''
@@ -218,6 +305,7 @@ class OptionsFrame(tk.Frame):
             languages = controller.language_reader.all_languages()
             s_var = tk.StringVar()
             s_var.set(controller.name_curr_language())   
+            # the frame is kept until the window is destroyed, and the trace with it
             s_var.trace("w", lambda *args : controller.update_language(s_var.get()))
             language_menu = tk.OptionMenu(self, s_var, *languages)
             language_menu["highlightthickness"] = 0
@@ -239,25 +327,27 @@ class OptionsFrame(tk.Frame):
         def __init__(self, parent, controller):
             tk.Frame.__init__(self, parent)
             
-            self.__init_bindings() 
             self.configure(background = "white")        
-            self.__init_info(controller)
+            self.rendered = None
+            self.current_info = None
+            self.remaining_info = None
+            self.refresh(controller)
             self.__init_labels()
             
-        def __init_bindings(self):
+        def refresh(self, controller):
             """
-            Reads the bindings stored in text_assoiation.txt and stores them as a dictionary
-            from languages to each line in the file.
+            Displays the key bindings again if they, or the current language, changed since they
+            were last displayed.
             """
             
-            self.bindings = dict({})
-            info_file = open("text_association.txt", "r")
-            association_info = info_file.read().split("\n\n")
-            for line in association_info:
-                lang_association = line.split("\n")
-                self.bindings[lang_association[0]] = [pattern for pattern in lang_association[2:]] 
-            
-            info_file.close()
+            (self.bindings, version) = controller.bindings_summary.current()
+            rendered = (version, controller.name_curr_language())
+            if (rendered != self.rendered):
+                if (self.current_info is not None):
+                    self.current_info.destroy()
+                    self.remaining_info.destroy()
+                self.__init_info(controller)
+                self.rendered = rendered
         
         def __init_info(self, controller):
             """
@@ -266,15 +356,15 @@ class OptionsFrame(tk.Frame):
             """
             languages = controller.language_reader.all_languages()
             curr_language = controller.name_curr_language()
-            self.LanguageInfo(self, self, curr_language).grid(row = 0, column = 0, 
-                                                              pady = OptionsFrame.EXTRA_Y_PADDING, sticky = "w")
-            self.__init_remaining(languages, curr_language)            
+            self.current_info = self.LanguageInfo(self, self, curr_language)
+            self.current_info.grid(row = 0, column = 0, pady = OptionsFrame.EXTRA_Y_PADDING, sticky = "w")
+            self.remaining_info = self.__init_remaining(languages, curr_language)            
             self.rowconfigure(0, minsize = OrthoSimple.HEIGHT_ROW0 / 2 - OptionsFrame.HEIGHT_MENU)
        
         def __init_remaining(self, languages, language_excluding):
             """
             Displays a scrollable region containing the key bindings for the languages not currently
-            in use.
+            in use, and produces it.
             """
             info_frame = tk.Frame(self)
             canvas = tk.Canvas(info_frame, height = OptionsFrame.InformationKeys.SCROLLABLE_HEIGHT,
@@ -286,8 +376,8 @@ class OptionsFrame(tk.Frame):
             self.__init_frame(canvas, frame)
             
             for i in range(len(languages)):
-                if (languages.iloc[i] != language_excluding):
-                    self.LanguageInfo(frame, self, languages.iloc[i]).pack(fill = "both")
+                if (languages[i] != language_excluding):
+                    self.LanguageInfo(frame, self, languages[i]).pack(fill = "both")
             
             canvas.pack(side = "left", fill = "both")
             scroll_y.pack(side = "right", fill = "y")
@@ -295,6 +385,7 @@ class OptionsFrame(tk.Frame):
             canvas.update()
             canvas.configure(width = frame.winfo_width())
             info_frame.grid(row = 2, column = 0)
+            return info_frame
             
              
         def __init_labels(self):
@@ -0,0 +1,243 @@
+import collections
+import queue
+import sys
+import threading
+import time
+
+import latency_trace
+import lazy_import
+
+pyautogui = lazy_import.LazyModule("pyautogui", on_load = lambda module: setattr(module, "PAUSE", 0.05))
+pyperclip = lazy_import.LazyModule("pyperclip")
+keyboard = lazy_import.LazyModule("pynput.keyboard")
+
+def key_name(key):
+    """
+    Produces the character of key, or the name of the special key it is, such as "Key.space".
+    """
+
+    char = getattr(key, "char", None)
+    return str(key) if (char is None) else char
+
+class InjectedKeys:
+    '''
+    The keys a sink has sent that the keyboard listener has not seen yet. The listener sees the
+    key events a sink sends like the keys typed, and on Xorg pynput does not mark them as sent
+    (the events sent through XTest are not flagged), so each key seen there is matched against the
+    next key sent, by name: it is ignored only if it has the name of that key. A key sent that is
+    still not seen TIMEOUT seconds later is forgotten, so that, at worst, a key typed with the name
+    of a key sent within the last TIMEOUT seconds is taken for it.
+    '''
+
+    TIMEOUT = 0.1
+
+    def __init__(self):
+        self.expected = collections.deque()
+        self.lock = threading.Lock()
+
+    def expect(self, names):
+        """
+        Records that the keys named names are about to be sent, in this order.
+        """
+
+        now = time.monotonic()
+        with self.lock:
+            self.__forget_before(now)
+            self.expected.extend((name, now + InjectedKeys.TIMEOUT) for name in names)
+
+    def is_injected(self, key):
+        """
+        Produces True if key has the name of the next key sent, which is then taken as seen.
+        """
+
+        if (not self.expected):
+            return False
+        name = key_name(key)
+        with self.lock:
+            self.__forget_before(time.monotonic())
+            if (self.expected and (self.expected[0][0] == name)):
+                self.expected.popleft()
+                return True
+        return False
+
+    def __forget_before(self, now):
+        while (self.expected and (self.expected[0][1] < now)):
+            self.expected.popleft()
+
+class OutputSink:
+    '''
+    Writes the characters produced by the keyboard mappings in the focused window. replace erases
+    the two characters that triggered a mapping (the binding and the letter) and writes the new
+    character in their place; insert writes text at the cursor.
+
+    A sink that sends key events keeps them in injected_keys, an InjectedKeys, for the keyboard
+    listener to ignore.
+    '''
+
+    injected_keys = None
+
+    def replace(self, letter_typed, new_char):
+        raise NotImplementedError
+
+    def insert(self, text):
+        raise NotImplementedError
+
+class PyAutoGuiSink(OutputSink):
+    '''
+    The original backend: every key is a separate pyautogui call followed by pyautogui.PAUSE, and
+    characters are written through the clipboard, or by entering their code point for the
+    characters in MANUAL_CHARS.
+    '''
+
+    if (sys.platform == "linux"):
+        MANUAL_CHARS = "<>AEIOU?!"
+    else:
+        MANUAL_CHARS = ""
+
+    def replace(self, letter_typed, new_char):
+        manual = letter_typed in PyAutoGuiSink.MANUAL_CHARS
+        if (not manual):
+            self.__copy(new_char)
+        start = latency_trace.now()
+        pyautogui.press('backspace')
+        pyautogui.press('backspace')
+
+        if (manual):
+            pyautogui.PAUSE = 0
+            hexNum = hex(ord(new_char))
+
+            pyautogui.hotkey('ctrl', 'shift', 'u')
+            for digit in hexNum:
+                pyautogui.typewrite(digit)
+            pyautogui.typewrite('\n')
+            pyautogui.PAUSE = 0.05
+        else:
+            self.__paste()
+        latency_trace.record("output.keys", start)
+
+    def insert(self, text):
+        self.__copy(text)
+        with latency_trace.span("output.keys"):
+            self.__paste()
+
+    def __copy(self, text):
+        with latency_trace.span("output.clipboard"):
+            pyperclip.copy(text)
+
+    def __paste(self):
+        """
+        Pastes the clipboard, untimed: the callers record the keys sent as one output.keys span.
+        """
+
+        pyautogui.hotkey("ctrl", "v")
+
+class BatchedSink(OutputSink):
+    '''
+    Sends the backspaces and the new character as one sequence of synthetic key events through
+    pynput, with no pause between them. Characters are typed directly instead of pasted, so the
+    clipboard is left untouched.
+    '''
+
+    def __init__(self):
+        self.controller = None
+        self.injected_keys = InjectedKeys()
+
+    def replace(self, letter_typed, new_char):
+        self.__send(2, new_char)
+
+    def insert(self, text):
+        self.__send(0, text)
+
+    def __send(self, num_erased, text):
+        if (self.controller is None):
+            self.controller = keyboard.Controller()
+        self.injected_keys.expect([str(keyboard.Key.backspace)] * num_erased + list(text))
+        start = latency_trace.now()
+        for _ in range(num_erased):
+            self.controller.press(keyboard.Key.backspace)
+            self.controller.release(keyboard.Key.backspace)
+        self.controller.type(text)
+        latency_trace.record("output.keys", start)
+
+class RecordingSink(OutputSink):
+    '''
+    Keeps every call in the writes list instead of sending key events, as
+    ("replace", letter_typed, new_char) or ("insert", text) tuples.
+    '''
+
+    def __init__(self):
+        self.writes = []
+
+    def replace(self, letter_typed, new_char):
+        self.writes.append(("replace", letter_typed, new_char))
+
+    def insert(self, text):
+        self.writes.append(("insert", text))
+
+class QueuedSink(OutputSink):
+    '''
+    Hands the writes to sink to a worker thread, one at a time and in the order they were
+    requested, so the keyboard listener does not wait while keys are sent. A replacement is one
+    write, so its backspaces and new character are sent together. At most max_pending writes wait
+    for the worker: past that, replace and insert block until the worker catches up, which holds
+    back the keys still to be delivered instead of dropping any.
+    '''
+
+    def __init__(self, sink, max_pending = 64):
+        self.sink = sink
+        self.injected_keys = sink.injected_keys
+        self.writes = queue.Queue(max_pending)
+        self.worker = None
+        self.lock = threading.Lock()
+
+    def replace(self, letter_typed, new_char):
+        self.__enqueue(self.sink.replace, letter_typed, new_char)
+
+    def insert(self, text):
+        self.__enqueue(self.sink.insert, text)
+
+    def join(self):
+        """
+        Waits until every write requested so far has been sent.
+        """
+
+        self.writes.join()
+
+    def __enqueue(self, write, *arguments):
+        with self.lock:
+            if (self.worker is None):
+                self.worker = threading.Thread(target = self.__work, name = "output", daemon = True)
+                self.worker.start()
+        start = latency_trace.now()
+        self.writes.put((write, arguments))
+        latency_trace.record("output.enqueue", start)
+
+    def __work(self):
+        while (True):
+            (write, arguments) = self.writes.get()
+            try:
+                write(*arguments)
+            except Exception as error:
+                print("output failed:", repr(error), file = sys.stderr)
+            finally:
+                self.writes.task_done()
+
+BACKENDS = {"pyautogui": PyAutoGuiSink, "batched": BatchedSink, "recording": RecordingSink}
+DEFAULT_BACKEND = "batched"
+
+_default_sink = None
+
+def create(backend):
+    if (backend not in BACKENDS):
+        raise ValueError(backend + " is not an output backend")
+    return BACKENDS[backend]()
+
+def default_sink():
+    """
+    Produces the sink shared by the mappings that were not given one.
+    """
+
+    global _default_sink
+    if (_default_sink is None):
+        _default_sink = create(DEFAULT_BACKEND)
+    return _default_sink
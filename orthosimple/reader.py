@@ -1,9 +1,68 @@
-import sqlalchemy as db
-import pandas as pd
-import numpy as np
+import os
+import sys
 from pathlib import Path
+from types import MappingProxyType
 
-data_folder = Path.cwd().parent / "src_data"
+import association_bundle
+import composition
+import lazy_import
+import startup_profile
+
+pd = lazy_import.LazyModule("pandas")
+
+data_folder = Path(__file__).resolve().parent.parent / "src_data"
+SOURCE_FILES = ("languages.csv", "associations.csv", "keybindings.csv")
+BUNDLE_FILE = data_folder / "associations.bundle"
+SUMMARY_FILE = Path(__file__).resolve().parent / "text_association.txt"
+
+_compiled_tables = None
+
+def compiled_tables(bundle_file = BUNDLE_FILE):
+    """
+    Produces the tables of src_data compiled by compile_tables, read from bundle_file when it was
+    compiled from the current CSV files, and otherwise compiled again and written to it for the
+    next start. They are only looked up once per process.
+    """
+    
+    global _compiled_tables
+    if (_compiled_tables is None):
+        digest = association_bundle.source_hash([data_folder / name for name in SOURCE_FILES])
+        tables = association_bundle.load(bundle_file, digest)
+        if (tables is None):
+            with startup_profile.phase("compile_tables"):
+                tables = compile_tables()
+            try:
+                association_bundle.write(bundle_file, digest, tables)
+            except OSError as error:
+                print("could not write the association bundle:", repr(error), file = sys.stderr)
+        _compiled_tables = tables
+    return _compiled_tables
+
+def compile_tables():
+    """
+    Parses the CSV files of src_data and produces, as plain values association_bundle can store,
+    everything LanguageReader and AssociationReader need of them: the languages, the groups of
+    each language, the tables of AssociationIndex and the summary of the key bindings.
+    """
+    
+    df_languages = pd.read_csv(data_folder / "languages.csv")
+    language_reader = LanguageReader(zip(df_languages.iloc[:, 0], df_languages.iloc[:, 1]))
+    association_reader = AssociationReader(pd.read_csv(data_folder / "associations.csv"),
+                                           pd.read_csv(data_folder / "keybindings.csv"), None,
+                                           language_reader)
+    return dict({"languages": language_reader.languages,
+                 "language_groups": association_reader.language_groups,
+                 "index": association_reader.index.tables(),
+                 "summary": association_reader.summary_text()})
+
+def build_bundle(bundle_file = BUNDLE_FILE):
+    """
+    Compiles the CSV files of src_data to bundle_file, and produces its path.
+    """
+    
+    digest = association_bundle.source_hash([data_folder / name for name in SOURCE_FILES])
+    association_bundle.write(bundle_file, digest, compile_tables())
+    return bundle_file
 
 class LanguageReader:
     """
@@ -11,31 +70,145 @@ class LanguageReader:
     the languages.csv file.
     """
     
-    def __init__(self):
-        self.language_names = pd.read_csv(data_folder / "languages.csv")
-        self.language_map = dict({})
-        for i in self.language_names.index:
-            self.language_map[self.language_names.iloc[i, 0]] = self.language_names.iloc[i, 1]
-            
-        self.to_abbrev = dict({})
-        for i in self.language_names.index:
-            self.to_abbrev[self.language_names.iloc[i, 1]] = self.language_names.iloc[i, 0]
+    def __init__(self, languages = None):
+        """
+        languages are (abbreviation, name) pairs, those of languages.csv unless they are given.
+        """
+        
+        if (languages is None):
+            languages = compiled_tables()["languages"]
+        self.languages = tuple((str(abbrev), str(name)) for (abbrev, name) in languages)
+        self.language_map = dict(self.languages)
+        self.to_abbrev = dict((name, abbrev) for (abbrev, name) in self.languages)
     
     def full_name(self, abbreviation):
         if (abbreviation not in self.language_map):    
-            raise ValueError(new_language + " is not supported")
+            raise ValueError(abbreviation + " is not supported")
         return self.language_map[abbreviation]
     
     def abbrev(self, name_language):
         if (name_language not in self.to_abbrev):
-            raise ValueError(new_language + " is not supported")
+            raise ValueError(name_language + " is not supported")
         
         return self.to_abbrev[name_language]
     
     def all_languages(self):
-        return self.language_names["language_name"]
+        return tuple(name for (abbrev, name) in self.languages)
 
         
+class AssociationIndex:
+    """
+    Immutable lookup tables built once from the associations and keybindings tables, so that
+    retrieving a new character, the character associations of a group or the binding of a group
+    is a single dictionary access instead of a scan over the DataFrames. The tables are exposed
+    as read-only views (types.MappingProxyType) of dictionaries nothing else refers to.
+    """
+    
+    __slots__ = ("new_chars", "char_associations", "bindings")
+    
+    def __init__(self, df_associations, keys_from_groups):
+        new_chars = dict({})
+        rows_by_group = dict({})
+        for (plain, new, language, group) in zip(df_associations["input_char"], df_associations["new_char"],
+                                                 df_associations["language_abbrev"],
+                                                 df_associations["special_group"]):
+            new_chars.setdefault((group, plain), new)
+            rows_by_group.setdefault((group, language), []).append((plain, new))
+        
+        char_associations = dict({})
+        for (key, rows) in rows_by_group.items():
+            char_associations[key] = self.__with_uppercase(rows)
+        
+        bindings = dict({})
+        for (group, binding) in zip(keys_from_groups["special_group"], keys_from_groups["first_char"]):
+            bindings.setdefault(group, binding)
+        
+        object.__setattr__(self, "new_chars", MappingProxyType(new_chars))
+        object.__setattr__(self, "char_associations", MappingProxyType(char_associations))
+        object.__setattr__(self, "bindings", MappingProxyType(bindings))
+    
+    @classmethod
+    def from_tables(cls, tables):
+        """
+        Produces the AssociationIndex of the tables produced by tables(), without the DataFrames.
+        The tables are copied, so the index does not change with them.
+        """
+
+        index = object.__new__(cls)
+        for (name, table) in zip(cls.__slots__, tables):
+            object.__setattr__(index, name, MappingProxyType(dict(table)))
+        return index
+
+    def tables(self):
+        """
+        Produces copies of the tables as plain dictionaries, which association_bundle can store.
+        """
+
+        return tuple(dict(getattr(self, name)) for name in self.__slots__)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("AssociationIndex is immutable")
+
+    def __reduce__(self):
+        # the read-only views cannot be pickled nor copied themselves
+        return (AssociationIndex.from_tables, (self.tables(),))
+    
+    def __with_uppercase(self, rows):
+        """
+        Produces the input characters and the characters they are mapped to as two tuples, followed by
+        their uppercase variants, keeping only the first occurence of each input character.
+        """
+        
+        plain_chars = []
+        new_chars = []
+        seen = set()
+        for (plain, new) in rows + [(plain.upper(), new.upper()) for (plain, new) in rows]:
+            if (plain not in seen):
+                seen.add(plain)
+                plain_chars.append(plain)
+                new_chars.append(new)
+        return (tuple(plain_chars), tuple(new_chars))
+    
+    def new_char(self, input_char, special_group):
+        return self.new_chars[(special_group, input_char)]
+    
+    def char_association(self, special_group, language_abbrev):
+        return self.char_associations[(special_group, language_abbrev)]
+    
+    def binding(self, special_group):
+        return self.bindings[special_group]
+    
+
+class BindingsSummary:
+    """
+    The summary of the key bindings written to text_association.txt by AssociationReader, as a
+    dictionary from the language names to the lines under them. The file is only read again
+    once it has changed.
+    """
+    
+    def __init__(self, path = SUMMARY_FILE):
+        self.path = path
+        self.version = None
+        self.bindings = None
+    
+    def current(self):
+        """
+        Produces the bindings and their version, which changes whenever the file does.
+        """
+        
+        file_stat = os.stat(self.path)
+        version = (file_stat.st_mtime_ns, file_stat.st_size)
+        if (version != self.version):
+            self.bindings = dict({})
+            with open(self.path, "r") as info_file:
+                association_info = info_file.read().split("\n\n")
+            for line in association_info:
+                lang_association = line.split("\n")
+                self.bindings[lang_association[0]] = [pattern for pattern in lang_association[2:]]
+            self.version = version
+        return (self.bindings, self.version)
+
+
 class AssociationReader:
     """
     This class provides access to the associations.csv file in various ways.
@@ -43,164 +216,150 @@ class AssociationReader:
     by groups.
     """
     
-    def __init__(self):
-        self.language_reader = LanguageReader() 
+    RETAIN_ALL = frozenset({"sub_curl", "special", "other"}) # groups whose every binding is summarized
+    
+    def __init__(self, df_associations = None, keys_from_groups = None, summary_file = SUMMARY_FILE,
+                 language_reader = None):
+        """
+        Uses the tables compiled from src_data (see compiled_tables) unless the associations or
+        keybindings tables are given, the other one then being read from src_data, and writes the
+        summary of the bindings to summary_file unless it is None.
+        """
         
+        self.language_reader = LanguageReader() if (language_reader is None) else language_reader
+        
+        self.composer = composition.CompositionEngine()
         AssociationReader.plain = "input_char"
         AssociationReader.new = "new_char" 
-        self.df_associations = pd.read_csv(data_folder / "associations.csv")
-        
-        unique_groups = self.df_associations.drop_duplicates(subset = ["special_group", "language_abbrev"])
-        groups_col = unique_groups["special_group"]
-        language_col = unique_groups["language_abbrev"]
-        self.language_groups = dict({})
-        for (item, language) in zip(groups_col, language_col):
-            if (language in self.language_groups):
-                self.language_groups[language].append(item)
-            else:
-                self.language_groups[language] = [item]  
-
-        self.keys_from_groups = pd.read_csv(data_folder / "keybindings.csv")  
-        self.summary_bindings()
-        
-    def get_binding(self, special_group):
-        return self.keys_from_groups.loc[self.keys_from_groups["special_group"] == special_group, "first_char"].iloc[0]
-
-    def summary_bindings(self):
-        keys_file = open("text_association.txt", "w")
-       
-        curr_index = 0; 
-        while (curr_index != len(self.df_associations)):
-            curr_language = self.df_associations.loc[curr_index, "language_abbrev"]
-            simple_groups = set(self.keys_from_groups["special_group"])
-            
-            chars_to_groups = dict({})
-            while ((curr_index != len(self.df_associations)) and 
-                   (self.df_associations.loc[curr_index, "language_abbrev"] == curr_language)):
-                self.__add_group(chars_to_groups, curr_index)
-                curr_index += 1
-            
-            chars_sorted = self.__chars_by_occurence(chars_to_groups)
-            RETAIN_ALL = set({"sub_curl", "special", "other"})
-            summary = self.__max_occurences(chars_sorted, chars_to_groups, curr_language, RETAIN_ALL)
-            
-            keys_file.write(self.language_reader.full_name(curr_language) + "\n")
-            self.__write_in_order(keys_file, summary, curr_language, RETAIN_ALL)
-            
-    def __add_group(self, chars_to_groups, curr_index):
-        old_char = self.df_associations.loc[curr_index, "input_char"]
-        group = self.df_associations.loc[curr_index, "special_group"]
-        if old_char not in chars_to_groups:
-            chars_to_groups[old_char] = [group]
+        self.__df_associations = df_associations
+        self.__keys_from_groups = keys_from_groups
+        if ((df_associations is None) and (keys_from_groups is None)):
+            tables = compiled_tables()
+            self.language_groups = tables["language_groups"]
+            self.index = AssociationIndex.from_tables(tables["index"])
+            self.summary = tables["summary"]
         else:
-            chars_to_groups[old_char].append(group)
-    
-    def __swap(self, chars_list, pos1, pos2):
-        temp = chars_list[pos1]
-        chars_list[pos1] = chars_list[pos2]
-        chars_list[pos2] = temp
-    
-    def __chars_by_occurence(self, chars_to_groups):
-        chars_sorted = []
-        for c in chars_to_groups:
-            chars_sorted.append((c, len(chars_to_groups[c])))
-        self.__merge_sort(chars_sorted, 0, len(chars_sorted) - 1)
-        
-        return chars_sorted
-     
-    def __merge_sort(self, chars_with_freqs, start, end):
-        if (start < end):
-            middle = (start + end) // 2
-            self.__merge_sort(chars_with_freqs, start, middle)
-            self.__merge_sort(chars_with_freqs, middle + 1, end)
+            unique_groups = self.df_associations.drop_duplicates(subset = ["special_group", "language_abbrev"])
+            groups_col = unique_groups["special_group"]
+            language_col = unique_groups["language_abbrev"]
+            self.language_groups = dict({})
+            for (item, language) in zip(groups_col, language_col):
+                if (language in self.language_groups):
+                    self.language_groups[language].append(item)
+                else:
+                    self.language_groups[language] = [item]  
             
-            self.__merge(chars_with_freqs, start, middle, end)
+            self.index = AssociationIndex(self.df_associations, self.keys_from_groups)
+            self.summary = None
+        if (summary_file is not None):
+            with startup_profile.phase("summary_bindings"):
+                self.summary_bindings(summary_file)
     
-    def __merge(self, chars_with_freqs, start, middle, end):
-        left = []
-        for i in range(start, middle + 1):
-            left.append(chars_with_freqs[i])
-            
-        right = []
-        for i in range(middle + 1, end + 1):
-            right.append(chars_with_freqs[i])
-        
-        curr_ind = start
-        ind_left = 0
-        ind_right = 0
-        len_left = middle - start + 1
-        len_right = end - middle
-        while ((ind_left < len_left) and (ind_right < len_right)):
-            if (left[ind_left][1] >= right[ind_right][1]):
-                chars_with_freqs[curr_ind] = left[ind_left]
-                ind_left += 1
-            else:
-                chars_with_freqs[curr_ind] = right[ind_right]
-                ind_right += 1
-            curr_ind += 1
-        
-        while (ind_left < len_left):
-            chars_with_freqs[curr_ind] = left[ind_left]
-            ind_left += 1
-            curr_ind += 1
-        
-        while (ind_right < len_right):
-            chars_with_freqs[curr_ind] = right[ind_right]
-            ind_right += 1
-            curr_ind += 1
-    
-    def __max_occurences(self, chars_sorted, chars_to_groups, language, exception_groups):
-        short_summary = dict({})
-        
-        dest = len(self.language_groups[language])
-        for group in self.language_groups[language]:
-            short_summary[group] = None
-            if (group in exception_groups):
-                dest -= 1
-        
-        num_occurences = 0
-        for item in chars_sorted:
-            for group in chars_to_groups[item[0]]:
-                if ((group in short_summary) and (short_summary[group] is None) and 
-                    (group not in exception_groups)):
-                    short_summary[group] = item[0]
-                    num_occurences += 1
-                    if (num_occurences == dest):
-                        return short_summary
-                    
-    def __write_in_order(self, file_out, summary, curr_language, groups_write_all):
-        file_out.write("(common)\n")
-         
-        for group in summary:
-            if (group == "other"):
-                file_out.write("(also)\n")
-            if (group in groups_write_all):
-                df_by_group = self.select_char_association(group, curr_language) 
-                # relies on uniqueness within column, avoids edge cases with special characters like ı 
-                df_by_group[AssociationReader.plain] = df_by_group[AssociationReader.plain].apply(lambda char: char.lower())
-                df_by_group = df_by_group.drop_duplicates(subset = [AssociationReader.plain])
-                
-                for i in range(len(df_by_group)):
-                    file_out.write("%s  +%3s  ⇒%3s\n" % (self.get_binding(group),
-                        df_by_group.iloc[i, 0], df_by_group.iloc[i, 1]))
+    @property
+    def df_associations(self):
+        """
+        The associations table, only read from src_data when the compiled tables were used and
+        it is needed.
+        """
+        
+        if (self.__df_associations is None):
+            self.__df_associations = pd.read_csv(data_folder / "associations.csv")
+        return self.__df_associations
+    
+    @property
+    def keys_from_groups(self):
+        if (self.__keys_from_groups is None):
+            self.__keys_from_groups = pd.read_csv(data_folder / "keybindings.csv")
+        return self.__keys_from_groups
+        
+    def get_binding(self, special_group):
+        return self.index.binding(special_group)
+
+    def summary_bindings(self, summary_file = SUMMARY_FILE):
+        """
+        Writes the summary of the bindings to summary_file, unless it already holds it.
+        """
+        
+        if (self.summary is None):
+            self.summary = self.summary_text()
+        try:
+            with open(summary_file, "r") as keys_file:
+                if (keys_file.read() == self.summary):
+                    return
+        except OSError:
+            pass
+        with open(summary_file, "w") as keys_file:
+            keys_file.write(self.summary)
+    
+    def summary_text(self):
+        """
+        Produces the summary of the key bindings of each run of consecutive rows of the same
+        language in df_associations: the language name, then under (common) one binding for each
+        group, with the character of the group that appears in the most groups of the run (the
+        first one on a tie), and every binding of the groups in RETAIN_ALL, "other" being under
+        (also). The circumflex group, which has no binding, is left out.
+        
+        This is a plain loop over the rows, not grouped pandas operations: the groupby, merges
+        and sorts of the grouped version cost about 10 ms even for a few rows, and the loop is
+        faster from 50 to 1M rows (see benchmarks/bench_summary_bindings).
+        """
+        
+        table = self.df_associations
+        # every row is looked at once: the groups of each character of a run, in order, and the
+        # new character of the first row of each (language, group, character)
+        runs = []
+        new_chars = dict({})
+        for (language, char, group, new) in zip(table["language_abbrev"].tolist(), table["input_char"].tolist(),
+                                                table["special_group"].tolist(), table["new_char"].tolist()):
+            if ((not runs) or (runs[-1][0] != language)):
+                chars_to_groups = dict({})
+                runs.append((language, chars_to_groups))
+            groups = chars_to_groups.get(char)
+            if (groups is None):
+                chars_to_groups[char] = [group]
             else:
-                by_language = self.df_associations.language_abbrev == curr_language
-                by_input = self.df_associations.input_char == summary[group]
-                by_group = self.df_associations.special_group == group
-                pos_match = np.logical_and.reduce((by_language, by_input, by_group)).argmax()
-                if (group != "circumflex"):
-                    file_out.write("%s  +%3s  ⇒%3s\n" % (self.get_binding(group), summary[group],
-                        self.df_associations.iloc[pos_match]["new_char"]))
-        file_out.write("\n")
+                groups.append(group)
+            new_chars.setdefault((language, group, char), new)
+        
+        lines = []
+        for (language, chars_to_groups) in runs:
+            # sorted is stable, so characters with as many rows stay in order of first occurence
+            summary_chars = dict({})
+            for char in sorted(chars_to_groups, key = lambda char: len(chars_to_groups[char]), reverse = True):
+                for group in chars_to_groups[char]:
+                    summary_chars.setdefault(group, char)
+            
+            lines.append(self.language_reader.full_name(language))
+            lines.append("(common)")
+            for group in self.language_groups[language]:
+                if (group == "other"):
+                    lines.append("(also)")
+                if (group in self.RETAIN_ALL):
+                    (plain_chars, new_chars_group) = self.select_char_association(group, language)
+                    # relies on uniqueness within column, avoids edge cases with special characters like ı 
+                    written = set()
+                    for (plain, new) in zip(plain_chars, new_chars_group):
+                        if (plain.lower() not in written):
+                            written.add(plain.lower())
+                            lines.append("%s  +%3s  ⇒%3s" % (self.get_binding(group), plain.lower(), new))
+                elif (group != "circumflex"):
+                    char = summary_chars[group]
+                    lines.append("%s  +%3s  ⇒%3s" % (self.get_binding(group), char,
+                                                     new_chars[(language, group, char)]))
+            lines.append("")
+        return "".join(line + "\n" for line in lines)
     
     def select_new_char(self, input_char, accent_type):
         """
-        Returns the new character associated with input_char and accent_type from self.df_associations.
+        Returns the new character associated with input_char and accent_type in associations.csv,
+        or else composed by self.composer, so that letters the table does not list still get
+        their accents.
         """
         
-        new_char_table = self.df_associations.loc[(self.df_associations["special_group"] == accent_type) &
-                                                  (self.df_associations["input_char"] == input_char)]
-        return new_char_table["new_char"].iloc[0]
+        try:
+            return self.index.new_char(input_char, accent_type)
+        except KeyError:
+            return self.composer.new_char(input_char, accent_type)
     
     def get_groups(self, language):
         """
@@ -212,16 +371,10 @@ class AssociationReader:
     
     def select_char_association(self, group, client_language):
         """
-        Returns a 2d-array that contains the input character and character that it is being mapped to
-        for each character in client_language with its special_group attribute equal to group.
+        Returns a pair of tuples that contain the input characters and the characters that they are being
+        mapped to for each character in client_language with its special_group attribute equal to group,
+        followed by their uppercase variants.
         """
         
-        cols = [AssociationReader.plain, AssociationReader.new]
-        association_query = self.df_associations.loc[(self.df_associations["special_group"] == group) &
-                                                     (self.df_associations["language_abbrev"] == client_language)][cols]
-        uppercase_query = association_query.apply(lambda series: 
-                                                  series.apply(lambda char: char.upper()))
-        association_query = association_query.append(uppercase_query).drop_duplicates(subset = [AssociationReader.plain])
-        return association_query
-        #return [association_query[AssociationReader.plain], association_query[AssociationReader.new]] 
+        return self.index.char_association(group, client_language) 
         
\ No newline at end of file
@@ -0,0 +1,271 @@
+'''
+A least recently used cache of recognitions in front of a recognizer of gesture_recognizer, so
+that a gesture drawn like one recognized before is answered without the round trip to the
+recognizer nor the template matching.
+
+Gestures are looked up by their signature: the letter and accent strokes, told apart by length
+as the recognizers do, each sub-sampled and normalized as they are before being matched, with
+their coordinates rounded to a multiple of quantum. A gesture drawn again elsewhere on the
+canvas has the same signature, and so has one a pixel or so off, unless a coordinate crosses a
+rounding boundary. Gestures whose stroke lengths are too close to call which stroke is the
+letter, or whether the accent is a trema, are always recognized.
+
+Nothing guarantees that two gestures with the same signature get the same symbols from the
+recognizer: a hit answers what the recognizer answered for the first gesture with the
+signature. How often that is also its answer for the gesture itself is measured by
+benchmarks/bench_recognition_cache, with either backend. The cache is emptied when the template
+library file changes, which is checked at most every check_interval seconds.
+
+Usage:
+    recognizer = CachedRecognizer(gesture_recognizer.create(backend, socket), capacity = 256)
+    recognizer.recognize(strokes)
+    recognizer.stats() # hits, misses, hit_rate...
+'''
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import gesture_recognizer
+import latency_trace
+from stroke_simplification import close_call, stroke_length
+
+CAPACITY = 256
+QUANTUM = 10 # in normalized coordinates, NORM_SIZE being the side of the normalized gesture
+CHECK_INTERVAL = 5.0 # seconds
+
+def prepared(stroke, num_sample_points):
+    """
+    Produces the points of gesture_recognizer.prepare(stroke, num_sample_points), computed in
+    plain python, since numpy takes longer than that to convert the stroke to an array.
+
+    >>> prepared([(40, 50), (60, 50), (80, 90)], 3)
+    [(0.0, 0.0), (100.0, 0.0), (200.0, 200.0)]
+    >>> prepared([(0, 0), (5, 10), (30, 12)], 3)
+    [(0.0, 0), (33.333333333333336, 10), (200.0, 12)]
+    """
+
+    num_points = len(stroke)
+    points = [stroke[(k * num_points) // (num_sample_points - 1)] for k in range(num_sample_points - 1)]
+    points.append(stroke[-1])
+
+    coordinates = []
+    for (axis, min_size) in ((0, gesture_recognizer.MIN_WIDTH), (1, gesture_recognizer.MIN_HEIGHT)):
+        values = [point[axis] for point in points]
+        low = min(values)
+        size = max(values) - low
+        if (size < min_size):
+            coordinates.append([value - low for value in values])
+        else:
+            coordinates.append([(value - low) * gesture_recognizer.NORM_SIZE / size for value in values])
+    return list(zip(*coordinates))
+
+def quantized(stroke, num_sample_points, quantum):
+    """
+    Produces the coordinates of prepared(stroke, num_sample_points) rounded to multiples of
+    quantum, as x1, y1, x2, y2...
+
+    >>> quantized([(40, 50), (60, 50), (80, 90)], 3, 10)
+    (0, 0, 10, 0, 20, 20)
+    """
+
+    return tuple(round(value / quantum) for point in prepared(stroke, num_sample_points) for value in point)
+
+def signature(strokes, num_sample_points = gesture_recognizer.NUM_SAMPLE_POINTS, quantum = QUANTUM,
+              lengths = None):
+    """
+    Produces the key of strokes in the cache: the quantized letter stroke and accent stroke, the
+    accent being None when the recognizers take it for a trema. lengths are those of the
+    strokes, when they are already known. Produces None when the lengths are a close call (see
+    stroke_simplification.close_call).
+
+    >>> signature([[(0, 0), (100, 100)], [(0, 0), (1, 1)]], 2, 50)
+    ((0, 0, 4, 4), None)
+    >>> signature([[(0, 0), (0, 30)], [(50, 60), (55, 60), (100, 160)]], 3, 50)
+    ((0, 0, 0, 0, 4, 4), (0, 0, 0, 4, 0, 4))
+    >>> signature([[(0, 0), (3, 4)], [(0, 0), (0, 5)]], 2) is None
+    True
+    """
+
+    if (lengths is None):
+        lengths = [stroke_length(stroke) for stroke in strokes[0:2]]
+    if (close_call(lengths)):
+        return None
+    (len1, len2) = lengths[0:2]
+    if (len1 >= len2):
+        (letter_stroke, accent_stroke) = (strokes[0], strokes[1])
+    else:
+        (letter_stroke, accent_stroke) = (strokes[1], strokes[0])
+
+    letter = quantized(letter_stroke, num_sample_points, quantum)
+    if ((len1 <= gesture_recognizer.MIN_LENGTH) or (len2 <= gesture_recognizer.MIN_LENGTH)):
+        return (letter, None)
+    return (letter, quantized(accent_stroke, num_sample_points, quantum))
+
+class CachedRecognizer:
+    '''
+    Answers recognize, recognize_with_scores and streams like recognizer, from the cache when
+    the signature of the strokes is in it. capacity is the number of signatures kept; the least
+    recently used one is dropped to make room. The results are those of the first gesture with
+    the signature, scores included.
+
+    >>> letters = dict(gesture_recognizer.load_templates()["letters"])
+    >>> accents = dict(gesture_recognizer.load_templates()["accents"])
+    >>> recognizer = CachedRecognizer(gesture_recognizer.NumpyRecognizer(), capacity = 2)
+    >>> recognizer.recognize([accents["acute"], letters["a"]])
+    ('a', 'acute')
+    >>> recognizer.recognize([[(x + 40, y + 3) for (x, y) in accents["acute"]], letters["a"]])
+    ('a', 'acute')
+    >>> [recognizer.stats()[name] for name in ("hits", "misses", "size")]
+    [1, 1, 1]
+    '''
+
+    def __init__(self, recognizer, capacity = CAPACITY, quantum = QUANTUM,
+                 num_sample_points = gesture_recognizer.NUM_SAMPLE_POINTS,
+                 templates_file = gesture_recognizer.TEMPLATES_FILE, check_interval = CHECK_INTERVAL):
+        self.recognizer = recognizer
+        self.capacity = capacity
+        self.quantum = quantum
+        self.num_sample_points = num_sample_points
+        self.templates_file = templates_file
+        self.check_interval = check_interval
+        self.templates_version = None
+        self.templates_hash = None
+        self.templates_checked = None
+        self.results = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.check_templates()
+
+    def recognize(self, strokes):
+        return self.recognize_with_scores(strokes)[0:2]
+
+    def recognize_with_scores(self, strokes):
+        """
+        Produces the result of strokes, from the cache or else from the recognizer, which is given
+        the lengths computed for the lookup when it takes them and they are not a close call.
+        """
+
+        lengths = [stroke_length(stroke) for stroke in strokes]
+        recognize_with_lengths = getattr(self.recognizer, "recognize_with_lengths", None)
+        if ((recognize_with_lengths is None) or close_call(lengths)):
+            return self.cached(strokes, lambda: self.recognizer.recognize_with_scores(strokes), lengths)
+        return self.cached(strokes, lambda: recognize_with_lengths(strokes, lengths), lengths)
+
+    def open_stream(self):
+        return CachedStream(self, self.recognizer.open_stream())
+
+    def cached(self, strokes, recognize, lengths = None):
+        """
+        Produces the result of strokes from the cache, or else from recognize, which is then
+        kept in the cache.
+        """
+
+        start = latency_trace.now()
+        if (time.monotonic() >= self.templates_checked + self.check_interval):
+            self.check_templates()
+        key = signature(strokes, self.num_sample_points, self.quantum, lengths)
+        if (key is None):
+            with self.lock:
+                self.misses += 1
+            return tuple(recognize())
+
+        with self.lock:
+            result = self.results.get(key)
+            if (result is not None):
+                self.results.move_to_end(key)
+                self.hits += 1
+        if (result is not None):
+            latency_trace.record("recognition_cache.hit", start)
+            return result
+
+        result = tuple(recognize())
+        with self.lock:
+            self.misses += 1
+            self.results[key] = result
+            if (len(self.results) > self.capacity):
+                self.results.popitem(last = False)
+                self.evictions += 1
+        latency_trace.record("recognition_cache.miss", start)
+        return result
+
+    def check_templates(self):
+        """
+        Empties the cache if the contents of the template library file changed since it was
+        last checked. The file is only read again once its size or modification time changed.
+        """
+
+        self.templates_checked = time.monotonic()
+        file_stat = os.stat(self.templates_file)
+        version = (file_stat.st_mtime_ns, file_stat.st_size)
+        if (version == self.templates_version):
+            return
+        with open(self.templates_file, "rb") as templates:
+            templates_hash = hashlib.sha256(templates.read()).digest()
+        with self.lock:
+            if ((self.templates_hash is not None) and (templates_hash != self.templates_hash)):
+                self.results.clear()
+                self.invalidations += 1
+            self.templates_version = version
+            self.templates_hash = templates_hash
+
+    def invalidate(self):
+        with self.lock:
+            self.results.clear()
+            self.invalidations += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return dict({"hits": self.hits, "misses": self.misses,
+                         "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                         "evictions": self.evictions, "invalidations": self.invalidations,
+                         "size": len(self.results), "capacity": self.capacity})
+
+class CachedStream:
+    '''
+    A stream of the recognizer behind a CachedRecognizer, whose points and stroke lengths are
+    also kept while they are drawn, so that finishing it looks the gesture up in the cache
+    first. On a hit, the stream of the recognizer is cancelled instead of finished.
+    '''
+
+    def __init__(self, cached_recognizer, stream):
+        self.cached_recognizer = cached_recognizer
+        self.stream = stream
+        self.strokes = []
+        self.lengths = []
+
+    def add_points(self, stroke_index, points):
+        while (len(self.strokes) <= stroke_index):
+            self.strokes.append([])
+            self.lengths.append(0.0)
+        stroke = self.strokes[stroke_index]
+        if (points):
+            self.lengths[stroke_index] += stroke_length(stroke[-1:] + list(points))
+            stroke.extend(points)
+        self.stream.add_points(stroke_index, points)
+
+    def finish(self):
+        return self.finish_with_scores()[0:2]
+
+    def finish_with_scores(self):
+        finished = []
+
+        def recognize():
+            finished.append(True)
+            return self.stream.finish_with_scores()
+
+        result = self.cached_recognizer.cached(self.strokes, recognize, self.lengths)
+        if (not finished):
+            self.stream.cancel()
+        return result
+
+    def cancel(self):
+        self.strokes = []
+        self.lengths = []
+        self.stream.cancel()
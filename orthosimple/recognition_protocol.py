@@ -0,0 +1,165 @@
+'''
+The binary protocol between the GUI and the recognizer server, described in
+recognizer/protocol.rkt: every message is a frame made of a 12 byte header (magic, version,
+type, request id, payload length) and a payload. Recognize frames carry the strokes as packed
+int16 points, result frames the recognized symbols and their scores. The strokes of a request
+can also be streamed while they are drawn, in stroke points frames, and recognized with a
+recognize stream frame once they are complete.
+
+>>> strokes = [[(0, 0), (-3, 250), (300, -40000)], [(32767, 12)]]
+>>> decode_recognize(encode_recognize(10, strokes))
+(10, [[(0, 0), (-3, 250), (300, -32768)], [(32767, 12)]])
+>>> decode_stroke_points(encode_stroke_points(1, strokes[1]))
+(1, [(32767, 12)])
+>>> decode_result(encode_result([("a", 0.5), ("trema", None)]))
+[('a', 0.5), ('trema', None)]
+'''
+
+import array
+import itertools
+import math
+import struct
+import sys
+
+MAGIC = b"OS"
+VERSION = 1
+
+RECOGNIZE = 1
+RESULT = 2
+ERROR = 3
+STROKE_POINTS = 4
+RECOGNIZE_STREAM = 5
+CANCEL_STREAM = 6
+
+HEADER = struct.Struct(">2sBBII")
+COUNTS = struct.Struct(">HH")
+STROKE_INDEX = struct.Struct(">H")
+NUM_SAMPLE_POINTS = struct.Struct(">H")
+STROKE_LENGTH = struct.Struct(">I")
+SCORE = struct.Struct(">d")
+
+MIN_COORDINATE = -32768
+MAX_COORDINATE = 32767
+
+class ProtocolError(Exception):
+    pass
+
+def encode_frame(frame_type, request_id, payload):
+    return HEADER.pack(MAGIC, VERSION, frame_type, request_id, len(payload)) + payload
+
+def encode_points(points):
+    """
+    Produces the number of points followed by their coordinates. Coordinates outside of the
+    int16 range are clamped to it.
+    """
+
+    try:
+        coordinates = array.array("h", itertools.chain.from_iterable(points))
+    except (OverflowError, TypeError):
+        coordinates = array.array("h", (min(max(int(value), MIN_COORDINATE), MAX_COORDINATE)
+                                        for point in points for value in point))
+    if (sys.byteorder == "little"):
+        coordinates.byteswap()
+    return STROKE_LENGTH.pack(len(points)) + coordinates.tobytes()
+
+def decode_points(payload, position):
+    """
+    Produces the points encoded in payload from position and the position following them.
+    """
+
+    (num_points,) = STROKE_LENGTH.unpack_from(payload, position)
+    position += STROKE_LENGTH.size
+    coordinates = struct.unpack_from(">%dh" % (2 * num_points), payload, position)
+    return (list(zip(coordinates[0::2], coordinates[1::2])), position + 4 * num_points)
+
+def encode_recognize(num_sample_points, strokes):
+    """
+    Produces the payload of a recognize frame for strokes, a list of lists of (x, y) points.
+    """
+
+    return COUNTS.pack(num_sample_points, len(strokes)) + b"".join(map(encode_points, strokes))
+
+def decode_recognize(payload):
+    """
+    Produces the number of sample points and the strokes of a recognize frame payload.
+    """
+
+    (num_sample_points, num_strokes) = COUNTS.unpack_from(payload, 0)
+    position = COUNTS.size
+    strokes = []
+    for _ in range(num_strokes):
+        (stroke, position) = decode_points(payload, position)
+        strokes.append(stroke)
+    return (num_sample_points, strokes)
+
+def encode_stroke_points(stroke_index, points):
+    return STROKE_INDEX.pack(stroke_index) + encode_points(points)
+
+def decode_stroke_points(payload):
+    (stroke_index,) = STROKE_INDEX.unpack_from(payload, 0)
+    return (stroke_index, decode_points(payload, STROKE_INDEX.size)[0])
+
+def encode_recognize_stream(num_sample_points):
+    return NUM_SAMPLE_POINTS.pack(num_sample_points)
+
+def encode_result(scored_symbols):
+    """
+    Produces the payload of a result frame for a list of (symbol, score) pairs, the score being
+    None for a symbol that was not matched.
+    """
+
+    parts = [bytes([len(scored_symbols)])]
+    for (symbol, score) in scored_symbols:
+        name = symbol.encode("utf-8")
+        parts.append(bytes([len(name)]) + name + SCORE.pack(math.nan if (score is None) else score))
+    return b"".join(parts)
+
+def decode_result(payload):
+    scored_symbols = []
+    position = 1
+    for _ in range(payload[0]):
+        name_length = payload[position]
+        name = payload[position + 1:position + 1 + name_length].decode("utf-8")
+        (score,) = SCORE.unpack_from(payload, position + 1 + name_length)
+        position += 1 + name_length + SCORE.size
+        scored_symbols.append((name, None if math.isnan(score) else score))
+    return scored_symbols
+
+class FrameReader:
+    '''
+    Reads whole frames from a socket, however the bytes are split between recv calls.
+    '''
+
+    RECV_SIZE = 65536
+
+    def __init__(self, socket):
+        self.socket = socket
+        self.buffer = bytearray()
+
+    def read_frame(self):
+        """
+        Produces the (type, request id, payload) of the next frame, or None when the connection
+        is closed.
+        """
+
+        if (not self.__fill(HEADER.size)):
+            return None
+        (magic, version, frame_type, request_id, payload_length) = HEADER.unpack_from(self.buffer)
+        if (magic != MAGIC):
+            raise ProtocolError("not a frame: %r" % bytes(self.buffer[:HEADER.size]))
+        if (version != VERSION):
+            raise ProtocolError("unsupported protocol version: %d" % version)
+        if (not self.__fill(HEADER.size + payload_length)):
+            return None
+
+        payload = bytes(self.buffer[HEADER.size:HEADER.size + payload_length])
+        del self.buffer[:HEADER.size + payload_length]
+        return (frame_type, request_id, payload)
+
+    def __fill(self, size):
+        while (len(self.buffer) < size):
+            received = self.socket.recv(self.RECV_SIZE)
+            if (not received):
+                return False
+            self.buffer += received
+        return True
@@ -0,0 +1,90 @@
+'''
+Records the wall time of the startup phases and the cost of every module imported while the
+profile is enabled (see the --profile-startup flag in __init__.py). When it is not enabled,
+phase and end are no-ops.
+'''
+
+import builtins
+import sys
+import threading
+import time
+
+_enabled = False
+_original_import = builtins.__import__
+_main_thread = threading.main_thread()
+
+_phases = [] # [name, depth, start, end]
+_open_phases = dict({})
+_imports = [] # (name, cumulative, self)
+_import_stack = []
+
+class _Phase:
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        begin(self.name)
+
+    def __exit__(self, *exc_info):
+        end(self.name)
+
+def enable():
+    global _enabled
+    _enabled = True
+    builtins.__import__ = _timed_import
+
+def is_enabled():
+    return _enabled
+
+def begin(name):
+    if (_enabled):
+        _open_phases[name] = len(_phases)
+        _phases.append([name, len(_open_phases) - 1, time.perf_counter(), None])
+
+def end(name):
+    if (_enabled and (name in _open_phases)):
+        _phases[_open_phases.pop(name)][3] = time.perf_counter()
+
+def phase(name):
+    """
+    Produces a context manager that times the code it encloses as the phase name. Phases opened
+    inside another phase are reported nested under it.
+    """
+
+    return _Phase(name)
+
+def _timed_import(name, globals = None, locals = None, fromlist = (), level = 0):
+    if ((level != 0) or (name in sys.modules) or (threading.current_thread() is not _main_thread)):
+        return _original_import(name, globals, locals, fromlist, level)
+
+    _import_stack.append(0.0)
+    start = time.perf_counter()
+    try:
+        return _original_import(name, globals, locals, fromlist, level)
+    finally:
+        cumulative = time.perf_counter() - start
+        children = _import_stack.pop()
+        if (_import_stack):
+            _import_stack[-1] += cumulative
+        _imports.append((name, cumulative, cumulative - children))
+
+def report(out = sys.stderr, max_imports = 20):
+    """
+    Writes the time taken by each phase, and the modules that took the longest to import, to out
+    and stops timing imports.
+    """
+
+    if (not _enabled):
+        return
+    builtins.__import__ = _original_import
+
+    out.write("startup phases (wall time)\n")
+    for (name, depth, start, stop) in _phases:
+        if (stop is not None):
+            out.write("  %-36s %9.1f ms\n" % ("  " * depth + name, (stop - start) * 1000))
+
+    out.write("imports (cumulative / self)\n")
+    slowest = sorted(_imports, key = lambda item: item[1], reverse = True)[:max_imports]
+    for (name, cumulative, own) in slowest:
+        out.write("  %-36s %9.1f ms %9.1f ms\n" % (name, cumulative * 1000, own * 1000))
+    out.flush()
@@ -0,0 +1,268 @@
+'''
+Simplification of the strokes drawn on the DrawingTransformer before they are sent to the
+recognizer. The points of a stroke go through three stages: consecutive duplicates are dropped,
+then the points closer than min_distance to the last point kept, and then Ramer-Douglas-Peucker
+keeps the points further than epsilon from the path through the points it kept.
+
+The recognizer sub-samples a stroke by index, so dropping points would move the points it
+matches: the points it samples from the whole stroke (its anchors) are always kept, and the
+simplified stroke is given the number of points that puts each anchor at an index the recognizer
+samples. The places between two anchors are filled with the points Ramer-Douglas-Peucker keeps
+between them, then with the other points the first two stages keep, spread along the segment,
+then with the points they dropped if needed. The simplified strokes are sent only if the
+recognizer samples them exactly like the whole strokes (the parity check), and if it takes the
+same decisions from their lengths: which one is the letter, and which ones are no longer than
+MIN_LENGTH, for a trema. Otherwise the whole strokes are sent, so the result is always the one of
+the whole strokes.
+
+The anchors depend on the number of points of the whole stroke, so a stroke can only be
+simplified once it is released: a DrawingTransformer with a simplifier does not stream its
+strokes.
+'''
+
+import heapq
+import itertools
+import math
+
+import gesture_recognizer
+
+# lengths closer than this to each other or to MIN_LENGTH can be compared differently by the
+# recognizer, which adds them up in another order
+LENGTH_TOLERANCE = 1e-6
+
+# in pixels of the canvas, about as much as the hand shakes while drawing
+MIN_DISTANCE = 4.0
+EPSILON = 4.0
+
+def stroke_length(stroke):
+    """
+    Is gesture_recognizer.gesture_length, up to rounding.
+    """
+
+    return sum(map(math.dist, stroke, itertools.islice(stroke, 1, None)))
+
+def sampled_positions(num_points, num_sample_points):
+    """
+    Produces the indices gesture_recognizer.sub_sample keeps of num_points points.
+
+    >>> sampled_positions(11, 10)
+    [0, 1, 2, 3, 4, 6, 7, 8, 9, 10]
+    """
+
+    return ([(k * num_points) // (num_sample_points - 1) for k in range(num_sample_points - 1)] +
+            [num_points - 1])
+
+def kept_indices(stroke, first, last, min_distance):
+    """
+    Produces the indices of the points of stroke between first and last that the first two
+    stages keep: the points different from the point before them, and at least min_distance
+    from the last point kept, stroke[first] being kept.
+
+    >>> kept_indices([(0, 0), (1, 0), (1, 0), (2, 0), (3, 0), (5, 0), (6, 0)], 0, 6, 2)
+    [3, 5]
+    >>> kept_indices([(0, 0), (1, 0), (1, 0), (2, 0), (3, 0)], 0, 4, 0)
+    [1, 3]
+    """
+
+    kept = []
+    last_kept = stroke[first]
+    for index in range(first + 1, last):
+        point = stroke[index]
+        if ((point != stroke[index - 1]) and (math.dist(point, last_kept) >= min_distance)):
+            kept.append(index)
+            last_kept = point
+    return kept
+
+def rdp_order(points, start, end):
+    """
+    Generates the indices of points in the order Ramer-Douglas-Peucker keeps them between start
+    and end, each with its distance to the path through start, end and the points kept before
+    it. The points kept with an epsilon are the ones further than epsilon, which come first.
+
+    >>> [(index, round(distance, 2)) for (index, distance) in rdp_order([(1, 1), (2, 5), (3, 1)],
+    ...                                                                  (0, 0), (4, 0))]
+    [(1, 5.0), (0, 0.56), (2, 0.56)]
+    """
+
+    intervals = []
+    xs = [x for (x, _) in points]
+    ys = [y for (_, y) in points]
+
+    def split(low, high, first, last):
+        if (low < high):
+            ((x0, y0), (x1, y1)) = (first, last)
+            (dx, dy) = (x1 - x0, y1 - y0)
+            chord = math.hypot(dx, dy)
+            if (chord == 0):
+                distances = [math.hypot(x - x0, y - y0) for (x, y) in zip(xs[low:high], ys[low:high])]
+            else:
+                distances = [abs((x - x0) * dy - (y - y0) * dx) / chord
+                             for (x, y) in zip(xs[low:high], ys[low:high])]
+            farthest = max(range(high - low), key = distances.__getitem__)
+            heapq.heappush(intervals, (-distances[farthest], low + farthest, low, high, first, last))
+
+    split(0, len(points), start, end)
+    while (intervals):
+        (distance, index, low, high, first, last) = heapq.heappop(intervals)
+        yield (index, -distance)
+        split(low, index, first, points[index])
+        split(index + 1, high, points[index], last)
+
+def spread(indices, count):
+    """
+    Produces count of indices, spread evenly along them.
+
+    >>> spread([1, 2, 3, 4, 5, 6], 3)
+    [1, 3, 5]
+    """
+
+    return [indices[(k * len(indices)) // count] for k in range(count)]
+
+class Segment:
+    '''
+    The points of stroke between the indices first and last: the indices of the points the first
+    two stages keep (kept), and of the ones Ramer-Douglas-Peucker keeps of them with epsilon
+    (needed).
+
+    >>> segment = Segment([(0, 0), (1, 1), (1, 1), (2, 5), (3, 1), (4, 0)], 0, 5, 1, 1)
+    >>> segment.kept, segment.needed
+    ([1, 3, 4], [3])
+    >>> segment.fill(2), segment.fill(4)
+    ([1, 3], [1, 2, 3, 4])
+    '''
+
+    def __init__(self, stroke, first, last, min_distance, epsilon):
+        self.first_index = first
+        self.last_index = last
+        self.kept = kept_indices(stroke, first, last, min_distance)
+        self.needed = []
+        for (position, distance) in rdp_order([stroke[index] for index in self.kept],
+                                              stroke[first], stroke[last]):
+            if (distance <= epsilon):
+                break
+            self.needed.append(self.kept[position])
+
+    def fill(self, count):
+        """
+        Produces the indices of count points of the segment, in the order of the stroke: the
+        needed points, then kept points spread along the segment, then other points.
+        """
+
+        chosen = set(self.needed)
+        others = [index for index in self.kept if (index not in chosen)]
+        if (count - len(chosen) <= len(others)):
+            chosen.update(spread(others, count - len(chosen)))
+        else:
+            chosen.update(others)
+            others = [index for index in range(self.first_index + 1, self.last_index) if (index not in chosen)]
+            chosen.update(spread(others, count - len(chosen)))
+        return sorted(chosen)
+
+def length_decisions(lengths):
+    """
+    Produces what the recognizer decides from the lengths of the first two strokes: whether the
+    first one is the letter, and whether each of them is short enough to be a trema.
+    """
+
+    (len1, len2) = lengths[0:2]
+    return ((len1 >= len2), (len1 <= gesture_recognizer.MIN_LENGTH),
+            (len2 <= gesture_recognizer.MIN_LENGTH))
+
+def close_call(lengths):
+    """
+    Produces True if the first two lengths are within LENGTH_TOLERANCE of each other or of
+    MIN_LENGTH.
+    """
+
+    (len1, len2) = lengths[0:2]
+    return min(abs(len1 - len2), abs(len1 - gesture_recognizer.MIN_LENGTH),
+               abs(len2 - gesture_recognizer.MIN_LENGTH)) <= LENGTH_TOLERANCE
+
+class StrokeSimplifier:
+    '''
+    The three stages of simplification, for a recognizer sub-sampling the strokes to
+    num_sample_points points.
+
+    >>> simplifier = StrokeSimplifier(num_sample_points = 3, min_distance = 1, epsilon = 1)
+    >>> stroke = [(0, 0), (1, 0), (1, 0), (2, 0), (3, 2), (4, 0), (5, 0), (6, 0), (6, 0)]
+    >>> simplifier.simplify(stroke)
+    [(0, 0), (2, 0), (3, 2), (4, 0), (6, 0)]
+    >>> gesture_recognizer.sub_sample(simplifier.simplify(stroke), 3).tolist()
+    [[0, 0], [3, 2], [6, 0]]
+    >>> gesture_recognizer.sub_sample(stroke, 3).tolist()
+    [[0, 0], [3, 2], [6, 0]]
+    >>> simplifier.simplify_strokes([[(x, 0) for x in range(30)], [(0, 0), (3, 0)]])[0]
+    [(0, 0), (1, 0), (15, 0), (29, 0)]
+    >>> simplifier.simplify_strokes([[(x, 0) for x in range(30)], [(0, 0), (29, 0)]])[0][0:3]
+    [(0, 0), (1, 0), (2, 0)]
+    '''
+
+    def __init__(self, num_sample_points = gesture_recognizer.NUM_SAMPLE_POINTS,
+                 min_distance = MIN_DISTANCE, epsilon = EPSILON):
+        self.num_sample_points = num_sample_points
+        self.min_distance = min_distance
+        self.epsilon = epsilon
+
+    def simplify(self, stroke):
+        """
+        Produces the points of stroke the stages keep with its anchors, in as many points as
+        needed to keep all the points Ramer-Douglas-Peucker keeps between them, or stroke itself
+        when it has no more points than the recognizer samples and one, or not enough points
+        between its anchors to fill the places between them.
+        """
+
+        num_points = len(stroke)
+        if (num_points <= self.num_sample_points + 1):
+            return stroke
+        anchors = sampled_positions(num_points, self.num_sample_points)
+        segments = [Segment(stroke, first, last, self.min_distance, self.epsilon)
+                    for (first, last) in zip(anchors, anchors[1:])]
+        places = self.places(segments)
+        if (places is None):
+            return stroke
+        simplified = [stroke[0]]
+        for (segment, num_places) in zip(segments, places):
+            simplified.extend(stroke[index] for index in segment.fill(num_places))
+            simplified.append(stroke[segment.last_index])
+        return simplified
+
+    def places(self, segments):
+        """
+        Produces the number of places between the points the recognizer samples of the fewest
+        points that leave each of segments at least as many places as its needed points, and no
+        more than its points, or None if there are none.
+        """
+
+        # no two points sampled of n points are more than n / (num_sample_points - 1) apart
+        fewest = max(self.num_sample_points + 1,
+                     (self.num_sample_points - 1) * max(len(segment.needed) for segment in segments))
+        for num_simplified in range(fewest, segments[-1].last_index + 1):
+            positions = sampled_positions(num_simplified, self.num_sample_points)
+            places = [next_position - position - 1
+                      for (position, next_position) in zip(positions, positions[1:])]
+            if (all((len(segment.needed) <= num_places <= segment.last_index - segment.first_index - 1)
+                    for (segment, num_places) in zip(segments, places))):
+                return places
+        return None
+
+    def simplify_strokes(self, strokes):
+        """
+        Produces strokes simplified, or strokes itself when the recognizer would not sample a
+        simplified stroke like its whole stroke, or could take other decisions from the lengths
+        of the simplified strokes.
+        """
+
+        lengths = [stroke_length(stroke) for stroke in strokes]
+        if (close_call(lengths)):
+            return strokes
+        simplified = [self.simplify(stroke) for stroke in strokes]
+        for (stroke, simplified_stroke) in zip(strokes[0:2], simplified):
+            if ((simplified_stroke is not stroke) and
+                (gesture_recognizer.sub_sample(simplified_stroke, self.num_sample_points).tolist() !=
+                 gesture_recognizer.sub_sample(stroke, self.num_sample_points).tolist())):
+                return strokes
+        simplified_lengths = [gesture_recognizer.gesture_length(stroke) for stroke in simplified[0:2]]
+        if (close_call(simplified_lengths) or
+            (length_decisions(simplified_lengths) != length_decisions(lengths))):
+            return strokes
+        return simplified